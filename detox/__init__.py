@@ -0,0 +1 @@
+"""Non-UI building blocks used by the Digital Detox application"""
@@ -0,0 +1,80 @@
+"""Allowlist ("only these apps") enforcement for exam and kiosk sessions
+
+While an allowlist session runs, every process of the session user whose
+name is not on the allowlist is closed, except
+
+- the system and session-critical processes below, without which the
+  desktop itself would stop,
+- everything started by an allowed app (browsers and IDEs run their helpers
+  under other names), and Digital Detox itself, its children and the
+  processes it was started from.
+
+Shells and interpreters are not critical: a terminal or a Python script is
+exactly what an exam session has to close unless it is allowed.
+
+The allowed and critical names are compiled into one identity index
+(detox.identity) when the session starts, so checking a process is a single
+dict lookup whatever its case, ".exe" suffix or truncated Linux name. Processes of
+other users are never touched, and the session user cannot be a system
+account, which would take down the services of the whole machine.
+"""
+from datetime import datetime
+
+from detox.identity import IdentityIndex
+from detox.rules import normalize_user
+
+CRITICAL_PROCESSES = frozenset((
+    # Windows kernel, session and shell
+    "system", "registry", "smss.exe", "csrss.exe", "wininit.exe", "winlogon.exe", "services.exe",
+    "lsass.exe", "lsaiso.exe", "svchost.exe", "fontdrvhost.exe", "dwm.exe", "explorer.exe", "sihost.exe",
+    "taskhostw.exe", "ctfmon.exe", "runtimebroker.exe", "searchhost.exe", "searchapp.exe",
+    "startmenuexperiencehost.exe", "shellexperiencehost.exe", "textinputhost.exe",
+    "applicationframehost.exe", "securityhealthsystray.exe", "conhost.exe", "dllhost.exe", "audiodg.exe",
+    "smartscreen.exe", "lockapp.exe", "logonui.exe", "userinit.exe", "wudfhost.exe", "spoolsv.exe",
+    "msmpeng.exe", "digitaldetox.exe",
+    # macOS
+    "launchd", "windowserver", "loginwindow",
+    # Linux init, session, display and audio
+    "systemd", "(sd-pam)", "init", "dbus-daemon", "dbus-broker", "dbus-broker-launch", "xorg", "xwayland",
+    "gnome-shell", "gnome-session-binary", "gnome-keyring-daemon", "mutter-x11-frames", "plasmashell",
+    "kwin_x11", "kwin_wayland", "ksmserver", "kded5", "kded6", "xfce4-session", "xfwm4", "xfce4-panel",
+    "pipewire", "pipewire-pulse", "wireplumber", "pulseaudio", "ibus-daemon", "fcitx5", "ssh-agent",
+    "gpg-agent", "login", "agetty", "sshd", "gdm", "gdm-x-session", "gdm-wayland-session", "lightdm", "sddm",
+    "polkit-gnome-authentication-agent-1", "polkit-kde-authentication-agent-1", "xdg-desktop-portal",
+    "xdg-document-portal", "xdg-permission-store"
+))
+
+# Families of session helpers, checked only when the name is not in a set
+CRITICAL_PREFIXES = ("gsd-", "gvfs", "at-spi", "xdg-desktop-portal", "evolution-", "tracker-miner")
+
+# Accounts whose processes are the machine's, not a session's
+SYSTEM_USERS = frozenset(("", "root", "system", "local service", "network service"))
+
+
+CRITICAL_NAMES = sorted(CRITICAL_PROCESSES)
+
+
+class AllowList:
+    """Compiled allowlist of one session"""
+
+    def __init__(self, apps, user, end_time):
+        self.user = normalize_user(user)
+        if self.user in SYSTEM_USERS:
+            raise ValueError(f"An allowlist session cannot run for the system account '{user or 'unknown'}'")
+        self.apps = list(apps)
+        self.end_time = end_time
+        self.launchers = IdentityIndex(self.apps)
+        self.allowed = IdentityIndex(self.apps + CRITICAL_NAMES)
+
+    @classmethod
+    def from_session(cls, session):
+        """Compile the persisted {"apps", "user", "end_time"} of a session"""
+        return cls(session["apps"], session["user"], datetime.fromisoformat(session["end_time"]))
+
+    def allows(self, name):
+        if not name:
+            return True
+        return name in self.allowed or name.casefold().startswith(CRITICAL_PREFIXES)
+
+    def is_active(self, now):
+        return now < self.end_time
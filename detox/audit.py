@@ -0,0 +1,225 @@
+"""Append-only audit log of enforcement events
+
+    digital_detox_audit.log                          current segment, one JSON object per line
+    digital_detox_audit.20261019-142501-000123.log.gz   older segments, compressed
+
+An event looks like
+
+    {"ts": "2026-10-19T14:25:01.123456", "event": "kill", "target": "chrome.exe", "pid": 4242, "user": "alice"}
+
+Events are kill, freeze, resume, thaw and escalate from the enforcer (which
+covers both the watchdog scan and the per-app block threads), exec_denied,
+internet_off and internet_on, network_rules (per-app network blocks),
+unblock_requested, unblock_cancelled, unblocked, profile, quota_exhausted
+and clock_jump.
+
+record() only appends to an in-memory deque, so a respawn storm with
+thousands of kills a minute costs the scan loop one append per kill. A
+background thread drains the queue once a second, or as soon as BATCH_SIZE
+events are waiting, and writes each batch with a single write. The queue is
+bounded: if the disk cannot keep up the oldest events are dropped, and how
+many is logged as a "dropped" event. The writer rotates the segment once it
+passes max_bytes, compresses it and keeps the newest `keep` of them.
+
+Query the log, newest events last like tail:
+
+    python -m detox.audit -n 50 --event kill --target chrome.exe --since 2026-10-19T09:00
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+from collections import deque
+from datetime import datetime
+
+from detox.clock import SystemClock
+
+BATCH_SIZE = 1000
+FLUSH_INTERVAL = 1.0
+QUEUE_LIMIT = 100000
+MAX_BYTES = 4 * 1024 * 1024
+KEEP_SEGMENTS = 20
+READ_BLOCK = 64 * 1024
+TS_OFFSET = len('{"ts": "')
+
+DEFAULT_FILE = os.path.join(os.path.expanduser("~"), "digital_detox_audit.log")
+
+
+def segment_root(path):
+    return path[:-len(".log")] if path.endswith(".log") else path
+
+
+def segments(path):
+    """The current segment followed by the compressed ones, newest first"""
+    rotated = glob.glob(glob.escape(segment_root(path)) + ".*.log.gz")
+    return [path] + sorted(rotated, reverse=True)
+
+
+class AuditLog:
+    """Queue of enforcement events drained to disk by a background thread"""
+
+    def __init__(self, path, max_bytes=MAX_BYTES, keep=KEEP_SEGMENTS, queue_limit=QUEUE_LIMIT, clock=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.clock = clock or SystemClock()
+        self.queue = deque(maxlen=queue_limit)
+        self.write_lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.thread = None
+
+        # Counters shown on the dashboard
+        self.written = 0
+        self.dropped = 0
+        self.reported_dropped = 0
+
+    def record(self, event, target=None, **details):
+        """Queue an event, safe to call from any thread and never blocks"""
+        queue = self.queue
+        if len(queue) == queue.maxlen:
+            self.dropped += 1
+        queue.append((self.clock.time(), event, target, details))
+        if len(queue) >= BATCH_SIZE:
+            self.wake_event.set()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            self.wake_event.wait(FLUSH_INTERVAL)
+            self.wake_event.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far as one batch"""
+        with self.write_lock:
+            queue = self.queue
+            batch = []
+            while queue:
+                batch.append(queue.popleft())
+            dropped = self.dropped - self.reported_dropped
+            if dropped:
+                batch.append((self.clock.time(), "dropped", None, {"count": dropped}))
+                self.reported_dropped += dropped
+            if not batch:
+                return
+
+            lines = []
+            for ts, event, target, details in batch:
+                record = {"ts": datetime.fromtimestamp(ts).isoformat(), "event": event, "target": target}
+                record.update(details)
+                lines.append(json.dumps(record, default=str))
+            lines.append("")
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines))
+                    size = f.tell()
+                self.written += len(batch)
+                if size >= self.max_bytes:
+                    self.rotate()
+            except OSError:
+                # The disk is gone or full, count the batch like any other loss
+                self.dropped += len(batch)
+                self.reported_dropped += len(batch)
+
+    def rotate(self):
+        """Compress the current segment and drop the oldest ones beyond `keep`"""
+        stamp = datetime.fromtimestamp(self.clock.time()).strftime("%Y%m%d-%H%M%S-%f")
+        rotated = f"{segment_root(self.path)}.{stamp}.log.gz"
+        with open(self.path, "rb") as src, gzip.open(rotated + ".tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(rotated + ".tmp", rotated)
+        os.remove(self.path)
+        for old in segments(self.path)[1 + self.keep:]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def close(self):
+        """Write out what is still queued, used on exit"""
+        self.flush()
+
+
+def reversed_lines(path):
+    """Lines of a segment, last first; the current segment is read backwards in blocks"""
+    if path.endswith(".gz"):
+        # Compressed segments are bounded by max_bytes, read them whole
+        with gzip.open(path, "rb") as f:
+            lines = f.read().split(b"\n")
+        for line in reversed(lines):
+            if line:
+                yield line
+        return
+
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        partial = b""
+        while position > 0:
+            size = min(READ_BLOCK, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + partial).split(b"\n")
+            partial = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if partial:
+            yield partial
+
+
+def query(path, event=None, target=None, since=None, limit=50):
+    """The newest `limit` matching events, oldest first
+
+    Segments are read newest first and only until enough events matched or
+    `since` (an ISO timestamp prefix) is passed. Lines are checked with a byte
+    search before they are decoded, so non-matching events cost little.
+    """
+    needles = [json.dumps(value).encode() for value in (event, target) if value]
+    matches = []
+    for segment in segments(path):
+        try:
+            for line in reversed_lines(segment):
+                if needles and not all(needle in line for needle in needles):
+                    # Lines start with {"ts": "<timestamp>, no need to decode them to stop
+                    if since and line[TS_OFFSET:TS_OFFSET + len(since)].decode(errors="replace") < since:
+                        return matches[::-1]
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
+                if since and record["ts"] < since:
+                    return matches[::-1]
+                if (event and record["event"] != event) or (target and record["target"] != target):
+                    continue
+                matches.append(record)
+                if limit and len(matches) >= limit:
+                    return matches[::-1]
+        except OSError:
+            continue
+    return matches[::-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the Digital Detox audit log")
+    parser.add_argument("--file", default=DEFAULT_FILE, help="Current audit log segment")
+    parser.add_argument("-n", "--lines", type=int, default=50, help="Newest events to show, 0 for all")
+    parser.add_argument("--event", help="Only this event, e.g. kill")
+    parser.add_argument("--target", help="Only events about this app")
+    parser.add_argument("--since", help="Only events at or after this ISO time, e.g. 2026-10-19T09:00")
+    args = parser.parse_args()
+
+    for record in query(args.file, args.event, args.target, args.since, args.lines):
+        print(json.dumps(record))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Scaling benchmark for the block matcher and the process scan
+
+Runs the enforcement scan, the running-app sampler and the per-app kill
+against synthetic process tables (detox.processes.SyntheticSource) and
+generated rule sets, and reports per configuration:
+
+    build_ms        time to compile the rules into a BlockMatcher
+    matcher_kb      memory held by the compiled matcher
+    tick_ms / p95   time of one watchdog scan (mean and 95th percentile)
+    tick_alloc_kb   memory allocated at the peak of a single scan
+    peak_mb         peak traced memory while compiling the rules and scanning once
+    sample_ms       one UsageSampler pass (the running-app list)
+    kill_ms         one enforce_name() call (kill_app)
+    matched         processes the scan acted on per tick
+
+Everything is seeded, so the same arguments always produce the same process
+table and rules and two runs can be compared number for number:
+
+    python -m detox.benchmark --json before.json
+    python -m detox.benchmark --compare before.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from detox.enforcement import ProcessEnforcer, KILL
+from detox.processes import SyntheticSource
+from detox.rules import ALL_USERS, BlockMatcher
+from detox.usage import UsageSampler
+
+DEFAULT_PROCESSES = (1000, 10000, 50000)
+DEFAULT_RULES = (10, 100, 1000, 10000)
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def generate_rules(count, names, now, seed=0):
+    """`count` rules, half quick blocks and half routines, as (blocked_apps, routine_blocks)
+
+    Half of the rules name executables from `names`, the rest name apps that
+    are not running. Most rules belong to the owner, some apply to everyone
+    and some to other users.
+    """
+    rng = random.Random(seed)
+    blocked_apps, routine_blocks = [], []
+
+    def app_name():
+        if rng.random() < 0.5:
+            return rng.choice(names)
+        return f"missing{rng.randrange(count * 2)}.exe"
+
+    for i in range(count):
+        if i % 2 == 0:
+            # Some quick blocks have already ended, like in a long-running install
+            rule = {"name": app_name(), "end_time": (now + timedelta(minutes=rng.randint(-120, 480))).isoformat()}
+            blocked_apps.append(rule)
+        else:
+            start = rng.randrange(0, 23 * 60)
+            end = min(start + rng.randint(15, 8 * 60), 24 * 60 - 1)
+            rule = {
+                "apps": [app_name() for _ in range(rng.randint(1, 5))],
+                "start_time": f"{start // 60:02d}:{start % 60:02d}",
+                "end_time": f"{end // 60:02d}:{end % 60:02d}",
+                "days": rng.sample(DAYS, rng.randint(1, 7))
+            }
+            routine_blocks.append(rule)
+        scope = rng.random()
+        if scope < 0.1:
+            rule["user"] = ALL_USERS
+        elif scope < 0.2:
+            rule["user"] = f"user{rng.randrange(20)}"
+    return blocked_apps, routine_blocks
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def run_config(processes, rules, ticks, seed=0):
+    """Benchmark one process table size against one rule set size"""
+    now = datetime.now()
+    source = SyntheticSource(processes, seed=seed)
+    blocked_apps, routine_blocks = generate_rules(rules, source.names, now, seed)
+
+    build_ms, matcher = timed(BlockMatcher, blocked_apps, routine_blocks)
+    # Escalation would change the workload from tick to tick, keep it out
+    enforcer = ProcessEnforcer(KILL, respawn_threshold=float("inf"), source=source)
+
+    tick_times = []
+    for _ in range(ticks):
+        kills = source.kills
+        tick_ms, _ = timed(enforcer.scan, matcher, now)
+        tick_times.append(tick_ms)
+    matched = source.kills - kills
+
+    sampler = UsageSampler(source=source)
+    sample_ms, _ = timed(sampler.sample)
+    kill_ms, _ = timed(enforcer.enforce_name, source.names[0])
+
+    # Memory is measured in a separate traced pass, tracing skews the timings
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    matcher = BlockMatcher(blocked_apps, routine_blocks)
+    matcher_bytes = tracemalloc.get_traced_memory()[0] - before
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    enforcer.scan(matcher, now)
+    tick_alloc = tracemalloc.get_traced_memory()[1] - current
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    tick_times.sort()
+    return {
+        "processes": processes,
+        "rules": rules,
+        "build_ms": build_ms,
+        "matcher_kb": matcher_bytes / 1024,
+        "tick_ms": statistics.mean(tick_times),
+        "tick_p95_ms": tick_times[min(int(len(tick_times) * 0.95), len(tick_times) - 1)],
+        "tick_alloc_kb": tick_alloc / 1024,
+        "peak_mb": peak / (1024 * 1024),
+        "sample_ms": sample_ms,
+        "kill_ms": kill_ms,
+        "matched": matched
+    }
+
+
+COLUMNS = ("processes", "rules", "build_ms", "matcher_kb", "tick_ms", "tick_p95_ms",
+           "tick_alloc_kb", "peak_mb", "sample_ms", "kill_ms", "matched")
+
+
+def format_row(values):
+    return "  ".join(f"{value:>12.2f}" if isinstance(value, float) else f"{value:>12}" for value in values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Digital Detox matcher and scan benchmark")
+    parser.add_argument("--processes", default=",".join(map(str, DEFAULT_PROCESSES)),
+                        help="Comma separated process table sizes")
+    parser.add_argument("--rules", default=",".join(map(str, DEFAULT_RULES)),
+                        help="Comma separated rule set sizes")
+    parser.add_argument("--ticks", type=int, default=20, help="Scans timed per configuration")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Print tick_ms against the results in this file")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = {(result["processes"], result["rules"]): result for result in json.load(f)}
+
+    header = list(COLUMNS) + (["vs_baseline"] if baseline else [])
+    print(format_row(header))
+    results = []
+    for processes in map(int, args.processes.split(",")):
+        for rules in map(int, args.rules.split(",")):
+            result = run_config(processes, rules, args.ticks, args.seed)
+            results.append(result)
+            row = [result[column] for column in COLUMNS]
+            previous = baseline.get((processes, rules))
+            if previous:
+                row.append(f"{result['tick_ms'] / previous['tick_ms']:.2f}x")
+            print(format_row(row))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Streaming bulk import and export of block rules
+
+Two formats are supported, picked from the file extension:
+
+CSV (.csv) with a header row and the columns
+    type, name, end_time, duration_minutes, apps, start_time, days, user, network
+where type is "app" or "routine" and list columns (apps, days) are separated
+by ";". The optional user column scopes a rule to one user ("*" for all), and
+network=true only blocks the network access of the apps.
+
+JSON Lines (.jsonl) with one object per line, for example
+    {"type": "app", "name": "chrome.exe", "duration_minutes": 90}
+    {"type": "routine", "apps": ["steam.exe"], "start_time": "09:00",
+     "end_time": "17:00", "days": ["Monday", "Friday"]}
+
+Records are parsed and validated one at a time, so files of any size are read
+with memory proportional to the number of distinct rules, not the file size.
+"""
+import csv
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+CSV_FIELDS = ["type", "name", "end_time", "duration_minutes", "apps", "start_time", "days", "user", "network"]
+TRUE_VALUES = ("1", "true", "yes")
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+TIME_PATTERN = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+
+
+class RuleValidationError(ValueError):
+    """A single record in an import file is invalid"""
+
+
+class RuleBatch:
+    """Validated rules from one import, deduplicated and ready to be applied"""
+
+    def __init__(self):
+        self.blocked_apps = {}
+        self.routine_blocks = {}
+        self.errors = []  # messages of the first max_errors invalid records
+        self.error_count = 0
+        self.records = 0
+
+    def add_app(self, entry):
+        # Keep the longest block when an app appears more than once
+        key = app_key(entry)
+        current = self.blocked_apps.get(key)
+        if current is None or entry["end_time"] > current["end_time"]:
+            self.blocked_apps[key] = entry
+
+    def add_routine(self, entry):
+        self.routine_blocks.setdefault(routine_key(entry), entry)
+
+
+def app_key(app):
+    return (app["name"], app.get("user", ""), bool(app.get("network")))
+
+
+def routine_key(routine):
+    return (tuple(sorted(routine["apps"])), routine["start_time"], routine["end_time"],
+            tuple(sorted(routine["days"])), routine.get("user", ""), bool(routine.get("network")))
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise RuleValidationError(f"Unsupported file type '{ext}', use .csv or .jsonl")
+
+
+def text_field(record, key):
+    """A stripped string field, "" when missing, raising RuleValidationError for other types"""
+    value = record.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise RuleValidationError(f"{key} must be text, not {json.dumps(value)}")
+    return value.strip()
+
+
+def split_list(value):
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    if not value:
+        return []
+    return [item.strip() for item in str(value).split(";") if item.strip()]
+
+
+def validate_record(record, now):
+    """Turn a raw record into ("app" | "routine", entry), raising RuleValidationError"""
+    kind, entry = validate_rule(record, now)
+    user = text_field(record, "user")
+    if user:
+        entry["user"] = user
+    if str(record.get("network") or "").strip().lower() in TRUE_VALUES:
+        entry["network"] = True
+    return kind, entry
+
+
+def validate_rule(record, now):
+    kind = text_field(record, "type").lower()
+
+    if kind == "app":
+        name = text_field(record, "name")
+        if not name:
+            raise RuleValidationError("app rule needs a name")
+        end_time = record.get("end_time")
+        duration = record.get("duration_minutes")
+        if end_time:
+            try:
+                end_time = datetime.fromisoformat(str(end_time).strip())
+                if end_time.tzinfo is not None:
+                    # Blocks are stored in naive local time
+                    end_time = end_time.astimezone().replace(tzinfo=None)
+            except (ValueError, OverflowError, OSError):
+                raise RuleValidationError(f"invalid end_time '{end_time}'")
+        elif duration not in (None, ""):
+            try:
+                duration = int(duration)
+            except (TypeError, ValueError):
+                raise RuleValidationError(f"invalid duration_minutes '{duration}'")
+            if duration <= 0:
+                raise RuleValidationError("duration_minutes must be positive")
+            end_time = now + timedelta(minutes=duration)
+        else:
+            raise RuleValidationError("app rule needs end_time or duration_minutes")
+        return "app", {
+            "name": name,
+            "start_time": now.isoformat(),
+            "end_time": end_time.isoformat()
+        }
+
+    if kind == "routine":
+        apps = split_list(record.get("apps"))
+        days = split_list(record.get("days"))
+        start_time = text_field(record, "start_time")
+        end_time = text_field(record, "end_time")
+        if not apps:
+            raise RuleValidationError("routine needs at least one app")
+        if not (TIME_PATTERN.match(start_time) and TIME_PATTERN.match(end_time)):
+            raise RuleValidationError("routine times must be in HH:MM format")
+        unknown = [day for day in days if day not in DAYS]
+        if unknown or not days:
+            raise RuleValidationError(f"invalid days {', '.join(unknown) or '(none)'}")
+        return "routine", {
+            "apps": apps,
+            "start_time": start_time,
+            "end_time": end_time,
+            "days": days
+        }
+
+    raise RuleValidationError(f"unknown rule type '{kind}'")
+
+
+def decoded_lines(f):
+    """Lines of a file opened in binary mode as text, raising RuleValidationError where it is not UTF-8"""
+    for line_number, line in enumerate(f, start=1):
+        try:
+            yield line.decode("utf-8")
+        except UnicodeDecodeError:
+            raise RuleValidationError(f"line {line_number}: the file is not UTF-8 text")
+
+
+def iter_records(lines, fmt):
+    """Yield (line_number, raw_record_or_exception) from lines of text"""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        try:
+            for row in reader:
+                yield reader.line_num, row
+        except csv.Error as e:
+            raise RuleValidationError(f"line {reader.reader.line_num}: invalid CSV: {e}")
+    else:
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, RuleValidationError(f"invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                record = RuleValidationError("record must be a JSON object")
+            yield line_number, record
+
+
+def read_rules(path, now=None, max_errors=100):
+    """Stream and validate an import file into a RuleBatch
+
+    Every invalid record is counted, the messages of the first `max_errors`
+    are kept. A file that is not UTF-8 text, or CSV the reader cannot parse,
+    raises RuleValidationError naming the line.
+    """
+    fmt = detect_format(path)
+    now = now or datetime.now()
+    batch = RuleBatch()
+    with open(path, "rb") as f:
+        for line_number, record in iter_records(decoded_lines(f), fmt):
+            batch.records += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                kind, entry = validate_record(record, now)
+            except RuleValidationError as e:
+                batch.error_count += 1
+                if len(batch.errors) < max_errors:
+                    batch.errors.append(f"line {line_number}: {e}")
+                continue
+            if kind == "app":
+                batch.add_app(entry)
+            else:
+                batch.add_routine(entry)
+    return batch
+
+
+def merge_rules(blocked_apps, routine_blocks, batch):
+    """Return new (blocked_apps, routine_blocks) lists with the batch merged in"""
+    merged_apps = []
+    for app in blocked_apps:
+        imported = batch.blocked_apps.get(app_key(app))
+        if imported is not None and app.get("end_time", "") < imported["end_time"]:
+            # Superseded by the longer imported block
+            continue
+        merged_apps.append(app)
+    kept = {app_key(app) for app in merged_apps}
+    merged_apps.extend(entry for key, entry in batch.blocked_apps.items() if key not in kept)
+
+    existing = {routine_key(routine) for routine in routine_blocks}
+    merged_routines = list(routine_blocks)
+    for key, entry in batch.routine_blocks.items():
+        if key not in existing:
+            merged_routines.append(entry)
+    return merged_apps, merged_routines
+
+
+def iter_export_records(blocked_apps, routine_blocks):
+    for app in blocked_apps:
+        if "end_time" in app:
+            record = {"type": "app", "name": app["name"], "end_time": app["end_time"]}
+            if app.get("user"):
+                record["user"] = app["user"]
+            if app.get("network"):
+                record["network"] = True
+            yield record
+    for routine in routine_blocks:
+        record = {
+            "type": "routine",
+            "apps": list(routine["apps"]),
+            "start_time": routine["start_time"],
+            "end_time": routine["end_time"],
+            "days": list(routine["days"])
+        }
+        if routine.get("user"):
+            record["user"] = routine["user"]
+        if routine.get("network"):
+            record["network"] = True
+        yield record
+
+
+def write_rules(path, blocked_apps, routine_blocks):
+    """Stream all rules to a CSV or JSON Lines file, returns the number written"""
+    fmt = detect_format(path)
+    count = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for record in iter_export_records(blocked_apps, routine_blocks):
+                if record["type"] == "routine":
+                    record["apps"] = ";".join(record["apps"])
+                    record["days"] = ";".join(record["days"])
+                writer.writerow(record)
+                count += 1
+        else:
+            for record in iter_export_records(blocked_apps, routine_blocks):
+                f.write(json.dumps(record))
+                f.write("\n")
+                count += 1
+    os.replace(tmp_path, path)
+    return count
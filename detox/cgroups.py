@@ -0,0 +1,253 @@
+"""cgroup v2 freezer used by the "cgroup" enforcement mode on Linux
+
+Matched processes are moved into a cgroup of their own per blocked target
+(digital-detox/<user>-<target>) and the group is frozen by writing "1" to
+its cgroup.freeze. Everything the frozen processes spawn is created inside
+the same group and starts out frozen, so a multi-process app stays stopped
+without being polled. Unblocking writes "0" to thaw the group and moves the
+processes back to the cgroup they came from.
+
+Moving processes between cgroups needs write access to their common
+ancestor, which in practice means running as root or inside a delegated
+systemd subtree. create_freezer() returns None wherever that is not
+possible, and the enforcer then freezes processes one by one instead.
+
+The same tree holds the (unfrozen) groups of per-app network blocks, see
+detox.netblock.
+
+A run that crashed never released its groups, so on start every group of
+ours still under the base is thawed, emptied and removed, the same way
+ProcessEnforcer.resume_saved() resumes processes stopped with SIGSTOP.
+"""
+import os
+import re
+
+GROUP_NAME = "digital-detox"
+
+
+def cgroup2_mount(mountinfo="/proc/self/mountinfo"):
+    """Mount point of the unified (v2) hierarchy, or None"""
+    try:
+        with open(mountinfo, "r") as f:
+            for line in f:
+                fields = line.split(" - ", 1)
+                if len(fields) == 2 and fields[1].split(" ", 1)[0] == "cgroup2":
+                    return fields[0].split(" ")[4]
+    except OSError:
+        pass
+    return None
+
+
+def process_cgroup(pid):
+    """cgroup v2 path of a process, relative to the mount, e.g. /user.slice/..."""
+    try:
+        with open(f"/proc/{pid}/cgroup", "r") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return line[3:].strip()
+    except OSError:
+        pass
+    return None
+
+
+def write(path, value):
+    with open(path, "w") as f:
+        f.write(value)
+
+
+def group_key(target, user):
+    """Directory name of a target's group, restricted to characters cgroupfs accepts"""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", f"{user or 'owner'}-{target}")
+
+
+class CgroupTree:
+    """Groups of processes per (target, user) below one base directory"""
+
+    prefix = ""
+
+    def __init__(self, mount, base):
+        self.mount = mount
+        self.base = base
+        self.groups = {}  # (target, user) -> group directory
+        self.origins = {}  # pid -> cgroup it was moved from
+        self.members = {}  # (target, user) -> pids found in the group by the last refresh()
+
+    def group(self, target, user):
+        """Directory of a target's group, created on first use"""
+        key = (target, user)
+        group = self.groups.get(key)
+        if group is None:
+            group = os.path.join(self.base, self.prefix + group_key(target, user))
+            os.makedirs(group, exist_ok=True)
+            self.created(group)
+            self.groups[key] = group
+        return group
+
+    def created(self, group):
+        """Hook for subclasses to set up a new group"""
+
+    def relative_path(self, group):
+        """Path of a group relative to the cgroup2 mount, as nftables expects it"""
+        return os.path.relpath(group, self.mount)
+
+    def add(self, target, user, pid):
+        """Move a process into its target's group"""
+        group = self.group(target, user)
+        origin = process_cgroup(pid)
+        write(os.path.join(group, "cgroup.procs"), str(pid))
+        if origin is not None:
+            self.origins[pid] = origin
+        self.members.setdefault((target, user), set()).add(pid)
+
+    def refresh(self):
+        """Re-read the members of every group, which picks up processes born frozen"""
+        members = {}
+        for key, group in self.groups.items():
+            try:
+                with open(os.path.join(group, "cgroup.procs"), "r") as f:
+                    members[key] = {int(line) for line in f if line.strip()}
+            except OSError:
+                members[key] = set()
+        self.members = members
+        return members
+
+    def frozen_pids(self):
+        pids = set()
+        for group_pids in self.members.values():
+            pids |= group_pids
+        return pids
+
+    def release(self, target, user):
+        """Hand the processes of a target's group back and remove the group"""
+        key = (target, user)
+        group = self.groups.pop(key, None)
+        self.members.pop(key, None)
+        if group is not None:
+            self.release_group(group)
+
+    def release_group(self, group, destinations=()):
+        """Empty a group and remove it
+
+        Each process goes back to the cgroup it was moved from, or else to the
+        first of `destinations` that takes it.
+        """
+        try:
+            self.releasing(group)
+            with open(os.path.join(group, "cgroup.procs"), "r") as f:
+                pids = [int(line) for line in f if line.strip()]
+        except OSError:
+            return
+        # Children born in the group go back to where their ancestor came from
+        fallback = next((self.origins[pid] for pid in pids if pid in self.origins), None)
+        for pid in pids:
+            origin = self.origins.pop(pid, fallback)
+            for destination in ([origin] if origin is not None else []) + list(destinations):
+                try:
+                    write(os.path.join(self.mount + destination, "cgroup.procs"), str(pid))
+                    break
+                except OSError:
+                    continue
+        try:
+            os.rmdir(group)
+        except OSError:
+            # Still populated (a move failed), it is reused next time
+            pass
+
+    def leftover(self, group):
+        """Whether a group found under the base is one of ours from an earlier run"""
+        return bool(self.prefix) and os.path.basename(group).startswith(self.prefix)
+
+    def release_leftovers(self):
+        """Release the groups a previous run left behind, returns how many
+
+        Where their processes came from is lost with that run, so they go to
+        the parent of the base, or to our own cgroup where the parent cannot
+        hold processes.
+        """
+        try:
+            names = sorted(os.listdir(self.base))
+        except OSError:
+            return 0
+        parent = os.path.relpath(os.path.dirname(self.base), self.mount)
+        destinations = ["/" if parent == "." else "/" + parent]
+        own = process_cgroup(os.getpid())
+        if own:
+            destinations.append(own)
+        current = set(self.groups.values())
+        released = 0
+        for name in names:
+            group = os.path.join(self.base, name)
+            if group in current or not os.path.isdir(group) or not self.leftover(group):
+                continue
+            self.release_group(group, destinations)
+            released += 1
+        return released
+
+    def releasing(self, group):
+        """Hook for subclasses, called before the processes leave a group"""
+
+    def release_all(self):
+        for target, user in list(self.groups):
+            self.release(target, user)
+
+
+class CgroupFreezer(CgroupTree):
+    """Frozen cgroups of blocked targets"""
+
+    def created(self, group):
+        write(os.path.join(group, "cgroup.freeze"), "1")
+
+    def releasing(self, group):
+        write(os.path.join(group, "cgroup.freeze"), "0")
+
+    def leftover(self, group):
+        # Network groups share the base but are never frozen
+        try:
+            with open(os.path.join(group, "cgroup.freeze"), "r") as f:
+                return f.read().strip() == "1"
+        except OSError:
+            return False
+
+    def freeze(self, target, user, pid):
+        """Move a process into the frozen group of its target"""
+        self.add(target, user, pid)
+
+    def thaw(self, target, user):
+        """Unfreeze a target's group and hand its processes back"""
+        self.release(target, user)
+
+    def thaw_all(self):
+        self.release_all()
+
+
+def find_base():
+    """(mount, base directory) of the first writable place for our groups, or None"""
+    mount = cgroup2_mount()
+    if mount is None:
+        return None
+    candidates = [os.path.join(mount, GROUP_NAME)]
+    own = process_cgroup(os.getpid())
+    if own and own != "/":
+        # Inside a delegated subtree (systemd user session) next to our own group
+        candidates.append(os.path.join(mount + os.path.dirname(own), GROUP_NAME))
+    for base in candidates:
+        try:
+            os.makedirs(base, exist_ok=True)
+            if os.access(os.path.join(base, "cgroup.procs"), os.W_OK):
+                return mount, base
+        except OSError:
+            continue
+    return None
+
+
+def create_freezer():
+    """A freezer under the first writable candidate base, or None
+
+    Groups a crashed run left frozen are thawed and removed first.
+    """
+    found = find_base()
+    if found is None:
+        return None
+    freezer = CgroupFreezer(*found)
+    freezer.release_leftovers()
+    return freezer
@@ -0,0 +1,67 @@
+"""Clocks the engine reads time from
+
+Everything that schedules or enforces blocks asks an injected clock for the
+time instead of calling datetime.now() or time.sleep() itself, so the same
+code can run against a VirtualClock that a simulation moves forward at will.
+"""
+import time
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    """The real wall and monotonic clocks"""
+
+    def now(self):
+        return datetime.now()
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        """event.wait(timeout), returns whether the event was set"""
+        return event.wait(timeout)
+
+
+class VirtualClock:
+    """A clock that only moves when it is told to
+
+    sleep() and wait() return immediately and advance the clock by the time
+    they would have blocked, so a loop written against the clock runs as
+    fast as it can compute.
+    """
+
+    def __init__(self, start=None):
+        self.current = start or datetime.now()
+        self.elapsed = 0.0
+
+    def now(self):
+        return self.current
+
+    def time(self):
+        return self.current.timestamp()
+
+    def monotonic(self):
+        return self.elapsed
+
+    def advance(self, seconds):
+        self.set(self.current + timedelta(seconds=seconds))
+
+    def set(self, when):
+        """Move to a later datetime, the clock never runs backwards"""
+        if when > self.current:
+            self.elapsed += (when - self.current).total_seconds()
+            self.current = when
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def wait(self, event, timeout):
+        if not event.is_set() and timeout:
+            self.advance(timeout)
+        return event.is_set()
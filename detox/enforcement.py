@@ -0,0 +1,643 @@
+"""Process enforcement: kill or freeze processes matched by the block rules"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import psutil
+
+from detox import cgroups
+from detox.clock import SystemClock
+from detox.identity import IdentityIndex
+from detox.processes import PsutilSource
+from detox.rules import current_user, moment, normalize_user
+
+try:
+    import pwd
+except ImportError:
+    pwd = None
+
+KILL = "kill"
+SUSPEND = "suspend"
+CGROUP = "cgroup"
+ENFORCEMENT_MODES = (KILL, SUSPEND, CGROUP)
+
+IGNORED_ERRORS = (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess)
+
+# Deepest process tree walked to find an allowed ancestor
+MAX_ANCESTRY = 64
+
+# Killed PIDs remembered before the exited ones are forgotten
+ACTED_LIMIT = 1024
+
+# Escalation ladder for targets that keep getting relaunched
+ESCALATE_SUSPEND = 1
+ESCALATE_PARENT = 2
+ESCALATE_BACKOFF = 3
+
+# Launchers that must never be blocked, even when they respawn a blocked app
+PROTECTED_PROCESSES = frozenset(name.lower() for name in (
+    "explorer.exe", "svchost.exe", "services.exe", "wininit.exe", "winlogon.exe",
+    "csrss.exe", "smss.exe", "lsass.exe", "dwm.exe", "sihost.exe", "taskhostw.exe",
+    "runtimebroker.exe", "cmd.exe", "powershell.exe", "pwsh.exe", "conhost.exe",
+    "systemd", "init", "launchd", "login", "sshd", "gnome-shell", "plasmashell",
+    "bash", "sh", "zsh", "fish", "dbus-daemon", "python", "python3",
+    "python.exe", "pythonw.exe", "digitaldetox.exe"
+))
+
+
+def own_ancestry():
+    """PIDs of this process and everything above it"""
+    pids = {os.getpid()}
+    try:
+        for parent in psutil.Process().parents():
+            pids.add(parent.pid)
+    except IGNORED_ERRORS:
+        pass
+    return pids
+
+
+class OwnerLookup:
+    """Maps processes to normalized owner names
+
+    On POSIX the real uid is read (cheap) and resolved through a cache, on
+    Windows the owner comes from the process token.
+    """
+
+    def __init__(self):
+        self.uid_names = {}
+
+    def __call__(self, proc):
+        if pwd is None:
+            return normalize_user(proc.username())
+        uid = proc.uids().real
+        user = self.uid_names.get(uid)
+        if user is None:
+            try:
+                user = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                user = str(uid)
+            user = self.uid_names[uid] = normalize_user(user)
+        return user
+
+
+class RespawnTracker:
+    """Sliding window of the ticks in which a target had new processes
+
+    However many new processes of a target one tick meets (a browser starts a
+    dozen), and however many threads act on them, the tick counts once: a
+    storm is a target that keeps coming back tick after tick.
+    """
+
+    def __init__(self, window=60, threshold=10, tick=1.0):
+        self.window = window
+        self.threshold = threshold
+        self.tick = tick
+        self.events = {}  # name -> deque of monotonic timestamps
+        self.last_seen = {}  # name -> timestamp of the latest action
+        self.last_tick = {}  # name -> tick of the latest counted action
+
+    def record(self, name, now):
+        """Record one kill/freeze of a new process, returns True when the target is storming"""
+        tick = int(now // self.tick)
+        self.last_seen[name] = now
+        if self.last_tick.get(name) == tick:
+            return False
+        self.last_tick[name] = tick
+        events = self.events.get(name)
+        if events is None:
+            events = self.events[name] = deque()
+        events.append(now)
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        return len(events) >= self.threshold
+
+    def reset(self, name):
+        """Start counting from zero again, the target still counts as active"""
+        self.events[name] = deque()
+
+    def rate(self, name, now):
+        """Actions per minute over the window"""
+        events = self.events.get(name, ())
+        recent = sum(1 for t in events if t > now - self.window)
+        return recent * 60.0 / self.window
+
+    def prune(self, now):
+        """Forget targets that were quiet for a whole window, returns their names"""
+        idle = [name for name, last_seen in self.last_seen.items()
+                if last_seen <= now - self.window]
+        for name in idle:
+            del self.last_seen[name]
+            self.events.pop(name, None)
+            self.last_tick.pop(name, None)
+        return idle
+
+
+class ProcessEnforcer:
+    """Applies the enforcement mode to matched processes
+
+    In suspend mode frozen processes are remembered by PID (with their create
+    time, to survive PID reuse) and skipped by later scans until their block
+    ends and they are resumed. They are also saved to `frozen_file`, so the
+    processes a crashed run left stopped are resumed by the next start.
+
+    In cgroup mode (Linux) they are moved into a frozen cgroup per target
+    instead, which also freezes everything they spawn; the scan skips the
+    members of those groups and the block ends with one thaw per group.
+    Where no cgroup v2 freezer is usable it behaves like suspend mode.
+
+    Targets that are relaunched faster than the respawn threshold escalate:
+    first they are frozen instead of killed, then the launcher that keeps
+    starting them is blocked too, and finally the scan interval is stretched.
+    Escalations are dropped once the target stays quiet for a whole window,
+    except for the launcher: the target is only quiet because the launcher is
+    held, so it stays blocked until the target's block ends.
+
+    Only processes whose owner is covered by a rule are touched: the scan
+    buckets candidate processes by owner and matches each bucket against the
+    rule sets of that user.
+    """
+
+    def __init__(self, mode=KILL, scan_interval=1.0, respawn_window=60, respawn_threshold=10, owner=None,
+                 clock=None, source=None, frozen_file=None):
+        self.mode = mode if mode in ENFORCEMENT_MODES else KILL
+        self.clock = clock or SystemClock()
+        self.source = source or PsutilSource()
+        self.frozen = {}  # pid -> (name, create_time, owner)
+        self.acted = {}  # pid -> create_time of processes already killed
+        self.frozen_file = frozen_file
+        self.frozen_saved = None  # copy of `frozen` as last written to frozen_file
+        self.lock = threading.Lock()
+        self.freezer = None
+        self.group_pids = set()  # members of frozen cgroups as of the last scan
+        if self.mode == CGROUP:
+            self.freezer = cgroups.create_freezer()
+        self.owner = normalize_user(owner if owner is not None else current_user())
+        self.owners = OwnerLookup()
+
+        self.base_interval = scan_interval
+        self.scan_interval = scan_interval
+        self.respawns = RespawnTracker(respawn_window, respawn_threshold, scan_interval)
+        self.escalations = {}  # target name -> escalation level
+        self.escalated_parents = {}  # launcher name -> target name it keeps relaunching
+        self.protected_pids = own_ancestry()
+        self.audit = None  # detox.audit.AuditLog, set by the engine
+
+        # Metrics shown on the dashboard
+        self.kills = 0
+        self.suspends = 0
+        self.storms = 0
+        self.scan_cpu_seconds = 0.0
+        self.action_cpu_seconds = {}  # target name -> CPU spent killing/freezing it
+        self.stormed_targets = set()
+
+    def set_mode(self, mode):
+        """Switch modes, resuming anything frozen when leaving suspend mode"""
+        if mode not in ENFORCEMENT_MODES:
+            raise ValueError(f"Unknown enforcement mode: {mode}")
+        if mode != CGROUP and self.freezer is not None:
+            with self.lock:
+                freezer, self.freezer = self.freezer, None
+                self.group_pids = set()
+            freezer.thaw_all()
+        elif mode == CGROUP and self.freezer is None:
+            self.freezer = cgroups.create_freezer()
+        self.mode = mode
+        if mode == KILL:
+            self.release_all()
+
+    def record(self, event, target, **details):
+        if self.audit is not None:
+            self.audit.record(event, target, **details)
+
+    def is_frozen(self, pid):
+        return pid in self.frozen or pid in self.group_pids
+
+    def apply(self, proc, name=None, target=None, track=True, user=None, kill=False):
+        """Kill or suspend a single matched process
+
+        `target` is the blocked app the process counts against (the process
+        itself unless it is an escalated launcher); `track` is False for
+        launchers so blocking them never climbs further up the tree. `user`
+        is the process owner when the caller already looked it up. `kill`
+        kills whatever the mode.
+        """
+        started = time.thread_time()
+        try:
+            if self.is_frozen(proc.pid) or proc.pid in self.protected_pids:
+                return
+            if name is None:
+                name = proc.name()
+            target = target or name
+            level = self.escalations.get(target, 0)
+            if track and level >= ESCALATE_PARENT:
+                self._block_parent(proc, target, user)
+
+            if kill or (self.mode == KILL and level < ESCALATE_SUSPEND):
+                if not self._first_kill(proc):
+                    # Killed already, by another thread or as a zombie not reaped yet
+                    return
+                proc.kill()
+                self.kills += 1
+                self.record("kill", target, name=name, pid=proc.pid, user=user)
+            else:
+                if user is None:
+                    user = self.owners(proc)
+                if not self._freeze_in_cgroup(proc, target, user):
+                    create_time = proc.create_time()
+                    proc.suspend()
+                    with self.lock:
+                        self.frozen[proc.pid] = (name, create_time, user)
+                self.suspends += 1
+                self.record("freeze", target, name=name, pid=proc.pid, user=user)
+
+            if track:
+                with self.lock:
+                    storming = self.respawns.record(target, self.clock.monotonic())
+                if storming:
+                    self._escalate(target)
+        except IGNORED_ERRORS:
+            pass
+        finally:
+            target = target or name
+            if target:
+                spent = time.thread_time() - started
+                with self.lock:
+                    self.action_cpu_seconds[target] = self.action_cpu_seconds.get(target, 0.0) + spent
+
+    def _first_kill(self, proc):
+        """Claim a process for killing, False if this very process was killed before"""
+        create_time = proc.create_time()
+        with self.lock:
+            if self.acted.get(proc.pid) == create_time:
+                return False
+            self.acted[proc.pid] = create_time
+        return True
+
+    def forget_exited(self):
+        """Drop the killed PIDs that are gone, a reused PID has another create time anyway"""
+        with self.lock:
+            for pid in [pid for pid in self.acted if not self.source.pid_exists(pid)]:
+                del self.acted[pid]
+
+    def _freeze_in_cgroup(self, proc, target, user):
+        """Move a process into its target's frozen cgroup, False if that is not possible"""
+        with self.lock:
+            if self.freezer is None:
+                return False
+            try:
+                self.freezer.freeze(target, user, proc.pid)
+            except OSError:
+                return False
+            self.group_pids.add(proc.pid)
+        return True
+
+    def _escalate(self, target):
+        level = min(self.escalations.get(target, 0) + 1, ESCALATE_BACKOFF)
+        self.escalations[target] = level
+        self.storms += 1
+        self.record("escalate", target, level=level)
+        with self.lock:
+            self.stormed_targets.add(target)
+            # Require a fresh storm at the new level before escalating again
+            self.respawns.reset(target)
+        self._update_interval()
+
+    def _block_parent(self, proc, target, user):
+        try:
+            parent = proc.parent()
+            if parent is None or parent.pid in self.protected_pids:
+                return
+            parent_name = parent.name()
+            parent_user = self.owners(parent)
+            # A launcher owned by someone else (a service, another session) is off limits
+            if parent_user != (user if user is not None else self.owners(proc)):
+                return
+        except IGNORED_ERRORS:
+            return
+        if not parent_name or parent_name.lower() in PROTECTED_PROCESSES:
+            return
+        self.escalated_parents[parent_name] = target
+        self.apply(parent, parent_name, target, track=False, user=parent_user)
+
+    def _update_interval(self):
+        if any(level >= ESCALATE_BACKOFF for level in self.escalations.values()):
+            self.scan_interval = self.base_interval * 4
+        else:
+            self.scan_interval = self.base_interval
+
+    def deescalate(self):
+        """Drop escalations for targets that stopped respawning"""
+        with self.lock:
+            idle = self.respawns.prune(self.clock.monotonic())
+        for target in idle:
+            self.escalations.pop(target, None)
+        for parent_name, target in list(self.escalated_parents.items()):
+            if target not in self.escalations and not self._holds_launcher(parent_name, target):
+                del self.escalated_parents[parent_name]
+        self._update_interval()
+
+    def _holds_launcher(self, parent_name, target):
+        """Whether an escalated launcher is still frozen, release() lets it go when the target's block ends"""
+        with self.lock:
+            if any(info[0] == parent_name for info in self.frozen.values()):
+                return True
+            return self.freezer is not None and any(key[0] == target for key in self.freezer.groups)
+
+    def metrics(self):
+        """Enforcement counters, including CPU burnt on targets that stormed
+
+        Called from the UI thread while enforcement threads update the
+        counters, so they are read under the lock.
+        """
+        now = self.clock.monotonic()
+        with self.lock:
+            kill_loop_cpu = sum(cpu for target, cpu in self.action_cpu_seconds.items()
+                                if target in self.stormed_targets)
+            respawn_rates = {target: self.respawns.rate(target, now) for target in self.respawns.events}
+            frozen = len(self.frozen) + len(self.group_pids)
+        return {
+            "kills": self.kills,
+            "suspends": self.suspends,
+            "frozen": frozen,
+            "storms": self.storms,
+            "escalations": dict(self.escalations),
+            "escalated_parents": dict(self.escalated_parents),
+            "respawn_rates": respawn_rates,
+            "scan_cpu_seconds": self.scan_cpu_seconds,
+            "kill_loop_cpu_seconds": kill_loop_cpu,
+            "scan_interval": self.scan_interval
+        }
+
+    def enforce_name(self, app_name):
+        """Scan once for the owner's processes named app_name and enforce them"""
+        self.enforce_names((app_name,))
+
+    def enforce_names(self, app_names):
+        """Enforce the owner's processes of any of `app_names` in a single pass"""
+        self.enforce_targets(IdentityIndex(app_names))
+
+    def enforce_targets(self, targets):
+        """enforce_names() over a prebuilt detox.identity.IdentityIndex"""
+        if not len(targets):
+            return
+        for proc in self.source.process_iter(['pid', 'name']):
+            try:
+                name = proc.info['name']
+                if not targets.lookup(name) or self.is_frozen(proc.pid):
+                    continue
+                user = self.owners(proc)
+                if user == self.owner:
+                    self.apply(proc, name, user=user)
+            except IGNORED_ERRORS:
+                pass
+        self.save_frozen()
+
+    def scan(self, matcher, current_time, watched=(), allowlist=None):
+        """Enforce the compiled rules over the process table in a single pass
+
+        Returns the running processes of the targets in `watched` (a
+        detox.identity.IdentityIndex) as {target: [(pid, user), ...]} (frozen
+        processes do not count), which is what quota accounting and per-app
+        network blocks need.
+
+        With an `allowlist` (detox.allowlist.AllowList) the same pass also
+        kills the session user's processes that it does not allow, in every
+        enforcement mode.
+        """
+        started = time.thread_time()
+        when = moment(current_time)
+        seen = {}
+        if self.escalations or self.escalated_parents:
+            self.deescalate()
+        if len(self.acted) > ACTED_LIMIT:
+            self.forget_exited()
+        if self.frozen or self.freezer is not None:
+            self.release(matcher, when)
+        if len(matcher) or watched or allowlist is not None:
+            seen = self._scan(matcher, when, watched, allowlist)
+        self.save_frozen()
+        self.scan_cpu_seconds += time.thread_time() - started
+        return seen
+
+    def _scan(self, matcher, when, watched=(), allowlist=None):
+        # Only processes named by some rule are candidates, their owner is
+        # looked up once and used to bucket them per user
+        index = matcher.index
+        parents = self.escalated_parents
+        buckets = {}
+        seen = {}
+        frozen = self.frozen
+        group_pids = self.group_pids
+        attrs = ['pid', 'name']
+        if allowlist is not None:
+            attrs.append('ppid')
+            processes = {}  # pid -> (ppid, name) of every process, for the ancestry checks
+            disallowed = []
+        for proc in self.source.process_iter(attrs):
+            try:
+                # Frozen processes stay frozen, no need to inspect them again
+                if proc.pid in frozen or proc.pid in group_pids:
+                    continue
+                name = proc.info['name']
+                if allowlist is not None:
+                    processes[proc.pid] = (proc.info['ppid'], name)
+                    if not allowlist.allows(name):
+                        disallowed.append((proc, name))
+                target = watched.lookup(name) if watched else ""
+                if not target and not index.lookup(name) and name not in parents:
+                    continue
+                user = self.owners(proc)
+                if target:
+                    seen.setdefault(target, []).append((proc.pid, user))
+                bucket = buckets.get(user)
+                if bucket is None:
+                    bucket = buckets[user] = []
+                bucket.append((proc, name))
+            except IGNORED_ERRORS:
+                pass
+
+        for user, procs in buckets.items():
+            if not matcher.rules_for(user):
+                continue
+            decisions = {}
+            for proc, name in procs:
+                decision = decisions.get(name)
+                if decision is None:
+                    decision = decisions[name] = self._target_for(matcher, name, when, user)
+                if decision:
+                    self.apply(proc, name, decision, track=decision == name, user=user)
+
+        if allowlist is not None and disallowed:
+            self._enforce_allowlist(allowlist, disallowed, processes)
+        return seen
+
+    def _enforce_allowlist(self, allowlist, disallowed, processes):
+        """Close the disallowed processes of the session user, sparing what allowed apps started"""
+        # pid -> whether it is, or descends from, an allowed app or Digital Detox
+        covered = {os.getpid(): True}
+        for proc, name in disallowed:
+            # Walk up to the first process with a known answer, then remember it for the whole path
+            path = []
+            pid = proc.pid
+            while True:
+                answer = covered.get(pid)
+                if answer is not None:
+                    break
+                ppid, process_name = processes.get(pid, (None, None))
+                if process_name and process_name in allowlist.launchers:
+                    answer = True
+                    break
+                path.append(pid)
+                if not ppid or ppid == pid or len(path) > MAX_ANCESTRY:
+                    answer = False
+                    break
+                pid = ppid
+            for pid in path:
+                covered[pid] = answer
+            if answer:
+                continue
+            try:
+                user = self.owners(proc)
+                if user == allowlist.user:
+                    # Always killed: the rules would resume a frozen one on the next tick,
+                    # and relaunching a disallowed app is no storm to escalate
+                    self.apply(proc, name, track=False, user=user, kill=True)
+            except IGNORED_ERRORS:
+                pass
+
+    def _target_for(self, matcher, name, when, user=None):
+        """Name of the blocked target a process counts against, or "" if allowed"""
+        if matcher.is_blocked(name, when, user):
+            return name
+        target = self.escalated_parents.get(name)
+        if target and matcher.is_blocked(target, when, user):
+            return target
+        return ""
+
+    def release(self, matcher, when):
+        """Resume frozen processes whose block has ended and forget dead ones"""
+        with self.lock:
+            expired = [(pid, info) for pid, info in self.frozen.items()
+                       if not self._target_for(matcher, info[0], when, info[2])]
+            for pid, _ in expired:
+                del self.frozen[pid]
+        for pid, info in expired:
+            self._resume(pid, info)
+
+        # Drop PIDs that exited (or were killed) while frozen
+        with self.lock:
+            for pid in [pid for pid in self.frozen if not self.source.pid_exists(pid)]:
+                del self.frozen[pid]
+
+        if self.freezer is not None:
+            self._release_groups(matcher, when)
+
+    def _release_groups(self, matcher, when):
+        """Thaw the cgroups of targets that are no longer blocked
+
+        Reading the members back also covers processes that were born in a
+        frozen group, and those that exited.
+        """
+        with self.lock:
+            freezer = self.freezer
+            if freezer is None:
+                return
+            for target, user in list(freezer.groups):
+                if not matcher.is_blocked(target, when, user):
+                    freezer.thaw(target, user)
+                    self.record("thaw", target, user=user)
+            freezer.refresh()
+            self.group_pids = freezer.frozen_pids()
+
+    def release_all(self):
+        """Resume every frozen process, used on exit and when leaving suspend mode"""
+        with self.lock:
+            frozen, self.frozen = self.frozen, {}
+            if self.freezer is not None:
+                self.freezer.thaw_all()
+                self.group_pids = set()
+        for pid, info in frozen.items():
+            self._resume(pid, info)
+        self.save_frozen()
+
+    def save_frozen(self):
+        """Write the frozen processes to frozen_file if they changed since the last write"""
+        if self.frozen_file is None:
+            return
+        with self.lock:
+            frozen = dict(self.frozen)
+            if frozen == self.frozen_saved:
+                return
+            tmp_file = self.frozen_file + ".tmp"
+            try:
+                with open(tmp_file, "w") as f:
+                    json.dump({str(pid): list(info) for pid, info in frozen.items()}, f)
+                os.replace(tmp_file, self.frozen_file)
+            except OSError:
+                # Retried after the next change
+                return
+            self.frozen_saved = frozen
+
+    def resume_saved(self):
+        """Resume what an earlier run left frozen, used at startup before the first scan
+
+        Everything is resumed, the first scan freezes again what is still
+        blocked. The create time check leaves processes that reused a PID alone.
+        """
+        if self.frozen_file is None:
+            return
+        try:
+            with open(self.frozen_file, "r") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for pid, info in saved.items():
+            try:
+                self._resume(int(pid), tuple(info))
+            except (TypeError, ValueError, IndexError):
+                continue
+        self.frozen_saved = None
+        self.save_frozen()
+
+    def _resume(self, pid, info):
+        try:
+            proc = self.source.process(pid)
+            # Never resume an unrelated process that reused the PID
+            if proc.create_time() == info[1]:
+                proc.resume()
+                self.record("resume", info[0], pid=pid, user=info[2])
+        except IGNORED_ERRORS:
+            pass
+
+
+class AppBlockThread(threading.Thread):
+    """Thread for blocking the apps of one quick block, all of them in one pass"""
+
+    def __init__(self, app_names, end_time, enforcer):
+        super().__init__(daemon=True)
+        self.app_names = frozenset(app_names)
+        self.targets = IdentityIndex(self.app_names)
+        self.end_time = end_time
+        self.enforcer = enforcer
+        self._stop_event = threading.Event()
+
+    def run(self):
+        clock = self.enforcer.clock
+        while not self._stop_event.is_set() and clock.now() < self.end_time:
+            # Check if the applications are running and kill or freeze them
+            self.enforcer.enforce_targets(self.targets)
+            # Sleep for a short time (stretched while a respawn storm is escalated)
+            clock.sleep(self.enforcer.scan_interval)
+
+    def discard(self, app_name):
+        """Stop watching one app, the thread ends with its last one"""
+        # Swapped as a whole, the running loop always sees a complete set
+        self.app_names = self.app_names - {app_name}
+        self.targets = IdentityIndex(self.app_names)
+        if not self.app_names:
+            self.stop()
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,738 @@
+"""Enforcement engine: persisted block state plus the watchdog that enforces it
+
+The engine is independent of the UI so enforcement can be rebuilt from the
+state file as the very first thing at startup, before any window exists.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import psutil
+
+from detox import platforms
+from detox.allowlist import AllowList
+from detox.audit import AuditLog
+from detox.clock import SystemClock
+from detox.enforcement import AppBlockThread, ProcessEnforcer, KILL
+from detox.identity import IdentityIndex
+from detox.intervals import IntervalSet
+from detox.quotas import QuotaTracker, next_midnight
+from detox.profiles import compile_profiles, has_network_rules
+from detox.rules import ALL_USERS, current_user, moment, normalize_user, split_network
+from detox.scheduler import DeadlineScheduler
+from detox.state import StateStore, StateError, split_expired
+
+# A tick that took this much longer than planned means the machine slept or
+# the wall clock was changed
+CLOCK_JUMP_SECONDS = 5
+
+
+def process_start_time():
+    try:
+        return psutil.Process().create_time()
+    except (psutil.Error, OSError):
+        return time.time()
+
+
+class DetoxEngine:
+    """Owns the block state and keeps it enforced"""
+
+    def __init__(self, data_file, clock=None, platform=None):
+        self.clock = clock or SystemClock()
+        self.platform = platform  # resolved on first use, see network_platform()
+        self.state_store = StateStore(data_file)
+        # Every rewrite of blocked_apps, routine_blocks or profiles and its
+        # rebuild_matcher() happen under this lock: the UI, the scheduler and
+        # the watchdog all change the rules
+        self.state_lock = threading.RLock()
+        self.blocked_apps = []
+        self.routine_blocks = []
+        self.profiles = []
+        self.active_profile = None
+        self.allowlist_session = None  # persisted {"apps", "user", "start_time", "end_time"}
+        self.allowlist = None  # compiled AllowList of the running session
+        self.internet_intervals = IntervalSet()
+        self.app_quotas = []
+        self.quota_tracker = QuotaTracker(self.state_store.section_file("quota_usage", ".json"))
+        self.audit = AuditLog(self.state_store.section_file("audit", ".log"), clock=self.clock)
+        self.cooling_period_minutes = 15
+        self.enforcement_mode = KILL
+        self.deny_exec = False
+        self.exec_guard = None
+        self.exec_guard_error = None
+        self.network_blocker = None
+        self.network_block_error = None
+        self.policy_source = ""
+        self.policy_sync_minutes = 5
+        self.block_threads = {}
+        self.internet_block_active = False
+        self.reapply_internet_block = False
+        self.internet_lock = threading.RLock()
+        self.snapshots = compile_profiles((), (), (), False)
+        self.snapshot = self.snapshots[None]
+        self.enforcer = None
+        self.load_error = None
+        self.watched = IdentityIndex()
+        self.watched_sources = (None, None)
+
+        # Cooling periods and block expiries, persisted across restarts
+        self.scheduler = DeadlineScheduler(self.state_store.section_file("deadlines", ".json"), self.clock.time)
+        self.scheduler.register("unblock", self.on_unblock_due)
+        self.scheduler.register("app_expiry", self.on_app_expiry)
+        self.scheduler.register("internet_expiry", self.on_internet_expiry)
+        self.scheduler.register("allowlist_expiry", self.on_allowlist_expiry)
+        self.listeners = []
+        self.save_lock = threading.Lock()
+
+        self.watchdog_thread = None
+        self.wake_event = threading.Event()
+        self.time_to_enforce = None
+        self.clock_jumps = 0
+
+    def load(self):
+        """Load the hot state, remembering the error for the UI to report"""
+        try:
+            data = self.state_store.load(self.clock.now())
+        except StateError as e:
+            self.load_error = e
+            data = {}
+        self.blocked_apps = data.get("blocked_apps", [])
+        self.routine_blocks = data.get("routine_blocks", [])
+        self.profiles = data.get("profiles", [])
+        self.active_profile = data.get("active_profile")
+        self.allowlist_session = data.get("allowlist_session")
+        self.allowlist = None
+        if self.allowlist_session:
+            try:
+                self.allowlist = AllowList.from_session(self.allowlist_session)
+            except (KeyError, TypeError, ValueError):
+                self.allowlist_session = None
+        self.internet_intervals = IntervalSet.from_blocks(data.get("internet_blocks", []), self.clock.now())
+        self.app_quotas = data.get("app_quotas", [])
+        self.quota_tracker.set_limits(self.app_quotas)
+        self.cooling_period_minutes = data.get("cooling_period_minutes", 15)
+        self.enforcement_mode = data.get("enforcement_mode", KILL)
+        self.deny_exec = data.get("deny_exec", False)
+        self.policy_source = data.get("policy_source", "")
+        self.policy_sync_minutes = data.get("policy_sync_minutes", 5)
+        self.rebuild_matcher()
+
+    def save(self):
+        """Persist the hot state, raises StateError"""
+        # State lock first, writers holding it may save
+        with self.state_lock, self.save_lock:
+            self._save()
+
+    def _save(self):
+        self.archive_expired_blocks()
+        data = {
+            "blocked_apps": self.blocked_apps,
+            "routine_blocks": self.routine_blocks,
+            "profiles": self.profiles,
+            "active_profile": self.active_profile,
+            "allowlist_session": self.allowlist_session,
+            "internet_blocks": self.internet_blocks,
+            "app_quotas": self.app_quotas,
+            "cooling_period_minutes": self.cooling_period_minutes,
+            "enforcement_mode": self.enforcement_mode,
+            "deny_exec": self.deny_exec,
+            "policy_source": self.policy_source,
+            "policy_sync_minutes": self.policy_sync_minutes
+        }
+        self.state_store.save(data)
+
+    def archive_expired_blocks(self):
+        """Move ended quick and internet blocks out of the hot state into the history"""
+        now = self.clock.now()
+        with self.state_lock:
+            active_apps, expired_apps = split_expired(self.blocked_apps, now)
+            expired_internet = []
+            if self.internet_intervals.ends and self.internet_intervals.ends[0] <= now:
+                ended = self.update_internet_intervals(lambda intervals: intervals.pop_ended(now))
+                expired_internet = IntervalSet(ended).to_blocks()
+            if not expired_apps and not expired_internet:
+                return
+
+            self.state_store.archive("blocked_apps", expired_apps)
+            self.state_store.archive("internet_blocks", expired_internet)
+            self.blocked_apps = active_apps
+            if expired_apps:
+                self.rebuild_matcher()
+
+    @property
+    def matcher(self):
+        return self.snapshot.matcher
+
+    @property
+    def network_matcher(self):
+        return self.snapshot.network_matcher
+
+    def rebuild_matcher(self):
+        """Recompile the block rules of every profile, call after every change to blocked_apps,
+        routine_blocks or profiles, under state_lock together with that change"""
+        with self.state_lock:
+            self._rebuild_matcher()
+
+    def _rebuild_matcher(self):
+        if self.enforcer is not None and (split_network(self.blocked_apps)[1] or split_network(self.routine_blocks)[1]
+                                          or has_network_rules(self.profiles)):
+            self.start_network_blocker()
+        snapshots = compile_profiles(self.profiles, self.blocked_apps, self.routine_blocks,
+                                     self.network_blocker is not None)
+        if self.active_profile not in snapshots:
+            self.active_profile = None
+        self.snapshots = snapshots
+        self.snapshot = snapshots[self.active_profile]
+        self.schedule_app_expiries()
+        if self.exec_guard is not None:
+            now = self.clock.now()
+            self.exec_guard.update(self.matcher, now, moment(now))
+
+    def schedule_app_expiries(self):
+        """One deadline per quick-blocked app at the end of its latest block"""
+        now = self.clock.time()
+        ends = {}
+        for app in self.blocked_apps:
+            if "end_time" not in app:
+                continue
+            try:
+                end = datetime.fromisoformat(app["end_time"]).timestamp()
+            except (TypeError, ValueError):
+                continue
+            if end > now and end > ends.get(app["name"], 0):
+                ends[app["name"]] = end
+        self.scheduler.schedule_many(
+            [(f"expiry:app:{name}", "app_expiry", end, {"name": name}) for name, end in ends.items()],
+            replace_kind="app_expiry"
+        )
+
+    def update_rules(self, change):
+        """Swap in change(blocked_apps, routine_blocks) -> (blocked_apps, routine_blocks)
+
+        The lists are read, replaced and recompiled under the state lock, so a
+        concurrent unblock or quota block is never lost. change returns None
+        to leave the rules as they are; returns whether they changed.
+        """
+        with self.state_lock:
+            rules = change(self.blocked_apps, self.routine_blocks)
+            if rules is None:
+                return False
+            self.blocked_apps, self.routine_blocks = rules
+            self.rebuild_matcher()
+        return True
+
+    @property
+    def internet_blocks(self):
+        """Internet blocks as stored in the state file, one entry per merged interval"""
+        return self.internet_intervals.to_blocks()
+
+    def schedule_internet_expiry(self):
+        """A single deadline at the next end of an internet block"""
+        end = self.internet_intervals.next_end(self.clock.now())
+        deadlines = [("expiry:internet", "internet_expiry", end.timestamp(), None)] if end else []
+        self.scheduler.schedule_many(deadlines, replace_kind="internet_expiry")
+
+    def update_internet_intervals(self, change):
+        """Apply change(intervals) to a copy and swap it in, readers never see a partial update"""
+        with self.internet_lock:
+            intervals = self.internet_intervals.copy()
+            result = change(intervals)
+            self.internet_intervals = intervals
+        self.schedule_internet_expiry()
+        return result
+
+    def block_internet(self, duration_minutes):
+        """Block the internet from now on, merging with any block already running"""
+        now = self.clock.now()
+        end_time = now + timedelta(minutes=duration_minutes)
+        self.update_internet_intervals(lambda intervals: intervals.add(now, end_time))
+        return end_time
+
+    def extend_internet_block(self, additional_minutes):
+        """Push back the end of the running internet block, returns None if there is none"""
+        now = self.clock.now()
+        return self.update_internet_intervals(
+            lambda intervals: intervals.extend(now, timedelta(minutes=additional_minutes))
+        )
+
+    def block_app(self, app_name, duration_minutes, network=False):
+        """Quick-block an app from now on, replacing any block of the same kind it already has
+
+        With `network` only the app's network access is blocked. Returns the end time.
+        """
+        return self.block_apps((app_name,), duration_minutes, network)
+
+    def block_apps(self, app_names, duration_minutes, network=False):
+        """Quick-block several apps with one rule update, see block_app(); returns the end time"""
+        now = self.clock.now()
+        end_time = now + timedelta(minutes=duration_minutes)
+        names = set(app_names)
+        blocks = []
+        for app_name in dict.fromkeys(app_names):
+            block = {
+                "name": app_name,
+                "start_time": now.isoformat(),
+                "end_time": end_time.isoformat()
+            }
+            if network:
+                block["network"] = True
+            blocks.append(block)
+        self.update_rules(lambda blocked_apps, routine_blocks: (
+            [app for app in blocked_apps if app["name"] not in names or bool(app.get("network")) != network] + blocks,
+            routine_blocks
+        ))
+        if network:
+            self.wake()
+        return end_time
+
+    def activate_profile(self, name):
+        """Enforce the rules of profile `name` (None for no profile) from now on
+
+        The snapshot was compiled with the rules, so this is a single swap;
+        the watchdog applies it on its next tick, which is made right away.
+        """
+        snapshot = self.snapshots.get(name)
+        if snapshot is None:
+            raise ValueError(f"No profile named {name}")
+        self.active_profile = name
+        self.snapshot = snapshot
+        self.wake()
+        self.audit.record("profile", name)
+
+    def set_profile(self, profile):
+        """Add or replace a profile by name, call save() afterwards"""
+        with self.state_lock:
+            self.profiles = [existing for existing in self.profiles if existing["name"] != profile["name"]] + [profile]
+            self.rebuild_matcher()
+
+    def delete_profile(self, name):
+        with self.state_lock:
+            self.profiles = [profile for profile in self.profiles if profile["name"] != name]
+            self.rebuild_matcher()
+
+    def start_allowlist(self, apps, duration_minutes):
+        """Close every app of ours except `apps` for the next minutes, returns the end time
+
+        Raises ValueError when Digital Detox runs as a system account.
+        """
+        now = self.clock.now()
+        end_time = now + timedelta(minutes=duration_minutes)
+        session = {
+            "apps": list(apps),
+            "user": current_user(),
+            "start_time": now.isoformat(),
+            "end_time": end_time.isoformat()
+        }
+        self.allowlist = AllowList.from_session(session)
+        self.allowlist_session = session
+        self.scheduler.schedule("allowlist_expiry", end_time.timestamp(), {}, "expiry:allowlist")
+        self.audit.record("allowlist_started", None, apps=session["apps"], until=session["end_time"])
+        self.wake()
+        return end_time
+
+    def end_allowlist(self):
+        """Stop the allowlist session and move it to the history"""
+        session, self.allowlist_session = self.allowlist_session, None
+        self.allowlist = None
+        self.scheduler.cancel("expiry:allowlist")
+        if session is not None:
+            try:
+                self.state_store.archive("allowlist_sessions", [session])
+            except StateError:
+                pass
+
+    def set_quota(self, app_name, minutes):
+        """Limit an app to `minutes` of use per day, 0 removes the quota"""
+        quotas = [quota for quota in self.app_quotas if quota["name"] != app_name]
+        if minutes > 0:
+            quotas.append({"name": app_name, "minutes": minutes})
+        self.app_quotas = quotas
+        self.quota_tracker.set_limits(quotas)
+
+    def block_exhausted_quotas(self, names, now):
+        """Block apps that used up their daily quota until midnight"""
+        end_time = next_midnight(now).isoformat()
+        blocks = [{"name": name, "end_time": end_time, "quota": True} for name in names]
+        self.update_rules(lambda blocked_apps, routine_blocks: (blocked_apps + blocks, routine_blocks))
+        try:
+            self.save()
+        except StateError:
+            pass
+        for name in names:
+            self.audit.record("quota_exhausted", name, until=end_time)
+            self.notify("quota_exhausted", {"block_type": "app", "target": name})
+
+    def add_listener(self, listener):
+        """listener(event, details) is called from engine threads on "unblocked", "block_expired" and "quota_exhausted" """
+        self.listeners.append(listener)
+
+    def notify(self, event, details):
+        for listener in self.listeners:
+            try:
+                listener(event, details)
+            except Exception:
+                pass
+
+    def request_unblock(self, block_type, target=None):
+        """Start the cooling period for an unblock, returns the pending deadline"""
+        deadline_id = f"unblock:{block_type}:{target or ''}"
+        pending = self.scheduler.get(deadline_id)
+        if pending is None:
+            due = self.clock.time() + self.cooling_period_minutes * 60
+            self.scheduler.schedule("unblock", due, {"block_type": block_type, "target": target}, deadline_id)
+            pending = self.scheduler.get(deadline_id)
+            self.audit.record("unblock_requested", target, block_type=block_type, cooling_minutes=self.cooling_period_minutes)
+        return pending
+
+    def cancel_unblock(self, deadline):
+        """Withdraw a pending unblock request"""
+        self.scheduler.cancel(deadline["id"])
+        payload = deadline["payload"]
+        self.audit.record("unblock_cancelled", payload.get("target"), block_type=payload["block_type"])
+
+    def unblock(self, block_type, target=None):
+        """Remove a block right away, raises if the network cannot be restored"""
+        self.audit.record("unblocked", target, block_type=block_type)
+        if block_type == "app" and target:
+            # Remove app from quick blocked list
+            self.update_rules(lambda blocked_apps, routine_blocks: (
+                [app for app in blocked_apps if app["name"] != target], routine_blocks
+            ))
+
+            # Resume the app right away if it was frozen, and give it its network back
+            self.enforcer.release(self.matcher, moment(self.clock.now()))
+            self.wake()
+
+            # Stop blocking thread if exists
+            self.stop_block_thread(target)
+            self.save()
+
+        elif block_type == "allowlist":
+            self.end_allowlist()
+            self.save()
+
+        elif block_type == "profile":
+            # Leaving a profile weakens the blocks like an unblock does, target is the profile to switch to
+            self.activate_profile(target or None)
+            self.enforcer.release(self.matcher, moment(self.clock.now()))
+            self.save()
+
+        elif block_type == "internet":
+            # Cut every internet block at the current time
+            now = self.clock.now()
+            self.update_internet_intervals(lambda intervals: intervals.remove(now, datetime.max))
+            self.save()
+
+            # Enable network adapters
+            self.enable_network_adapters()
+            self.internet_block_active = False
+
+    def on_unblock_due(self, deadline):
+        payload = deadline["payload"]
+        error = None
+        try:
+            self.unblock(payload["block_type"], payload.get("target"))
+        except Exception as e:
+            error = str(e)
+        self.notify("unblocked", dict(payload, error=error))
+
+    def on_app_expiry(self, deadline):
+        name = deadline["payload"]["name"]
+        now = self.clock.now()
+        # Resume frozen processes and drop the per-app thread as soon as the block ends
+        self.enforcer.release(self.matcher, moment(now))
+        thread = self.block_threads.get(name)
+        if thread is not None and thread.end_time <= now:
+            self.stop_block_thread(name)
+        if self.network_matcher.names:
+            self.wake()
+        self.notify("block_expired", {"block_type": "app", "target": name})
+
+    def on_allowlist_expiry(self, deadline):
+        allowlist = self.allowlist
+        if allowlist is None:
+            return
+        if allowlist.is_active(self.clock.now()):
+            # Stale deadline of an earlier session
+            return
+        self.end_allowlist()
+        try:
+            self.save()
+        except StateError:
+            pass
+        self.notify("block_expired", {"block_type": "allowlist", "target": None})
+
+    def on_internet_expiry(self, deadline):
+        # The watchdog restores the network on its next tick, make that tick now
+        self.wake()
+        self.notify("block_expired", {"block_type": "internet", "target": None})
+
+    def start(self):
+        """Rebuild enforcement from the persisted state and start the watchdog
+
+        Runs before the UI is created: the first enforcement pass happens
+        synchronously here, and time_to_enforce records how long after the
+        process was launched it completed.
+        """
+        # Deadlines first, loading the state reschedules block expiries into them
+        self.scheduler.load()
+        self.load()
+        self.audit.start()
+        self.enforcer = ProcessEnforcer(self.enforcement_mode, clock=self.clock,
+                                        frozen_file=self.state_store.section_file("frozen", ".json"))
+        self.enforcer.audit = self.audit
+        # Processes a crashed run left stopped, the first pass below freezes what is still blocked
+        self.enforcer.resume_saved()
+        # Network-only blocks are kept apart from here on, if nftables can enforce them
+        self.rebuild_matcher()
+        if self.deny_exec:
+            self.start_exec_guard()
+        self.schedule_internet_expiry()
+
+        # Quick blocks get their fast per-app threads back after a restart,
+        # one per batch of apps blocked together
+        now = self.clock.now()
+        for end_time, names in self.block_thread_batches(now).items():
+            self.start_block_threads(names, end_time)
+
+        self.enforce(now)
+        self.time_to_enforce = time.time() - process_start_time()
+
+        self.watchdog_thread = threading.Thread(target=self.block_watchdog, daemon=True)
+        self.watchdog_thread.start()
+        self.scheduler.start()
+
+    def start_exec_guard(self):
+        """Deny blocked executables before they run, returns False where fanotify is unavailable"""
+        # Imported here, the guard only exists on Linux
+        from detox.exec_guard import ExecGuard
+
+        if self.exec_guard is not None:
+            return True
+        guard = ExecGuard()
+        if not guard.start():
+            self.exec_guard_error = guard.error
+            return False
+        now = self.clock.now()
+        guard.update(self.matcher, now, moment(now))
+        guard.audit = self.audit
+        self.exec_guard = guard
+        return True
+
+    def start_network_blocker(self):
+        """Set up per-app network blocking once, returns False where it is unavailable"""
+        if self.network_blocker is not None:
+            return True
+        if self.network_block_error is not None:
+            return False
+        # Imported here, the blocker only exists on Linux
+        from detox.netblock import create_network_blocker
+
+        try:
+            blocker = create_network_blocker()
+        except OSError as e:
+            self.network_block_error = e
+            return False
+        if blocker is None:
+            self.network_block_error = OSError("needs nftables and a writable cgroup v2 tree")
+            return False
+        self.network_blocker = blocker
+        return True
+
+    def stop_exec_guard(self):
+        guard, self.exec_guard = self.exec_guard, None
+        if guard is not None:
+            guard.stop()
+
+    def set_deny_exec(self, enabled):
+        """Turn pre-exec denial on or off, returns whether it is active"""
+        if enabled:
+            self.deny_exec = self.start_exec_guard()
+        else:
+            self.stop_exec_guard()
+            self.deny_exec = False
+        return self.deny_exec
+
+    def release_all(self):
+        """Resume frozen processes and give network-blocked apps their network back"""
+        self.enforcer.release_all()
+        if self.network_blocker is not None:
+            try:
+                self.network_blocker.release_all()
+            except OSError:
+                pass
+
+    def shutdown(self):
+        """Leave nothing blocked behind and write out the audit log, used on exit"""
+        self.release_all()
+        self.audit.record("shutdown")
+        self.audit.close()
+
+    def start_block_thread(self, app_name, end_time):
+        self.start_block_threads((app_name,), end_time)
+
+    def block_thread_batches(self, now, missing_only=False):
+        """{end_time: names} of the running quick blocks that get a per-app thread
+
+        The threads only ever close the owner's processes, so blocks scoped
+        to another user are left to the watchdog scan, which honors the scope.
+        """
+        owner = self.enforcer.owner
+        batches = {}
+        for app in self.blocked_apps:
+            if "end_time" not in app or app.get("network"):
+                continue
+            if normalize_user(app.get("user")) not in ("", owner, ALL_USERS):
+                continue
+            end_time = datetime.fromisoformat(app["end_time"])
+            if end_time <= now:
+                continue
+            thread = self.block_threads.get(app["name"])
+            if missing_only and thread is not None and thread.is_alive():
+                continue
+            batches.setdefault(end_time, []).append(app["name"])
+        return batches
+
+    def start_block_threads(self, app_names, end_time):
+        """One thread watching all of `app_names` until end_time"""
+        for app_name in app_names:
+            self.stop_block_thread(app_name)
+        thread = AppBlockThread(app_names, end_time, self.enforcer)
+        thread.start()
+        for app_name in app_names:
+            self.block_threads[app_name] = thread
+
+    def stop_block_thread(self, app_name):
+        thread = self.block_threads.pop(app_name, None)
+        if thread is not None:
+            thread.discard(app_name)
+
+    def wake(self):
+        """Run the next watchdog tick right away instead of after the interval"""
+        self.wake_event.set()
+
+    def internet_should_be_blocked(self, current_time):
+        return self.internet_intervals.contains(current_time)
+
+    def enforce(self, current_time):
+        """One enforcement pass over apps and internet"""
+        self.enforce_apps(current_time)
+        self.enforce_internet(current_time)
+
+    def enforce_apps(self, current_time):
+        # One snapshot for the whole tick, a profile switch takes effect on the next one
+        snapshot = self.snapshot
+        matcher, network_matcher = snapshot.matcher, snapshot.network_matcher
+
+        # Keep the pre-exec index in step with the rules, blocked programs
+        # then never start and the scan below only meets those already running
+        guard = self.exec_guard
+        if guard is not None:
+            guard.update(matcher, current_time, moment(current_time))
+
+        # Enforce quick and routine app blocks in a single process scan, which
+        # also reports the running quota and network-blocked apps
+        watched = self.watched_index(network_matcher)
+        allowlist = self.allowlist
+        if allowlist is not None and not allowlist.is_active(current_time):
+            allowlist = None
+        seen = self.enforcer.scan(matcher, current_time, watched, allowlist)
+
+        owner = self.enforcer.owner
+        running = {name for name, procs in seen.items() if any(user == owner for _, user in procs)}
+        exhausted = self.quota_tracker.observe(running, current_time)
+        if exhausted:
+            self.block_exhausted_quotas(exhausted, current_time)
+            # Close them in this tick rather than the next one
+            self.enforcer.scan(self.matcher, current_time)
+
+        blocker = self.network_blocker
+        if blocker is not None and (network_matcher.names or blocker.applied):
+            applied = blocker.applied
+            try:
+                blocker.sync(network_matcher, moment(current_time), seen)
+                self.network_block_error = None
+            except OSError as e:
+                # Retried on the next tick
+                if self.network_block_error is None:
+                    self.audit.record("network_rules", None, error=str(e))
+                self.network_block_error = e
+            if blocker.applied != applied:
+                self.audit.record("network_rules", None, offline=blocker.blocked)
+
+    def watched_index(self, network_matcher):
+        """Identity index of the quota and network-blocked apps, rebuilt when either is swapped"""
+        limits = self.quota_tracker.limits
+        sources = self.watched_sources
+        if sources[0] is not limits or sources[1] is not network_matcher:
+            # Quota names come first, the quota tracker needs them verbatim
+            self.watched = IdentityIndex(list(limits) + sorted(network_matcher.targets))
+            self.watched_sources = (limits, network_matcher)
+        return self.watched
+
+    def enforce_internet(self, current_time):
+        # Enforce internet block if needed
+        internet_should_be_blocked = self.internet_should_be_blocked(current_time)
+        if internet_should_be_blocked and (not self.internet_block_active or self.reapply_internet_block):
+            try:
+                self.disable_network_adapters()
+                self.internet_block_active = True
+                self.reapply_internet_block = False
+                self.audit.record("internet_off")
+            except Exception as e:
+                self.audit.record("internet_off", error=str(e))
+        elif not internet_should_be_blocked and self.internet_block_active:
+            try:
+                self.enable_network_adapters()
+                self.internet_block_active = False
+                self.audit.record("internet_on")
+            except Exception as e:
+                self.audit.record("internet_on", error=str(e))
+
+    def block_watchdog(self):
+        """Thread to continuously enforce blocks"""
+        last_wall = self.clock.time()
+        last_monotonic = self.clock.monotonic()
+        while True:
+            interval = self.enforcer.scan_interval
+            self.clock.wait(self.wake_event, interval)
+            self.wake_event.clear()
+
+            # Detect sleep/resume and wall clock changes: either clock moved much
+            # further than we slept, or the two clocks disagree
+            wall_delta = self.clock.time() - last_wall
+            monotonic_delta = self.clock.monotonic() - last_monotonic
+            if (abs(wall_delta - monotonic_delta) > CLOCK_JUMP_SECONDS
+                    or monotonic_delta > interval + CLOCK_JUMP_SECONDS
+                    or wall_delta > interval + CLOCK_JUMP_SECONDS):
+                self.on_clock_jump()
+
+            try:
+                self.enforce(self.clock.now())
+            except Exception:
+                # Never let a bad rule or a transient error kill enforcement
+                pass
+            last_wall, last_monotonic = self.clock.time(), self.clock.monotonic()
+
+    def on_clock_jump(self):
+        """Resync after the machine resumed from sleep or the clock changed"""
+        self.clock_jumps += 1
+        self.audit.record("clock_jump")
+        self.scheduler.wake()
+        # Network adapters may have been reset while asleep, re-apply the block
+        self.reapply_internet_block = self.internet_block_active
+        # Per-app threads compare against wall time, restart those that ended early
+        now = self.clock.now()
+        for end_time, names in self.block_thread_batches(now, missing_only=True).items():
+            self.start_block_threads(names, end_time)
+
+    def network_platform(self):
+        if self.platform is None:
+            self.platform = platforms.current()
+        return self.platform
+
+    def disable_network_adapters(self):
+        self.network_platform().disable_network()
+
+    def enable_network_adapters(self):
+        self.network_platform().enable_network()
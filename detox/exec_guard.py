@@ -0,0 +1,260 @@
+"""Pre-exec denial of blocked executables through fanotify (Linux)
+
+With the "deny_exec" setting on, every exec on the host raises a fanotify
+FAN_OPEN_EXEC_PERM event that waits for our answer. The answer comes from an
+index of the executable names that are blocked right now, rebuilt by the
+enforcement thread whenever the rules change or a block starts or ends, so a
+permission check is a readlink and a set lookup. A denied program never
+starts, instead of being started and then killed by the next scan.
+
+fanotify needs Linux 5.0+ and CAP_SYS_ADMIN. ExecGuard.start() returns False
+wherever it cannot be set up, and enforcement keeps working by scanning the
+process table as before; the scan stays on either way to catch processes that
+were already running when a block started.
+"""
+import ctypes
+import os
+import select
+import struct
+import threading
+import time
+from datetime import timedelta
+
+from detox.enforcement import PROTECTED_PROCESSES
+from detox.identity import identity
+from detox.rules import ALL_USERS, normalize_user
+
+try:
+    import pwd
+except ImportError:
+    pwd = None
+
+FAN_CLOEXEC = 0x01
+FAN_CLASS_CONTENT = 0x04
+FAN_OPEN_EXEC_PERM = 0x00040000
+FAN_MARK_ADD = 0x01
+FAN_MARK_MOUNT = 0x10
+FAN_ALLOW = 0x01
+FAN_DENY = 0x02
+AT_FDCWD = -100
+O_LARGEFILE = 0o100000
+
+EVENT_METADATA = struct.Struct("=IBBHQii")
+RESPONSE = struct.Struct("=iI")
+
+# Filesystems nobody runs programs from
+PSEUDO_FILESYSTEMS = frozenset((
+    "proc", "sysfs", "cgroup", "cgroup2", "devpts", "mqueue", "debugfs", "tracefs", "securityfs",
+    "pstore", "bpf", "configfs", "fusectl", "hugetlbfs", "autofs", "binfmt_misc", "devtmpfs", "nsfs"
+))
+
+PROTECTED_IDENTITIES = frozenset(identity(name) for name in PROTECTED_PROCESSES)
+
+
+def load_libc():
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.fanotify_init.argtypes = [ctypes.c_uint, ctypes.c_uint]
+    libc.fanotify_init.restype = ctypes.c_int
+    libc.fanotify_mark.argtypes = [ctypes.c_int, ctypes.c_uint, ctypes.c_uint64, ctypes.c_int, ctypes.c_char_p]
+    libc.fanotify_mark.restype = ctypes.c_int
+    return libc
+
+
+def exec_mounts(mountinfo="/proc/self/mountinfo"):
+    """Mount points of the filesystems programs can be started from"""
+    mounts = []
+    with open(mountinfo, "r") as f:
+        for line in f:
+            fields, _, rest = line.partition(" - ")
+            fstype = rest.split(" ", 1)[0]
+            if fstype in PSEUDO_FILESYSTEMS:
+                continue
+            # Mount points escape spaces and friends as octal
+            mounts.append(fields.split(" ")[4].encode().decode("unicode_escape"))
+    return mounts
+
+
+class ExecIndex:
+    """Executable identities (detox.identity) blocked at one moment, per normalized user"""
+
+    def __init__(self, blocked=None, valid_until=None):
+        self.blocked = blocked or {}  # user -> frozenset of identities, ALL_USERS for everyone
+        self.valid_until = valid_until
+
+    @classmethod
+    def build(cls, matcher, now, when):
+        """Evaluate every rule once for `when` (from moment(now))"""
+        blocked = {}
+        valid_until = now.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for user, rules in matcher.scopes.items():
+            names = set()
+            for name in rules.names():
+                if name in PROTECTED_IDENTITIES or not rules.is_blocked(name, when):
+                    continue
+                names.add(name)
+                end_time = rules.quick_blocks.get(name)
+                if end_time is not None and now < end_time < valid_until:
+                    valid_until = end_time
+            if names:
+                blocked[user] = frozenset(names)
+        return cls(blocked, valid_until)
+
+    def is_blocked(self, name, user):
+        # The executable's full file name, never truncated like a process name
+        name = identity(name)
+        names = self.blocked.get(user)
+        if names is not None and name in names:
+            return True
+        names = self.blocked.get(ALL_USERS)
+        return names is not None and name in names
+
+
+class ExecGuard:
+    """Answers fanotify exec permission events from an ExecIndex"""
+
+    def __init__(self):
+        self.fd = None
+        self.wake_fds = None  # (read, write) pipe that tells the event thread to stop
+        self.thread = None
+        self.index = ExecIndex()
+        self.matcher = None
+        self.uid_names = {}
+        self.protected_pids = {os.getpid()}
+        self.error = None
+        self.audit = None  # detox.audit.AuditLog, set by the engine
+
+        # Metrics shown on the dashboard
+        self.checks = 0
+        self.denied = 0
+        self.check_seconds = 0.0
+
+    def start(self):
+        """Start answering exec events, False (with self.error set) if fanotify is unavailable"""
+        try:
+            libc = load_libc()
+            fd = libc.fanotify_init(FAN_CLASS_CONTENT | FAN_CLOEXEC, os.O_RDONLY | O_LARGEFILE)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        except (OSError, AttributeError) as e:
+            # AttributeError: no fanotify in this libc (not Linux)
+            self.error = e
+            return False
+
+        marked = 0
+        for mount in exec_mounts():
+            if libc.fanotify_mark(fd, FAN_MARK_ADD | FAN_MARK_MOUNT, FAN_OPEN_EXEC_PERM,
+                                  AT_FDCWD, os.fsencode(mount)) == 0:
+                marked += 1
+        if not marked:
+            os.close(fd)
+            self.error = OSError(ctypes.get_errno(), "fanotify_mark failed on every mount")
+            return False
+
+        self.fd = fd
+        self.wake_fds = os.pipe()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Let every pending and future exec through
+
+        Only the event thread closes the fanotify group, once it answered the
+        events it already read, so it never writes to a closed (or reused)
+        descriptor. The write end of the wake pipe is ours to close.
+        """
+        wake_fds, self.wake_fds = self.wake_fds, None
+        if wake_fds is None:
+            return
+        try:
+            os.write(wake_fds[1], b"x")
+        except OSError:
+            # The thread already ended on a read error
+            pass
+        os.close(wake_fds[1])
+
+    @property
+    def active(self):
+        return self.wake_fds is not None
+
+    def update(self, matcher, now, when):
+        """Rebuild the index when the rules changed or a block started or ended"""
+        index = self.index
+        if matcher is self.matcher and index.valid_until is not None and now < index.valid_until:
+            return
+        self.matcher = matcher
+        # Swapped as a whole, the event thread always sees a complete index
+        self.index = ExecIndex.build(matcher, now, when)
+
+    def user_of(self, pid):
+        uid = os.stat(f"/proc/{pid}").st_uid
+        user = self.uid_names.get(uid)
+        if user is None:
+            try:
+                user = pwd.getpwuid(uid).pw_name if pwd else str(uid)
+            except KeyError:
+                user = str(uid)
+            user = self.uid_names[uid] = normalize_user(user)
+        return user
+
+    def decide(self, event_fd, pid):
+        if pid in self.protected_pids:
+            return FAN_ALLOW
+        index = self.index
+        if not index.blocked:
+            return FAN_ALLOW
+        name = os.path.basename(os.readlink(f"/proc/self/fd/{event_fd}"))
+        user = self.user_of(pid)
+        if index.is_blocked(name, user):
+            if self.audit is not None:
+                self.audit.record("exec_denied", name, pid=pid, user=user)
+            return FAN_DENY
+        return FAN_ALLOW
+
+    def run(self):
+        fd = self.fd
+        wake_fds = self.wake_fds
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        poller.register(wake_fds[0], select.POLLIN)
+        try:
+            while True:
+                ready = {ready_fd for ready_fd, _ in poller.poll()}
+                if wake_fds[0] in ready:
+                    return
+                try:
+                    data = os.read(fd, 4096)
+                except OSError:
+                    return
+                self.answer(fd, data)
+        finally:
+            # Closing the group lets the events nobody read yet through
+            self.fd = None
+            os.close(fd)
+            os.close(wake_fds[0])
+
+    def answer(self, fd, data):
+        """Answer every event of one read"""
+        offset = 0
+        while offset + EVENT_METADATA.size <= len(data):
+            event_len, _, _, _, mask, event_fd, pid = EVENT_METADATA.unpack_from(data, offset)
+            offset += event_len or EVENT_METADATA.size
+            if event_fd < 0:
+                continue
+            started = time.perf_counter()
+            response = FAN_ALLOW
+            try:
+                if mask & FAN_OPEN_EXEC_PERM:
+                    response = self.decide(event_fd, pid)
+            except OSError:
+                # Never hold up an exec because of our own error
+                response = FAN_ALLOW
+            finally:
+                try:
+                    os.write(fd, RESPONSE.pack(event_fd, response))
+                except OSError:
+                    pass
+                os.close(event_fd)
+            self.checks += 1
+            self.denied += response == FAN_DENY
+            self.check_seconds += time.perf_counter() - started
@@ -0,0 +1,92 @@
+"""Normalized process identities shared by every name match
+
+A block rule names an app the way the user typed it or the policy server
+sent it ("Firefox", "firefox.exe", "C:\\Program Files\\Mozilla Firefox\\firefox.exe"),
+while the process table reports it the way the platform does: "firefox.exe"
+on Windows, "firefox" on Linux, where the name (comm) is also cut to its
+first 15 bytes. All of these reduce to one identity:
+
+    identity("C:\\Apps\\Firefox.EXE") == identity("firefox") == "firefox"
+
+that is the executable's basename, casefolded, without a trailing ".exe".
+
+An IdentityIndex maps every form a target can show up under, including the
+truncated comm form of long names, to that target. It is built once when the
+rules change, and remembers the answer for every raw process name it was
+asked about, so matching a process is a single dict lookup whatever the
+platform.
+"""
+
+# Linux process names (comm) are cut to 15 bytes
+COMM_LENGTH = 15
+
+# Distinct raw process names remembered before the lookup cache starts over
+CACHE_LIMIT = 8192
+
+
+def basename(name):
+    """Last path component, with either separator whatever the platform"""
+    return name.rsplit("/", 1)[-1].rsplit("\\", 1)[-1]
+
+
+def strip_exe(name):
+    return name[:-len(".exe")] if name.endswith(".exe") else name
+
+
+def identity(name):
+    """Normalized identity of a rule target or process name"""
+    return strip_exe(basename(name).casefold())
+
+
+def comm_name(name):
+    """The name Linux reports for a process started from `name`"""
+    return basename(name).encode()[:COMM_LENGTH].decode(errors="ignore")
+
+
+def name_forms(name):
+    """Identities a target can be reported under: full and comm-truncated"""
+    forms = {identity(name)}
+    truncated = comm_name(name)
+    if truncated != basename(name):
+        forms.add(identity(truncated))
+    forms.discard("")
+    return forms
+
+
+class IdentityIndex:
+    """Every form of a set of targets mapped to the target, with a per-name cache
+
+    `key` maps a target to the value lookups return, the target itself by
+    default. The first target wins when several reduce to the same identity.
+    """
+
+    def __init__(self, targets=(), key=None):
+        self.forms = {}
+        full = {}
+        for target in targets:
+            value = key(target) if key else target
+            for form in name_forms(target):
+                self.forms.setdefault(form, value)
+            full.setdefault(identity(target), value)
+        # A full name wins over another target's truncated form
+        self.forms.update(full)
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.forms)
+
+    def __contains__(self, name):
+        return bool(self.lookup(name))
+
+    def lookup(self, name):
+        """Target a process or executable name stands for, "" if none"""
+        target = self.cache.get(name)
+        if target is None:
+            if not name:
+                return ""
+            cache = self.cache
+            if len(cache) >= CACHE_LIMIT:
+                # Swapped as a whole, other threads keep their own reference
+                cache = self.cache = {}
+            target = cache[name] = self.forms.get(identity(name), "")
+        return target
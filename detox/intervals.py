@@ -0,0 +1,115 @@
+"""Normalized set of time intervals used for internet blocks"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+
+class IntervalSet:
+    """Sorted, non-overlapping [start, end) intervals kept as two parallel lists
+
+    Overlapping or touching intervals are merged on insert, so "blocked at t"
+    and "blocked until" are a single binary search.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in intervals:
+            self.add(start, end)
+
+    @classmethod
+    def from_blocks(cls, blocks, default_start=None):
+        """Build from stored {"start_time", "end_time"} entries"""
+        intervals = cls()
+        for block in blocks:
+            if "end_time" not in block:
+                continue
+            try:
+                end = datetime.fromisoformat(block["end_time"])
+                start = datetime.fromisoformat(block["start_time"]) if "start_time" in block else None
+            except (TypeError, ValueError):
+                continue
+            intervals.add(start or default_start or end, end)
+        return intervals
+
+    def to_blocks(self):
+        return [{"start_time": start.isoformat(), "end_time": end.isoformat()}
+                for start, end in zip(self.starts, self.ends)]
+
+    def copy(self):
+        intervals = IntervalSet()
+        intervals.starts = list(self.starts)
+        intervals.ends = list(self.ends)
+        return intervals
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def add(self, start, end):
+        """Insert [start, end), merging with every interval it overlaps or touches"""
+        if end <= start:
+            return
+        i = bisect_left(self.ends, start)
+        j = bisect_right(self.starts, end)
+        if i < j:
+            start = min(start, self.starts[i])
+            end = max(end, self.ends[j - 1])
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def remove(self, start, end):
+        """Subtract [start, end), trimming or splitting the intervals it covers"""
+        if end <= start:
+            return
+        i = bisect_right(self.ends, start)
+        j = bisect_left(self.starts, end)
+        if i >= j:
+            return
+        new_starts, new_ends = [], []
+        if self.starts[i] < start:
+            new_starts.append(self.starts[i])
+            new_ends.append(start)
+        if self.ends[j - 1] > end:
+            new_starts.append(end)
+            new_ends.append(self.ends[j - 1])
+        self.starts[i:j] = new_starts
+        self.ends[i:j] = new_ends
+
+    def find(self, t):
+        """Index of the interval containing t, or -1"""
+        i = bisect_right(self.starts, t) - 1
+        if i >= 0 and t < self.ends[i]:
+            return i
+        return -1
+
+    def contains(self, t):
+        return self.find(t) >= 0
+
+    def blocked_until(self, t):
+        """End of the interval containing t, or None when t is not covered"""
+        i = self.find(t)
+        return self.ends[i] if i >= 0 else None
+
+    def next_end(self, t):
+        """First interval end after t, or None"""
+        i = bisect_right(self.ends, t)
+        return self.ends[i] if i < len(self.ends) else None
+
+    def extend(self, t, delta):
+        """Push the end of the interval containing t back by delta, returns the new end"""
+        i = self.find(t)
+        if i < 0:
+            return None
+        end = self.ends[i]
+        self.add(end, end + delta)
+        return self.blocked_until(t)
+
+    def pop_ended(self, t):
+        """Remove and return the intervals that ended by t"""
+        k = bisect_right(self.ends, t)
+        ended = list(zip(self.starts[:k], self.ends[:k]))
+        del self.starts[:k]
+        del self.ends[:k]
+        return ended
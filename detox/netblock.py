@@ -0,0 +1,137 @@
+"""Per-app network blocks through nftables and cgroup v2 (Linux)
+
+Block rules with "network": true cut an app off the network instead of
+closing it. The running processes of such an app are moved into a cgroup of
+their own (digital-detox/net-<user>-<target>, see detox.cgroups), where
+everything they start is created too, and a single nftables table rejects
+the outgoing packets of every socket owned by those groups:
+
+    table inet digital_detox {
+        chain output {
+            type filter hook output priority 0; policy accept;
+            socket cgroupv2 level 2 "digital-detox/net-alice-firefox" reject
+        }
+    }
+
+Every other app, and the adapters themselves, are never touched. Whenever a
+block starts or ends the whole table is replaced in one `nft -f`
+transaction, so packets always meet either the old or the new rule set.
+
+Needs the nft command, a writable cgroup v2 tree and CAP_NET_ADMIN.
+create_network_blocker() returns None where any of these is missing, and the
+engine then closes network-blocked apps like any other blocked app.
+"""
+import shutil
+import subprocess
+
+from detox import cgroups
+
+TABLE = "digital_detox"
+
+
+def ruleset(paths):
+    """nft script replacing our table with one that rejects the traffic of `paths`
+
+    Adding the table first makes the delete succeed when it does not exist
+    yet; nft applies the whole script as one transaction.
+    """
+    lines = [f"add table inet {TABLE}", f"delete table inet {TABLE}"]
+    if paths:
+        lines += [
+            f"table inet {TABLE} {{",
+            "    chain output {",
+            "        type filter hook output priority 0; policy accept;"
+        ]
+        for path in paths:
+            lines.append(f'        socket cgroupv2 level {path.count("/") + 1} "{path}" reject')
+        lines += ["    }", "}"]
+    return "\n".join(lines) + "\n"
+
+
+class NetworkGroups(cgroups.CgroupTree):
+    """Unfrozen groups holding the processes of network-blocked apps"""
+
+    prefix = "net-"
+
+
+class NetworkBlocker:
+    """Keeps the nftables table in step with the network block rules"""
+
+    def __init__(self, groups, nft="nft"):
+        self.groups = groups
+        self.nft = nft
+        self.applied = frozenset()  # (target, user) keys in the loaded table
+        self.swaps = 0
+
+    def swap(self, keys):
+        """Load a table rejecting the traffic of the groups of `keys`, raises OSError"""
+        paths = sorted(self.groups.relative_path(self.groups.group(*key)) for key in keys)
+        result = subprocess.run([self.nft, "-f", "-"], input=ruleset(paths), capture_output=True, text=True)
+        if result.returncode != 0:
+            raise OSError(result.stderr.strip() or f"nft exited with {result.returncode}")
+        self.applied = frozenset(keys)
+        self.swaps += 1
+
+    def sync(self, matcher, when, seen):
+        """Apply one scan, raises OSError if the rules could not be loaded
+
+        `seen` maps the network-blocked names the scan found running to their
+        (pid, user) pairs. Groups are created before the table that names them
+        is loaded, and emptied only after the table stopped naming them.
+        """
+        members = self.groups.refresh() if self.groups.groups else {}
+        blocked = set()
+        moves = []
+        for name, procs in seen.items():
+            for pid, user in procs:
+                if not matcher.is_blocked(name, when, user):
+                    continue
+                blocked.add((name, user))
+                if pid not in members.get((name, user), ()):
+                    moves.append((name, user, pid))
+        # Groups whose block goes on stay in the table even while empty
+        for target, user in self.groups.groups:
+            if matcher.is_blocked(target, when, user):
+                blocked.add((target, user))
+
+        if blocked != self.applied:
+            ended = self.applied - blocked
+            self.swap(blocked)
+            for target, user in ended:
+                self.groups.release(target, user)
+        for name, user, pid in moves:
+            try:
+                self.groups.add(name, user, pid)
+            except OSError:
+                # Exited since the scan
+                pass
+
+    def release_all(self):
+        """Drop the table and hand every process back, used on exit"""
+        try:
+            self.swap(())
+        finally:
+            self.groups.release_all()
+
+    @property
+    def blocked(self):
+        return sorted(target for target, _ in self.applied)
+
+
+def create_network_blocker():
+    """A blocker with an empty table loaded, None where per-app blocking is unavailable
+
+    Raises OSError when nft and cgroups are there but the table cannot be
+    loaded, most likely for lack of privileges.
+    """
+    nft = shutil.which("nft")
+    if nft is None:
+        return None
+    found = cgroups.find_base()
+    if found is None:
+        return None
+    blocker = NetworkBlocker(NetworkGroups(*found), nft)
+    blocker.swap(())
+    # Processes a crashed run left in network groups, no longer named by the table
+    blocker.groups.release_leftovers()
+    return blocker
@@ -0,0 +1,24 @@
+"""Platform layer: autostart, elevation, network and process control
+
+The implementation for the running OS is only imported on first use, so
+importing the engine never pulls in winreg, ctypes.windll or a display.
+"""
+import importlib
+import sys
+
+_current = None
+
+
+def module_name(platform=None):
+    platform = platform or sys.platform
+    if platform.startswith("win"):
+        return "detox.platforms.windows"
+    return "detox.platforms.linux"
+
+
+def current():
+    """The platform implementation for this host, imported on first call"""
+    global _current
+    if _current is None:
+        _current = importlib.import_module(module_name()).Platform()
+    return _current
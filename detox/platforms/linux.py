@@ -0,0 +1,73 @@
+"""Linux implementation of the platform layer
+
+Autostart uses an XDG autostart entry, elevation goes through pkexec and the
+network is switched off and on through NetworkManager.
+"""
+import os
+import subprocess
+import sys
+
+DESKTOP_ENTRY = """[Desktop Entry]
+Type=Application
+Name=Digital Detox
+Exec={command}
+X-GNOME-Autostart-enabled=true
+"""
+
+
+def autostart_file():
+    config_dir = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(config_dir, "autostart", "digital-detox.desktop")
+
+
+def launch_command():
+    """argv that starts this copy of Digital Detox again, without arguments"""
+    if getattr(sys, "frozen", False):
+        return [sys.executable]
+    return [sys.executable, os.path.abspath(sys.argv[0])]
+
+
+class Platform:
+    name = "Linux"
+    executable_filetypes = [("All files", "*")]
+    app_process_attrs = ["pid", "name", "exe"]
+
+    def autostart_enabled(self):
+        return os.path.exists(autostart_file())
+
+    def set_autostart(self, enabled):
+        path = autostart_file()
+        if not enabled:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Desktop entries only understand double quotes
+        command = " ".join(f'"{arg}"' if " " in arg else arg for arg in launch_command())
+        with open(path, "w") as f:
+            f.write(DESKTOP_ENTRY.format(command=command))
+
+    def is_admin(self):
+        return os.geteuid() == 0
+
+    def restart_as_admin(self):
+        """Launch an elevated copy, the caller is expected to exit afterwards"""
+        env = ["env"] + [f"{var}={os.environ[var]}" for var in ("DISPLAY", "XAUTHORITY", "WAYLAND_DISPLAY")
+                         if var in os.environ]
+        subprocess.Popen(["pkexec"] + env + launch_command() + sys.argv[1:] + ["runas"])
+
+    def disable_network(self):
+        subprocess.run(["nmcli", "networking", "off"], check=True)
+
+    def enable_network(self):
+        subprocess.run(["nmcli", "networking", "on"], check=True)
+
+    def is_app_process(self, info):
+        """Whether a process_iter() entry is worth offering in the app list
+
+        Kernel threads have no executable, and processes of other users hide
+        theirs from us, which leaves the user's own programs.
+        """
+        return bool(info.get("name")) and bool(info.get("exe"))
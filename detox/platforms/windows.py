@@ -0,0 +1,66 @@
+"""Windows implementation of the platform layer"""
+import ctypes
+import os
+import subprocess
+import sys
+import winreg
+
+RUN_KEY = r"Software\Microsoft\Windows\CurrentVersion\Run"
+RUN_VALUE = "DigitalDetox"
+
+
+class Platform:
+    name = "Windows"
+    executable_filetypes = [("Executable files", "*.exe"), ("All files", "*.*")]
+    app_process_attrs = ["pid", "name"]
+
+    def autostart_enabled(self):
+        try:
+            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, RUN_KEY, 0, winreg.KEY_READ)
+        except OSError:
+            return False
+        try:
+            winreg.QueryValueEx(key, RUN_VALUE)
+            return True
+        except OSError:
+            return False
+        finally:
+            winreg.CloseKey(key)
+
+    def set_autostart(self, enabled):
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, RUN_KEY, 0, winreg.KEY_WRITE)
+        try:
+            if enabled:
+                winreg.SetValueEx(key, RUN_VALUE, 0, winreg.REG_SZ, os.path.abspath(sys.argv[0]))
+            else:
+                try:
+                    winreg.DeleteValue(key, RUN_VALUE)
+                except OSError:
+                    pass
+        finally:
+            winreg.CloseKey(key)
+
+    def is_admin(self):
+        try:
+            return ctypes.windll.shell32.IsUserAnAdmin() != 0
+        except Exception:
+            return False
+
+    def restart_as_admin(self):
+        """Launch an elevated copy, the caller is expected to exit afterwards"""
+        result = ctypes.windll.shell32.ShellExecuteW(
+            None, "runas", sys.executable, " ".join(sys.argv), None, 1
+        )
+        # ShellExecuteW returns a value <= 32 on failure, e.g. when the UAC prompt is declined
+        if result <= 32:
+            raise OSError(f"ShellExecuteW failed with code {result}")
+
+    def disable_network(self):
+        subprocess.run(["netsh", "interface", "set", "interface", "name=*", "admin=disabled"], check=True)
+
+    def enable_network(self):
+        subprocess.run(["netsh", "interface", "set", "interface", "name=*", "admin=enabled"], check=True)
+
+    def is_app_process(self, info):
+        """Whether a process_iter() entry is worth offering in the app list"""
+        return bool(info.get("name")) and info["name"].endswith(".exe")
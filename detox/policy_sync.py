@@ -0,0 +1,396 @@
+"""Central policy sync for fleets of Digital Detox workstations
+
+A policy is a JSON document holding a version number and the centrally
+managed sections of the state file:
+
+    {"version": 7, "blocked_apps": [...], "routine_blocks": [...]}
+
+Entries are identified by their "id" key (blocked apps fall back to their
+name). A policy source is either an HTTP(S) URL or a path on a shared drive.
+
+HTTP sources are polled with conditional requests. The client sends the ETag
+it last saw in If-None-Match and its current version as ?since=<version>.
+The ETag is a hash of the policy content, so a server that restarted and
+numbers its versions from scratch never mistakes another policy for the
+client's:
+
+    304 Not Modified          nothing changed, no body
+    200 {"version", "base_version", "changes"}
+                              delta against base_version (when the ETag is
+                              the one of that version), where changes maps
+                              each section to {"upsert": [...], "delete": [ids]}
+    200 {"version", <sections>}
+                              full policy, used when the server has no delta
+
+Shared files are checked with a stat() before they are read and the diff
+against the cached policy is computed locally. The last applied policy is
+cached on disk so enforcement keeps working while the source is offline.
+
+`PolicyStore` and `make_policy_server` implement the server side of the
+protocol and double as a local stand-in server:
+
+    python -m detox.policy_sync serve policy.json --port 8765
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+POLICY_SECTIONS = ("blocked_apps", "routine_blocks")
+ROUTINE_FIELDS = ("apps", "start_time", "end_time", "days")
+
+
+class PolicySyncError(Exception):
+    """Raised when the policy source cannot be reached or returns bad data"""
+
+
+def entry_id(section, entry):
+    if "id" in entry:
+        return str(entry["id"])
+    if section == "blocked_apps" and "name" in entry:
+        return entry["name"]
+    # Content hash for entries the policy author did not name
+    raw = json.dumps(entry, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def is_valid_entry(section, entry):
+    if not isinstance(entry, dict):
+        return False
+    if section == "blocked_apps":
+        return isinstance(entry.get("name"), str) and bool(entry["name"])
+    return all(field in entry for field in ROUTINE_FIELDS)
+
+
+def index_policy(doc):
+    """Turn a policy document into {section: {id: entry}}"""
+    index = {}
+    for section in POLICY_SECTIONS:
+        entries = {}
+        for entry in doc.get(section, []):
+            if is_valid_entry(section, entry):
+                entries[entry_id(section, entry)] = entry
+        index[section] = entries
+    return index
+
+
+def diff_policies(old_index, new_index):
+    """Compute the changes that turn old_index into new_index"""
+    changes = {}
+    for section in POLICY_SECTIONS:
+        old = old_index.get(section, {})
+        new = new_index.get(section, {})
+        upsert = [entry for key, entry in new.items() if old.get(key) != entry]
+        delete = [key for key in old if key not in new]
+        if upsert or delete:
+            changes[section] = {"upsert": upsert, "delete": delete}
+    return changes
+
+
+def apply_changes(index, changes):
+    """Apply a delta to an indexed policy in place"""
+    for section, change in changes.items():
+        if section not in POLICY_SECTIONS:
+            continue
+        entries = index.setdefault(section, {})
+        for key in change.get("delete", []):
+            entries.pop(str(key), None)
+        for entry in change.get("upsert", []):
+            if is_valid_entry(section, entry):
+                entries[entry_id(section, entry)] = entry
+
+
+def policy_etag(index):
+    """Quoted content hash of an indexed policy"""
+    raw = json.dumps({section: sorted(index[section].items()) for section in POLICY_SECTIONS},
+                     sort_keys=True).encode("utf-8")
+    return '"' + hashlib.sha1(raw).hexdigest() + '"'
+
+
+class PolicySyncClient:
+    """Keeps a local copy of the central policy up to date"""
+
+    def __init__(self, source, cache_file=None, timeout=10):
+        self.source = source
+        self.cache_file = cache_file
+        self.timeout = timeout
+        self.version = None
+        self.etag = None
+        self.file_signature = None
+        self.index = {section: {} for section in POLICY_SECTIONS}
+        self.load_cache()
+
+    @property
+    def is_http(self):
+        return urlsplit(self.source).scheme in ("http", "https")
+
+    def load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+        # A cache written for another source must not leak into this one
+        if cache.get("source") != self.source:
+            return
+        self.version = cache.get("version")
+        self.etag = cache.get("etag")
+        self.index = index_policy(cache.get("policy", {}))
+
+    def save_cache(self):
+        if not self.cache_file:
+            return
+        cache = {
+            "source": self.source,
+            "version": self.version,
+            "etag": self.etag,
+            "policy": self.policy_document()
+        }
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def policy_document(self):
+        doc = {"version": self.version}
+        for section in POLICY_SECTIONS:
+            doc[section] = list(self.index[section].values())
+        return doc
+
+    def snapshot(self):
+        """Managed entries ready to be merged into the app state"""
+        sections = {}
+        for section in POLICY_SECTIONS:
+            entries = []
+            for key, entry in self.index[section].items():
+                entry = copy.deepcopy(entry)
+                entry["policy_id"] = key
+                entries.append(entry)
+            sections[section] = entries
+        return sections
+
+    def sync(self):
+        """Fetch policy changes from the source, returns True if the policy changed"""
+        if self.is_http:
+            changed = self._sync_http()
+        else:
+            changed = self._sync_file()
+        if changed:
+            try:
+                self.save_cache()
+            except OSError:
+                pass
+        return changed
+
+    def _fetch(self, since):
+        url = self.source
+        if since is not None:
+            url += ("&" if "?" in url else "?") + urlencode({"since": since})
+        request = urllib.request.Request(url, headers={"Accept": "application/json"})
+        if self.etag and since is not None:
+            request.add_header("If-None-Match", self.etag)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.load(response), response.headers.get("ETag")
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, self.etag
+            raise PolicySyncError(f"Policy server returned HTTP {e.code}")
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise PolicySyncError(f"Failed to fetch policy: {e}")
+
+    def _sync_http(self):
+        body, etag = self._fetch(self.version)
+        if body is None:
+            return False
+        if "changes" in body:
+            if body.get("base_version") != self.version:
+                # The server diffed against a version we do not have, start over
+                body, etag = self._fetch(None)
+            else:
+                apply_changes(self.index, body["changes"])
+                self.version = body.get("version")
+                self.etag = etag
+                return bool(body["changes"])
+        if "changes" in body:
+            raise PolicySyncError("Policy server sent a delta for a full request")
+        new_index = index_policy(body)
+        changed = bool(diff_policies(self.index, new_index))
+        self.index = new_index
+        self.version = body.get("version")
+        self.etag = etag
+        return changed
+
+    def _sync_file(self):
+        path = self.source
+        if path.startswith("file://"):
+            path = urlsplit(path).path
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            raise PolicySyncError(f"Policy file is not reachable: {e}")
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self.file_signature:
+            return False
+        try:
+            with open(path, "r") as f:
+                doc = json.load(f)
+        except (OSError, ValueError) as e:
+            raise PolicySyncError(f"Failed to read policy file: {e}")
+        self.file_signature = signature
+        # Compared by content, an edit that kept the version number still counts
+        new_index = index_policy(doc)
+        changes = diff_policies(self.index, new_index)
+        apply_changes(self.index, changes)
+        self.version = doc.get("version")
+        return bool(changes)
+
+
+class PolicySyncThread(threading.Thread):
+    """Thread polling a policy source and reporting changed policies"""
+
+    def __init__(self, client, on_change, interval=300):
+        super().__init__(daemon=True)
+        self.client = client
+        self.on_change = on_change
+        self.interval = interval
+        self.last_error = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        delay = self.interval
+        while not self._stop_event.is_set():
+            try:
+                if self.client.sync():
+                    self.on_change(self.client.snapshot())
+                self.last_error = None
+                delay = self.interval
+            except PolicySyncError as e:
+                # Keep enforcing the cached policy and back off while offline
+                self.last_error = str(e)
+                delay = min(delay * 2, self.interval * 8)
+            self._stop_event.wait(delay)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class PolicyStore:
+    """Server side policy history used to answer conditional and delta requests"""
+
+    def __init__(self, history_size=50):
+        self.history_size = history_size
+        self.version = 0
+        self.index = {section: {} for section in POLICY_SECTIONS}
+        self.etag = policy_etag(self.index)
+        self.history = {0: (self.index, self.etag)}  # version -> (index, etag)
+        self.lock = threading.Lock()
+
+    def publish(self, doc):
+        """Publish a new full policy, returns the new version or None if unchanged"""
+        new_index = index_policy(doc)
+        with self.lock:
+            if not diff_policies(self.index, new_index):
+                return None
+            self.version += 1
+            self.index = new_index
+            self.etag = policy_etag(new_index)
+            self.history[self.version] = (new_index, self.etag)
+            for version in sorted(self.history)[:-self.history_size]:
+                del self.history[version]
+            return self.version
+
+    def respond(self, since=None, if_none_match=None):
+        """Build (status, body) for a client request"""
+        with self.lock:
+            if since is not None and if_none_match == self.etag:
+                return 304, None
+            base = self.history.get(since)
+            # A delta only against the very content the client holds
+            if base is not None and if_none_match == base[1]:
+                return 200, {
+                    "version": self.version,
+                    "base_version": since,
+                    "changes": diff_policies(base[0], self.index)
+                }
+            doc = {"version": self.version}
+            for section in POLICY_SECTIONS:
+                doc[section] = list(self.index[section].values())
+            return 200, doc
+
+
+def make_policy_server(store, host="127.0.0.1", port=8765, policy_file=None):
+    """Create an HTTP server for the store, republishing policy_file when it changes"""
+    file_state = {"signature": None}
+
+    def refresh_from_file():
+        try:
+            st = os.stat(policy_file)
+        except OSError:
+            return
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == file_state["signature"]:
+            return
+        try:
+            with open(policy_file, "r") as f:
+                store.publish(json.load(f))
+            file_state["signature"] = signature
+        except (OSError, ValueError):
+            pass
+
+    class PolicyRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if policy_file:
+                refresh_from_file()
+            query = parse_qs(urlsplit(self.path).query)
+            since = None
+            if "since" in query:
+                try:
+                    since = int(query["since"][0])
+                except ValueError:
+                    pass
+            status, body = store.respond(since, self.headers.get("If-None-Match"))
+            self.send_response(status)
+            self.send_header("ETag", store.etag)
+            if body is None:
+                self.end_headers()
+                return
+            payload = json.dumps(body).encode("utf-8")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), PolicyRequestHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Digital Detox policy server")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve", help="Serve a policy file over HTTP")
+    serve.add_argument("policy_file")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = make_policy_server(PolicyStore(), args.host, args.port, args.policy_file)
+    print(f"Serving {args.policy_file} on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
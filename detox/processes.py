@@ -0,0 +1,152 @@
+"""Where the enforcer and the usage sampler get their process table from
+
+PsutilSource is the real process table. SyntheticSource generates a table of
+fake processes with the same interface, so the scan and the matcher can be
+measured at sizes no test machine actually runs (see detox.benchmark).
+"""
+import contextlib
+import os
+import random
+from collections import namedtuple
+
+import psutil
+
+from detox.rules import current_user
+
+CpuTimes = namedtuple("CpuTimes", "user system")
+MemoryInfo = namedtuple("MemoryInfo", "rss vms")
+Uids = namedtuple("Uids", "real effective saved")
+
+
+class PsutilSource:
+    """The live process table"""
+
+    def process_iter(self, attrs=None, ad_value=None):
+        return psutil.process_iter(attrs, ad_value)
+
+    def process(self, pid):
+        return psutil.Process(pid)
+
+    def pid_exists(self, pid):
+        return psutil.pid_exists(pid)
+
+
+class SyntheticProcess:
+    """Stand-in for psutil.Process backed by generated values"""
+
+    def __init__(self, source, pid, name, uid, username, create_time, cpu_seconds, rss):
+        self.source = source
+        self.pid = pid
+        self._name = name
+        self._uids = Uids(uid, uid, uid)
+        self._username = username
+        self._create_time = create_time
+        self._cpu_times = CpuTimes(cpu_seconds, cpu_seconds / 4)
+        self._memory_info = MemoryInfo(rss, rss * 2)
+        self.info = {}
+        self.suspended = False
+
+    def _check(self):
+        if self.pid not in self.source.table:
+            raise psutil.NoSuchProcess(self.pid, self._name)
+
+    @contextlib.contextmanager
+    def oneshot(self):
+        yield
+
+    def name(self):
+        return self._name
+
+    def exe(self):
+        return f"/opt/synthetic/{self._name}"
+
+    def uids(self):
+        return self._uids
+
+    def username(self):
+        return self._username
+
+    def create_time(self):
+        return self._create_time
+
+    def cpu_times(self):
+        return self._cpu_times
+
+    def memory_info(self):
+        return self._memory_info
+
+    def parent(self):
+        return None
+
+    def ppid(self):
+        return 1
+
+    def kill(self):
+        self._check()
+        self.source.kills += 1
+        if self.source.respawn:
+            # Relaunched under the same PID, a new process as far as the enforcer can tell
+            self._create_time += 1.0
+        else:
+            del self.source.table[self.pid]
+
+    def suspend(self):
+        self._check()
+        self.suspended = True
+        self.source.suspends += 1
+
+    def resume(self):
+        self._check()
+        self.suspended = False
+
+    def as_dict(self, attrs, ad_value=None):
+        return {attr: self.pid if attr == "pid" else getattr(self, attr)() for attr in attrs}
+
+
+class SyntheticSource:
+    """A generated process table
+
+    `count` processes are spread over a pool of executable names with a few
+    very common ones (like browsers with many helper processes) and a long
+    tail. About one in ten processes belongs to another user. With `respawn`
+    killed processes stay in the table, so repeated scans see the same load.
+    """
+
+    def __init__(self, count, names=None, owner_uid=None, owner_name=None, seed=0, respawn=True):
+        rng = random.Random(seed)
+        self.names = names or [f"app{i}.exe" for i in range(max(count // 10, 10))]
+        self.respawn = respawn
+        self.kills = 0
+        self.suspends = 0
+        if owner_uid is None:
+            owner_uid = os.getuid() if hasattr(os, "getuid") else 1000
+        if owner_name is None:
+            owner_name = current_user()
+        # Zipf-like weights give a handful of names most of the processes
+        weights = [1.0 / (rank + 1) for rank in range(len(self.names))]
+        chosen = rng.choices(self.names, weights, k=count)
+        self.table = {}
+        for i, name in enumerate(chosen):
+            pid = 1000 + i
+            if rng.random() < 0.1:
+                other = rng.randrange(20)
+                uid, username = 20000 + other, f"user{other}"
+            else:
+                uid, username = owner_uid, owner_name
+            self.table[pid] = SyntheticProcess(self, pid, name, uid, username, 1.7e9 + i,
+                                               rng.random() * 100, rng.randrange(1, 2048) << 20)
+
+    def process_iter(self, attrs=None, ad_value=None):
+        for proc in list(self.table.values()):
+            if attrs is not None:
+                proc.info = proc.as_dict(attrs, ad_value)
+            yield proc
+
+    def process(self, pid):
+        proc = self.table.get(pid)
+        if proc is None:
+            raise psutil.NoSuchProcess(pid)
+        return proc
+
+    def pid_exists(self, pid):
+        return pid in self.table
@@ -0,0 +1,65 @@
+"""Named block profiles ("Deep work", "Exam", "Evening") and rule snapshots
+
+A profile is a named set of rules that only applies while it is the active
+profile. Profiles are stored under "profiles" in the state file:
+
+    {"name": "Deep work",
+     "apps": ["steam.exe"],
+     "network_apps": ["chrome.exe"],
+     "routine_blocks": [{"apps": ["slack.exe"], "start_time": "09:00",
+                         "end_time": "12:00", "days": ["Monday", "Friday"]}]}
+
+"apps" are blocked and "network_apps" are kept offline for as long as the
+profile is active, its routines (which may carry "network": true like any
+other routine) on their own schedule.
+
+The watchdog enforces a RuleSnapshot: the compiled matchers of the rules in
+force. One snapshot per profile is compiled ahead of time from the profile's
+rules plus the ones that apply whatever the profile (quick blocks and the
+global routines), and again whenever any of them changes. Activating a
+profile then replaces a single reference, whatever the size of the profile.
+"""
+from datetime import datetime
+
+from detox.rules import BlockMatcher, split_network
+
+# End time of the blocks that last as long as their profile is active
+WHILE_ACTIVE = datetime.max.isoformat()
+
+
+class RuleSnapshot:
+    """Compiled rules of one profile, replaced as a whole"""
+
+    def __init__(self, blocked_apps=(), routine_blocks=(), network_blocking=False, profile=None):
+        self.profile = profile
+        apps, network_apps = split_network(blocked_apps)
+        routines, network_routines = split_network(routine_blocks)
+        if not network_blocking:
+            # Without per-app network blocking those apps are closed instead
+            apps, routines = list(blocked_apps), list(routine_blocks)
+            network_apps, network_routines = (), ()
+        self.matcher = BlockMatcher(apps, routines)
+        self.network_matcher = BlockMatcher(network_apps, network_routines)
+
+
+def profile_rules(profile):
+    """(blocked_apps, routine_blocks) a profile adds while it is active"""
+    blocked_apps = [{"name": name, "end_time": WHILE_ACTIVE} for name in profile.get("apps", ())]
+    blocked_apps += [{"name": name, "end_time": WHILE_ACTIVE, "network": True}
+                     for name in profile.get("network_apps", ())]
+    return blocked_apps, list(profile.get("routine_blocks", ()))
+
+
+def has_network_rules(profiles):
+    return any(profile.get("network_apps") or any(routine.get("network") for routine in profile.get("routine_blocks", ()))
+               for profile in profiles)
+
+
+def compile_profiles(profiles, blocked_apps, routine_blocks, network_blocking):
+    """Snapshot per profile name, None holds the rules without any profile"""
+    snapshots = {None: RuleSnapshot(blocked_apps, routine_blocks, network_blocking)}
+    for profile in profiles:
+        apps, routines = profile_rules(profile)
+        snapshots[profile["name"]] = RuleSnapshot(list(blocked_apps) + apps, list(routine_blocks) + routines,
+                                                  network_blocking, profile["name"])
+    return snapshots
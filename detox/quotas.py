@@ -0,0 +1,127 @@
+"""Daily time quotas, accounted from the processes each enforcement scan sees
+
+A quota app is "in use" while at least one of its processes is running. The
+scan reports the quota apps it saw, and comparing that with the previous scan
+gives appear and disappear events: usage accrues from the first scan an app
+is seen in to the first scan it is missing from. Nothing is re-read from the
+history, and the counters of the current day are saved to a small JSON file
+when an app disappears, when a quota runs out and at most once a minute while
+an app keeps running.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+# Longest stretch of accrued usage that may be lost if the app is killed
+SAVE_INTERVAL_SECONDS = 60
+
+
+def next_midnight(now):
+    return datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+
+
+class QuotaTracker:
+    """Per-app usage of the current day against daily limits in minutes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.limits = {}  # name -> seconds per day
+        self.day = None
+        self.used = {}  # name -> seconds used today by processes that already exited
+        self.running_since = {}  # name -> when the app was first seen in the current run
+        self.exhausted = set()
+        self.saved_at = None
+
+    def set_limits(self, quotas):
+        """Take the limits from the stored [{"name", "minutes"}] quota rules"""
+        limits = {}
+        for quota in quotas:
+            try:
+                limits[quota["name"]] = float(quota["minutes"]) * 60
+            except (KeyError, TypeError, ValueError):
+                continue
+        # Swapped as a whole, the enforcement thread picks it up on its next scan
+        self.limits = limits
+
+    @property
+    def names(self):
+        return self.limits.keys()
+
+    def load(self, now):
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        self.day = now.date()
+        if saved.get("day") == self.day.isoformat():
+            self.used = {name: float(seconds) for name, seconds in saved.get("used", {}).items()}
+            self.exhausted = set(saved.get("exhausted", []))
+        else:
+            self.used = {}
+            self.exhausted = set()
+
+    def save(self, now):
+        # Usage of apps that are still running is saved up to now
+        used = dict(self.used)
+        for name, since in self.running_since.items():
+            used[name] = used.get(name, 0.0) + (now - since).total_seconds()
+        tmp_file = self.path + ".tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump({"day": self.day.isoformat(), "used": used, "exhausted": sorted(self.exhausted)}, f)
+            os.replace(tmp_file, self.path)
+        except OSError:
+            pass
+        self.saved_at = now
+
+    def used_seconds(self, name, now):
+        used = self.used.get(name, 0.0)
+        since = self.running_since.get(name)
+        if since is not None:
+            used += (now - since).total_seconds()
+        return used
+
+    def remaining_seconds(self, name, now):
+        return max(self.limits.get(name, 0.0) - self.used_seconds(name, now), 0.0)
+
+    def roll_over(self, now):
+        """Start a new day at midnight, apps running across it start counting from zero"""
+        midnight = datetime.combine(now.date(), datetime.min.time())
+        self.day = now.date()
+        self.used = {}
+        self.exhausted = set()
+        for name in self.running_since:
+            self.running_since[name] = midnight
+
+    def observe(self, seen, now):
+        """Account one scan, returns the quota apps whose limit just ran out
+
+        `seen` holds the names of the quota apps the scan found running.
+        """
+        if self.day is None:
+            self.load(now)
+        if now.date() != self.day:
+            self.roll_over(now)
+
+        limits = self.limits
+        changed = False
+        # Appear events start the clock, disappear events bank the elapsed time
+        for name in seen:
+            if name not in self.running_since and name in limits:
+                self.running_since[name] = now
+        for name in [name for name in self.running_since if name not in seen or name not in limits]:
+            since = self.running_since.pop(name)
+            self.used[name] = self.used.get(name, 0.0) + max((now - since).total_seconds(), 0.0)
+            changed = True
+
+        exhausted = [name for name in self.running_since
+                     if name not in self.exhausted and self.used_seconds(name, now) >= limits[name]]
+        if exhausted:
+            self.exhausted.update(exhausted)
+            changed = True
+
+        if changed or (self.running_since and (
+                self.saved_at is None or (now - self.saved_at).total_seconds() >= SAVE_INTERVAL_SECONDS)):
+            self.save(now)
+        return exhausted
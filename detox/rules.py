@@ -0,0 +1,142 @@
+"""Compiled block rules used by the enforcement scan"""
+import getpass
+from datetime import datetime
+
+from detox.identity import IdentityIndex, identity
+
+# Value of a rule's "user" key that applies it to every user on the host
+ALL_USERS = "*"
+
+
+def moment(now):
+    """Pre-format the parts of a timestamp the routine checks compare against"""
+    return now, now.strftime("%H:%M"), now.strftime("%A")
+
+
+def current_user():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return ""
+
+
+def normalize_user(username):
+    """Compare users without the Windows domain prefix and case"""
+    if not username:
+        return ""
+    if username == ALL_USERS:
+        return ALL_USERS
+    return username.rsplit("\\", 1)[-1].casefold()
+
+
+def split_network(rules):
+    """(app rules, network-only rules), the latter carry "network": true"""
+    apps, network = [], []
+    for rule in rules:
+        (network if rule.get("network") else apps).append(rule)
+    return apps, network
+
+
+class RuleSet:
+    """Quick blocks and routine windows of a single user scope, keyed by process identity"""
+
+    def __init__(self):
+        self.quick_blocks = {}
+        self.routine_windows = {}
+
+    def add_app(self, name, end_time):
+        current = self.quick_blocks.get(name)
+        if current is None or end_time > current:
+            self.quick_blocks[name] = end_time
+
+    def add_window(self, name, window):
+        self.routine_windows.setdefault(name, set()).add(window)
+
+    def names(self):
+        return self.quick_blocks.keys() | self.routine_windows.keys()
+
+    def is_blocked(self, name, when):
+        now, time_str, day = when
+        end_time = self.quick_blocks.get(name)
+        if end_time is not None and end_time > now:
+            return True
+        for days, start_time, end_time in self.routine_windows.get(name, ()):
+            if day in days and start_time <= time_str < end_time:
+                return True
+        return False
+
+
+class BlockMatcher:
+    """Index from process name to the quick blocks and routine windows covering it
+
+    Built once whenever the rules change, so the scan loop only does one dict
+    lookup per process instead of walking every rule for every process. Rules
+    are keyed by the normalized identity of their target (detox.identity), so
+    "Firefox", "firefox.exe" and the truncated Linux name of a long target all
+    match the same processes.
+
+    Rules are scoped per user through their optional "user" key: rules without
+    one belong to the owner (the user running Digital Detox) and "*" applies
+    a rule to everyone.
+    """
+
+    def __init__(self, blocked_apps=(), routine_blocks=(), owner=None):
+        self.owner = normalize_user(owner if owner is not None else current_user())
+        self.scopes = {}
+        self.user_rules = {}
+        targets = set()
+
+        for app in blocked_apps:
+            if "end_time" not in app:
+                continue
+            try:
+                end_time = datetime.fromisoformat(app["end_time"])
+            except (TypeError, ValueError):
+                continue
+            self.scope(app).add_app(identity(app["name"]), end_time)
+            targets.add(app["name"])
+
+        for routine in routine_blocks:
+            window = (frozenset(routine["days"]), routine["start_time"], routine["end_time"])
+            rules = self.scope(routine)
+            for app in routine["apps"]:
+                rules.add_window(identity(app), window)
+                targets.add(app)
+
+        self.names = set()
+        for rules in self.scopes.values():
+            self.names |= rules.names()
+        # Rule targets as configured, and every form they match mapped to the identity
+        self.targets = targets
+        self.index = IdentityIndex(sorted(targets), key=identity)
+
+    def scope(self, rule):
+        user = normalize_user(rule.get("user")) or self.owner
+        rules = self.scopes.get(user)
+        if rules is None:
+            rules = self.scopes[user] = RuleSet()
+        return rules
+
+    def __len__(self):
+        return len(self.names)
+
+    def rules_for(self, user):
+        """Rule sets that apply to a (normalized) user, cached per user"""
+        rules = self.user_rules.get(user)
+        if rules is None:
+            rules = tuple(self.scopes[scope] for scope in (user, ALL_USERS) if scope in self.scopes)
+            self.user_rules[user] = rules
+        return rules
+
+    def is_blocked(self, name, when, user=None):
+        """Check a process name against the rules, `when` comes from moment()
+
+        `user` is the normalized owner of the process and defaults to the owner.
+        """
+        key = self.index.lookup(name)
+        if not key:
+            return False
+        for rules in self.rules_for(self.owner if user is None else user):
+            if rules.is_blocked(key, when):
+                return True
+        return False
@@ -0,0 +1,206 @@
+"""Persistent min-heap of deadlines (cooling periods, block expiries)
+
+Deadlines are stored as wall clock timestamps in a small JSON file next to
+the state file, so they survive the window being closed and the app being
+restarted. A single thread sleeps until the earliest deadline is due, fires
+its handler and goes back to sleep; nothing polls while deadlines wait.
+
+All deadlines that are due are taken off the heap in one pass and fired
+together; they stay in the saved file until their handlers have run, and the
+file is written once for the whole batch. A deadline whose handler was cut
+short by a crash fires again after the restart, so handlers must be safe to
+repeat. Deadlines that came due while the app was not running fire right
+after start.
+"""
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+
+# Upper bound on a single sleep, so a missed wake-up (suspend on platforms
+# whose timers stop while asleep) is caught up within a few minutes at most
+MAX_WAIT_SECONDS = 300
+
+
+class DeadlineScheduler:
+    """Fires registered handlers exactly when their deadlines come due"""
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.heap = []  # (due, seq, deadline_id), stale items are skipped lazily
+        self.deadlines = {}  # deadline_id -> {"id", "kind", "due", "payload", "seq"}
+        self.handlers = {}
+        self.firing = {}  # deadline_id -> deadline popped but not yet handled, still saved
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def register(self, kind, handler):
+        """Call handler(deadline) whenever a deadline of this kind comes due"""
+        self.handlers[kind] = handler
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self.cond:
+            for deadline in saved:
+                self._push(deadline["id"], deadline["kind"], deadline["due"], deadline.get("payload"))
+
+    def save(self):
+        # Called with the condition held
+        tmp_file = self.path + ".tmp"
+        # Firing ones first, a deadline a handler rescheduled under the same id wins on load
+        deadlines = [{key: value for key, value in deadline.items() if key != "seq"}
+                     for deadline in list(self.firing.values()) + list(self.deadlines.values())]
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(deadlines, f)
+            os.replace(tmp_file, self.path)
+        except OSError:
+            pass
+
+    def _push(self, deadline_id, kind, due, payload):
+        seq = next(self.seq)
+        self.deadlines[deadline_id] = {"id": deadline_id, "kind": kind, "due": due, "payload": payload, "seq": seq}
+        heapq.heappush(self.heap, (due, seq, deadline_id))
+
+    def schedule(self, kind, due, payload=None, deadline_id=None):
+        """Add or move a deadline, returns its id"""
+        deadline_id = deadline_id or uuid.uuid4().hex
+        self.schedule_many([(deadline_id, kind, due, payload)])
+        return deadline_id
+
+    def schedule_many(self, deadlines, replace_kind=None):
+        """Add or move several deadlines with a single save
+
+        With replace_kind, pending deadlines of that kind that are not in the
+        batch are dropped, which makes rebuilding a whole kind idempotent.
+        Those already due are kept: they have not fired yet, and the state
+        the batch was built from may no longer show them.
+        """
+        with self.cond:
+            changed = False
+            wanted = set()
+            for deadline_id, kind, due, payload in deadlines:
+                wanted.add(deadline_id)
+                current = self.deadlines.get(deadline_id)
+                if current and current["due"] == due and current["payload"] == payload:
+                    continue
+                self._push(deadline_id, kind, due, payload)
+                changed = True
+            if replace_kind:
+                now = self.clock()
+                for deadline_id, deadline in list(self.deadlines.items()):
+                    if deadline["kind"] == replace_kind and deadline_id not in wanted and deadline["due"] > now:
+                        del self.deadlines[deadline_id]
+                        changed = True
+            if changed:
+                self.save()
+                self.cond.notify()
+
+    def cancel(self, deadline_id):
+        with self.cond:
+            if self.deadlines.pop(deadline_id, None) is not None:
+                self.save()
+                self.cond.notify()
+                return True
+        return False
+
+    def get(self, deadline_id):
+        deadline = self.deadlines.get(deadline_id)
+        return dict(deadline) if deadline else None
+
+    def pending(self, kind=None):
+        """Pending deadlines in due order"""
+        with self.cond:
+            deadlines = [dict(deadline) for deadline in self.deadlines.values()
+                         if kind is None or deadline["kind"] == kind]
+        return sorted(deadlines, key=lambda deadline: deadline["due"])
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def wake(self):
+        """Re-check the earliest deadline now, used after a clock jump"""
+        with self.cond:
+            self.cond.notify()
+
+    def next_due(self):
+        """Timestamp of the earliest pending deadline, or None"""
+        with self.cond:
+            while self.heap:
+                due, seq, deadline_id = self.heap[0]
+                deadline = self.deadlines.get(deadline_id)
+                if deadline is not None and deadline["seq"] == seq:
+                    return due
+                heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self):
+        """Remove every deadline that is due, returns them in due order and the seconds to wait for the next
+
+        Called with the condition held; pass the deadlines to fire_all(),
+        which saves once they have been handled.
+        """
+        popped = []
+        now = self.clock()
+        while self.heap:
+            due, seq, deadline_id = self.heap[0]
+            deadline = self.deadlines.get(deadline_id)
+            if deadline is None or deadline["seq"] != seq:
+                # Cancelled or rescheduled since it was pushed
+                heapq.heappop(self.heap)
+                continue
+            if due > now:
+                return popped, due - now
+            heapq.heappop(self.heap)
+            del self.deadlines[deadline_id]
+            self.firing[deadline_id] = deadline
+            popped.append(deadline)
+        return popped, None
+
+    def fire_all(self, deadlines):
+        """Fire deadlines returned by pop_due(), then drop them from the file with a single save"""
+        for deadline in deadlines:
+            self.fire(deadline)
+        if deadlines:
+            with self.cond:
+                for deadline in deadlines:
+                    self.firing.pop(deadline["id"], None)
+                self.save()
+
+    def run(self):
+        while True:
+            with self.cond:
+                if not self.running:
+                    return
+                deadlines, delay = self.pop_due()
+                if not deadlines:
+                    self.cond.wait(MAX_WAIT_SECONDS if delay is None else min(delay, MAX_WAIT_SECONDS))
+                    continue
+            self.fire_all(deadlines)
+
+    def fire(self, deadline):
+        handler = self.handlers.get(deadline["kind"])
+        if handler is None:
+            return
+        try:
+            handler(deadline)
+        except Exception:
+            # A failing handler must not take the scheduler down with it
+            pass
@@ -0,0 +1,304 @@
+"""Accelerated replay of schedules against a virtual clock
+
+A Simulation runs the real engine (rules, deadline scheduler, cooling
+periods, internet intervals) on a VirtualClock and jumps straight from one
+interesting moment to the next: every minute boundary while routines exist
+(their windows are minute based), every pending deadline and every scripted
+action. A week replays in well under a second, and every time enforcement of
+an app or of the internet starts or stops is recorded with its exact time.
+
+Processes and network adapters are never touched. App decisions come from the
+compiled matcher and the network is switched on a SimulatedPlatform.
+
+    python -m detox.simulation                  # built-in week, with checks
+    python -m detox.simulation scenario.json    # replay a scenario file
+    python -m detox.simulation --load 5000      # scheduler throughput benchmark
+
+A scenario file looks like:
+
+    {"start": "2026-01-05T00:00:00", "days": 7, "cooling_period_minutes": 15,
+     "routine_blocks": [{"apps": ["chrome.exe"], "start_time": "09:00",
+                         "end_time": "17:00", "days": ["Monday"]}],
+     "actions": [{"at": "2026-01-05T20:00:00", "do": "block_app", "args": ["game.exe", 90]}],
+     "expect": [{"at": "2026-01-05T09:00:00", "type": "app", "target": "chrome.exe", "event": "start"}]}
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from detox.clock import VirtualClock
+from detox.enforcement import ProcessEnforcer
+from detox.engine import DetoxEngine
+from detox.rules import moment
+
+START = "start"
+STOP = "stop"
+ACTIONS = ("block_app", "block_internet", "extend_internet_block", "request_unblock", "unblock")
+
+
+class SimulationError(Exception):
+    """Raised when the recorded transitions differ from the expected ones"""
+
+
+class SimulatedPlatform:
+    """Network control that only records whether the network is on"""
+
+    name = "Simulation"
+
+    def __init__(self):
+        self.network_enabled = True
+
+    def disable_network(self):
+        self.network_enabled = False
+
+    def enable_network(self):
+        self.network_enabled = True
+
+
+class Simulation:
+    """Drives a DetoxEngine through scripted time"""
+
+    def __init__(self, start, routine_blocks=(), cooling_period_minutes=15, data_dir=None):
+        if data_dir is None:
+            self.tmp_dir = tempfile.TemporaryDirectory()
+            data_dir = self.tmp_dir.name
+        self.clock = VirtualClock(start)
+        self.platform = SimulatedPlatform()
+        self.engine = DetoxEngine(os.path.join(data_dir, "digital_detox_data.json"),
+                                  clock=self.clock, platform=self.platform)
+        self.engine.routine_blocks = list(routine_blocks)
+        self.engine.cooling_period_minutes = cooling_period_minutes
+        self.engine.enforcer = ProcessEnforcer(clock=self.clock)
+        self.engine.rebuild_matcher()
+
+        self.actions = []  # (when, seq, action, args)
+        self.seq = itertools.count()
+        self.apps = set()
+        for routine in routine_blocks:
+            self.apps.update(routine["apps"])
+        # Routine windows can open or close on any step, other apps only change
+        # when an action or a deadline names them
+        self.routine_apps = set(self.apps)
+        self.touched = set(self.apps)
+        self.blocked = {}  # (block_type, target) -> currently enforced
+        self.transitions = []  # (when, block_type, target, START/STOP)
+
+        # Benchmark counters
+        self.steps = 0
+        self.deadlines_fired = 0
+        self.scheduler_seconds = 0.0  # spent in pop_due() and the handlers
+        self.wall_seconds = 0.0
+        self.simulated_seconds = 0.0
+
+    def at(self, when, action, *args):
+        """Run engine action `action` (one of ACTIONS) at `when`"""
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action: {action}")
+        if action == "block_app":
+            self.apps.add(args[0])
+            self.touched.add(args[0])
+        heapq.heappush(self.actions, (when, next(self.seq), action, args))
+
+    def next_event(self, until):
+        now = self.clock.now()
+        candidates = [until]
+        if self.engine.routine_blocks:
+            candidates.append(now.replace(second=0, microsecond=0) + timedelta(minutes=1))
+        if self.actions:
+            candidates.append(self.actions[0][0])
+        due = self.engine.scheduler.next_due()
+        if due is not None:
+            candidates.append(datetime.fromtimestamp(due))
+        return max(min(candidates), now)
+
+    def run(self, until):
+        """Replay up to and including `until`, returns the transitions recorded"""
+        started = time.perf_counter()
+        simulated_from = self.clock.now()
+        self.step()
+        while self.clock.now() < until:
+            self.clock.set(self.next_event(until))
+            self.step()
+        self.wall_seconds += time.perf_counter() - started
+        self.simulated_seconds += (self.clock.now() - simulated_from).total_seconds()
+        return self.transitions
+
+    def step(self):
+        now = self.clock.now()
+        self.steps += 1
+        acted = False
+        while self.actions and self.actions[0][0] <= now:
+            _, _, action, args = heapq.heappop(self.actions)
+            getattr(self.engine, action)(*args)
+            self.touch(args)
+            acted = True
+        if acted:
+            # Saved like the window does after every change, which also moves
+            # ended blocks to the history so the rules stay small
+            self.engine.save()
+
+        # Deadlines fire the same handlers the scheduler thread would call
+        scheduler = self.engine.scheduler
+        while True:
+            started = time.perf_counter()
+            with scheduler.cond:
+                deadlines, _ = scheduler.pop_due()
+            if deadlines:
+                scheduler.fire_all(deadlines)
+            self.scheduler_seconds += time.perf_counter() - started
+            if not deadlines:
+                break
+            self.deadlines_fired += len(deadlines)
+            for deadline in deadlines:
+                self.touch((deadline["payload"] or {}).values())
+
+        self.engine.enforce_internet(now)
+        self.record(now)
+
+    def touch(self, values):
+        """Re-evaluate the apps named in an action or a deadline on the next record()"""
+        self.touched.update(value for value in values if isinstance(value, str) and value in self.apps)
+
+    def record(self, now):
+        when = moment(now)
+        names, self.touched = self.routine_apps | self.touched, set()
+        states = [(("app", name), self.engine.matcher.is_blocked(name, when)) for name in sorted(names)]
+        states.append((("internet", None), not self.platform.network_enabled))
+        for key, blocked in states:
+            if blocked != self.blocked.get(key, False):
+                self.blocked[key] = blocked
+                self.transitions.append((now, key[0], key[1], START if blocked else STOP))
+
+    def check(self, expected):
+        """Compare the transitions of every target named in `expected` exactly
+
+        `expected` holds (when, block_type, target, event) tuples.
+        """
+        targets = {(block_type, target) for _, block_type, target, _ in expected}
+        recorded = [t for t in self.transitions if (t[1], t[2]) in targets]
+        missing = sorted(set(expected) - set(recorded), key=str)
+        unexpected = sorted(set(recorded) - set(expected), key=str)
+        if missing or unexpected:
+            lines = [f"missing    {format_transition(t)}" for t in missing]
+            lines += [f"unexpected {format_transition(t)}" for t in unexpected]
+            raise SimulationError("\n".join(lines))
+
+    def report(self):
+        speedup = self.simulated_seconds / self.wall_seconds if self.wall_seconds else 0.0
+        # Throughput of the scheduler alone, the rest of a step is rule evaluation
+        rate = self.deadlines_fired / self.scheduler_seconds if self.scheduler_seconds else 0.0
+        return (f"{self.simulated_seconds / 86400:.1f} simulated day(s) in {self.wall_seconds:.3f}s "
+                f"({speedup:,.0f}x real time), {self.steps} steps, "
+                f"{self.deadlines_fired} deadlines fired in {self.scheduler_seconds:.3f}s ({rate:,.0f}/s)")
+
+
+def format_transition(transition):
+    when, block_type, target, event = transition
+    return f"{when:%a %Y-%m-%d %H:%M:%S}  {event:<5} {block_type} {target or ''}".rstrip()
+
+
+def default_scenario(start):
+    """A working week of routines with quick blocks, internet blocks and cooling periods"""
+    monday = start - timedelta(days=start.weekday())
+    monday = monday.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def day(offset, hour, minute=0, second=0):
+        return monday + timedelta(days=offset, hours=hour, minutes=minute, seconds=second)
+
+    weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+    routines = [
+        {"apps": ["chrome.exe"], "start_time": "09:00", "end_time": "17:00", "days": weekdays},
+        {"apps": ["game.exe"], "start_time": "10:00", "end_time": "12:00", "days": ["Saturday", "Sunday"]},
+    ]
+    actions = [
+        # A 90 minute quick block on Tuesday evening
+        (day(1, 20, 0, 30), "block_app", ("game.exe", 90)),
+        # An internet block, extended while it runs and ended early after a cooling period
+        (day(2, 8), "block_internet", (120,)),
+        (day(2, 9), "extend_internet_block", (30,)),
+        (day(2, 9, 30), "request_unblock", ("internet",)),
+        # A quick block overlapping a routine, unblocked after the cooling period
+        (day(3, 16), "block_app", ("chrome.exe", 240)),
+        (day(3, 18), "request_unblock", ("app", "chrome.exe")),
+    ]
+    expected = []
+    for offset in range(5):
+        if offset != 3:
+            expected += [(day(offset, 9), "app", "chrome.exe", START), (day(offset, 17), "app", "chrome.exe", STOP)]
+    expected += [(day(3, 9), "app", "chrome.exe", START), (day(3, 18, 15), "app", "chrome.exe", STOP)]
+    for offset in (5, 6):
+        expected += [(day(offset, 10), "app", "game.exe", START), (day(offset, 12), "app", "game.exe", STOP)]
+    expected += [(day(1, 20, 0, 30), "app", "game.exe", START), (day(1, 21, 30, 30), "app", "game.exe", STOP)]
+    expected += [(day(2, 8), "internet", None, START), (day(2, 9, 45), "internet", None, STOP)]
+
+    return {
+        "start": monday,
+        "until": monday + timedelta(days=7),
+        "cooling_period_minutes": 15,
+        "routine_blocks": routines,
+        "actions": actions,
+        "expect": expected,
+    }
+
+
+def load_scenario(path):
+    with open(path, "r") as f:
+        raw = json.load(f)
+    start = datetime.fromisoformat(raw["start"])
+    return {
+        "start": start,
+        "until": start + timedelta(days=raw.get("days", 7)),
+        "cooling_period_minutes": raw.get("cooling_period_minutes", 15),
+        "routine_blocks": raw.get("routine_blocks", []),
+        "actions": [(datetime.fromisoformat(action["at"]), action["do"], tuple(action.get("args", ())))
+                    for action in raw.get("actions", [])],
+        "expect": [(datetime.fromisoformat(item["at"]), item["type"], item.get("target"), item["event"])
+                   for item in raw.get("expect", [])],
+    }
+
+
+def add_load(simulation, scenario, count):
+    """Spread `count` extra quick blocks of distinct apps over the scenario"""
+    span = (scenario["until"] - scenario["start"]).total_seconds()
+    for i in range(count):
+        when = scenario["start"] + timedelta(seconds=span * i / count)
+        simulation.at(when, "block_app", f"load{i}.exe", 1 + i % 180)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Digital Detox schedules at accelerated speed")
+    parser.add_argument("scenario", nargs="?", help="Scenario JSON file (default: a built-in week)")
+    parser.add_argument("--load", type=int, default=0, help="Extra quick blocks to stress the scheduler with")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario) if args.scenario else default_scenario(datetime.now())
+    simulation = Simulation(scenario["start"], scenario["routine_blocks"], scenario["cooling_period_minutes"])
+    for when, action, action_args in scenario["actions"]:
+        simulation.at(when, action, *action_args)
+    if args.load:
+        add_load(simulation, scenario, args.load)
+    simulation.run(scenario["until"])
+
+    if not args.quiet:
+        for transition in simulation.transitions:
+            if not transition[2] or not transition[2].startswith("load"):
+                print(format_transition(transition))
+    print(simulation.report())
+    if scenario["expect"]:
+        try:
+            simulation.check(scenario["expect"])
+        except SimulationError as e:
+            print(f"Unexpected enforcement:\n{e}")
+            sys.exit(1)
+        print(f"All {len(scenario['expect'])} expected transitions matched")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Schema-versioned state file with a lazily loaded history section
+
+The state is split by temperature:
+
+    digital_detox_data.json       hot section, loaded at startup: settings,
+                                  routines and blocks that have not ended yet
+    digital_detox_history.jsonl   append-only history of ended blocks, one
+                                  JSON object per line, only read (through
+                                  mmap) when statistics are first needed
+
+Ended blocks are moved from the hot file to the history on every save, so the
+hot file, and with it startup time, stays the same size however long the app
+has been in use. Version 1 files (a single JSON blob without
+"schema_version") are migrated on first load.
+"""
+import json
+import mmap
+import os
+from datetime import datetime
+
+SCHEMA_VERSION = 2
+ARCHIVED_SECTIONS = ("blocked_apps", "internet_blocks")
+
+
+class StateError(Exception):
+    """Raised when the state file cannot be read or written"""
+
+
+def split_expired(entries, now):
+    """Split entries into (still relevant, ended) by their end_time"""
+    active, expired = [], []
+    for entry in entries:
+        try:
+            ended = "end_time" in entry and datetime.fromisoformat(entry["end_time"]) <= now
+        except (TypeError, ValueError):
+            ended = False
+        (expired if ended else active).append(entry)
+    return active, expired
+
+
+class HistorySummary:
+    """Running totals over the history file, updated from the last read offset"""
+
+    def __init__(self):
+        self.offset = 0
+        self.blocks = {section: 0 for section in ARCHIVED_SECTIONS}
+        self.blocked_seconds = {section: 0.0 for section in ARCHIVED_SECTIONS}
+
+    def add(self, record):
+        section = record.get("section")
+        if section not in self.blocks:
+            return
+        self.blocks[section] += 1
+        try:
+            start = datetime.fromisoformat(record["start_time"])
+            end = datetime.fromisoformat(record["end_time"])
+            self.blocked_seconds[section] += max((end - start).total_seconds(), 0)
+        except (KeyError, TypeError, ValueError):
+            pass
+
+
+class StateStore:
+    """Reads and writes the hot state file and its history section"""
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+        self.history_file = self.section_file("history", ".jsonl")
+        self.summary = HistorySummary()
+
+    def section_file(self, section, ext):
+        """Path of a file stored alongside the state file, e.g. digital_detox_history.jsonl"""
+        root, _ = os.path.splitext(self.data_file)
+        if root.endswith("_data"):
+            root = root[:-len("_data")]
+        return f"{root}_{section}{ext}"
+
+    def load(self, now=None):
+        """Load the hot section, migrating older schema versions"""
+        if not os.path.exists(self.data_file):
+            return {}
+        try:
+            with open(self.data_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise StateError(e)
+
+        if data.get("schema_version", 1) < SCHEMA_VERSION:
+            data = self.migrate(data, now or datetime.now())
+        return data
+
+    def migrate(self, data, now):
+        """Move ended blocks of a version 1 file into the history section"""
+        for section in ARCHIVED_SECTIONS:
+            active, expired = split_expired(data.get(section, []), now)
+            data[section] = active
+            self.archive(section, expired)
+        data["schema_version"] = SCHEMA_VERSION
+        self.save(data)
+        return data
+
+    def save(self, data):
+        """Atomically write the hot section"""
+        data = dict(data, schema_version=SCHEMA_VERSION)
+        tmp_file = self.data_file + ".tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.data_file)
+        except OSError as e:
+            raise StateError(e)
+
+    def archive(self, section, entries):
+        """Append ended entries to the history section"""
+        if not entries:
+            return
+        try:
+            with open(self.history_file, "a") as f:
+                for entry in entries:
+                    f.write(json.dumps(dict(entry, section=section)))
+                    f.write("\n")
+        except OSError as e:
+            raise StateError(e)
+
+    def iter_history(self, start=0):
+        """Yield (end_offset, record) for history lines after byte offset `start`
+
+        record is None for lines that cannot be parsed.
+        """
+        try:
+            size = os.path.getsize(self.history_file)
+        except OSError:
+            return
+        if size <= start:
+            return
+        with open(self.history_file, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset = start
+                while offset < size:
+                    end = mm.find(b"\n", offset)
+                    if end == -1:
+                        # Partially written last line, pick it up next time
+                        break
+                    line = mm[offset:end]
+                    offset = end + 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    yield offset, record
+
+    def history_summary(self):
+        """Totals over the whole history, only reading lines added since the last call"""
+        summary = self.summary
+        for offset, record in self.iter_history(summary.offset):
+            if record is not None:
+                summary.add(record)
+            summary.offset = offset
+        return summary
@@ -0,0 +1,131 @@
+"""Background sampler of per-application CPU and memory use
+
+Every sample is a single pass over the process table. psutil reads all the
+attributes a pass needs for one process inside one oneshot() context, and the
+CPU times of every PID are cached so CPU% is the delta since the previous
+sample instead of a blocking cpu_percent(interval) call per process.
+"""
+import threading
+import time
+
+import psutil
+
+from detox import platforms
+from detox.processes import PsutilSource
+
+SAMPLE_ATTRS = ["cpu_times", "memory_info", "create_time"]
+
+
+class AppUsage:
+    """Resource use of all running instances of one executable"""
+
+    def __init__(self, name):
+        self.name = name
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.instances = 0
+
+    def impact(self):
+        return self.cpu_percent, self.rss
+
+
+class UsageSampler:
+    """Aggregates CPU%, RSS and instance count per executable name in a thread"""
+
+    def __init__(self, interval=3.0, on_sample=None, source=None):
+        self.interval = interval
+        self.source = source or PsutilSource()
+        self.on_sample = on_sample
+        self.platform = platforms.current()
+        self.attrs = list(dict.fromkeys(self.platform.app_process_attrs + SAMPLE_ATTRS))
+        self.cpu_count = psutil.cpu_count() or 1
+        self.cpu_cache = {}  # pid -> (create_time, cpu seconds, sampled at)
+        self.usage = None  # latest sample, sorted by impact, replaced as a whole
+        self.sampled_at = 0.0  # monotonic time of the latest sample
+        self.sample_lock = threading.Lock()
+        self.active = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        """Scan the process table once and publish the per-executable totals"""
+        with self.sample_lock:
+            now = time.monotonic()
+            cpu_cache = {}
+            usage = {}
+            for proc in self.source.process_iter(self.attrs, ad_value=None):
+                info = proc.info
+                if not self.platform.is_app_process(info):
+                    continue
+                app = usage.get(info["name"])
+                if app is None:
+                    app = usage[info["name"]] = AppUsage(info["name"])
+                app.instances += 1
+                if info["memory_info"] is not None:
+                    app.rss += info["memory_info"].rss
+                if info["cpu_times"] is not None:
+                    app.cpu_percent += self.cpu_percent(proc.pid, info, now, cpu_cache)
+
+            # Exited PIDs drop out of the cache with the swap
+            self.cpu_cache = cpu_cache
+            self.usage = sorted(usage.values(), key=AppUsage.impact, reverse=True)
+            self.sampled_at = now
+        if self.on_sample:
+            self.on_sample(self.usage)
+        return self.usage
+
+    def cpu_percent(self, pid, info, now, cpu_cache):
+        """Share of the whole machine used since the last sample of this PID"""
+        cpu_seconds = info["cpu_times"].user + info["cpu_times"].system
+        create_time = info["create_time"]
+        cpu_cache[pid] = (create_time, cpu_seconds, now)
+        cached = self.cpu_cache.get(pid)
+        if cached is not None and cached[0] == create_time and now > cached[2]:
+            elapsed = now - cached[2]
+            cpu_seconds -= cached[1]
+        elif create_time:
+            # First sight of this process, fall back to its lifetime average
+            elapsed = time.time() - create_time
+        else:
+            return 0.0
+        if elapsed <= 0:
+            return 0.0
+        return max(cpu_seconds, 0.0) / elapsed / self.cpu_count * 100
+
+    def latest(self, max_age=None):
+        """The latest sample, taking one right away if there is none yet or it is older than max_age seconds
+
+        The thread only samples while the results are on screen, pickers
+        elsewhere pass max_age so they never list apps from long ago.
+        """
+        usage = self.usage
+        if usage is None or (max_age is not None and time.monotonic() - self.sampled_at > max_age):
+            usage = self.sample()
+        return usage
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def set_active(self, active):
+        """Only sample while somebody is looking at the results"""
+        if active:
+            self.active.set()
+            self.wake_event.set()
+        else:
+            self.active.clear()
+
+    def refresh(self):
+        """Take the next sample now instead of at the end of the interval"""
+        self.wake_event.set()
+
+    def run(self):
+        while True:
+            self.active.wait()
+            try:
+                self.sample()
+            except Exception:
+                # A transient psutil error must not stop sampling for good
+                pass
+            self.wake_event.wait(self.interval)
+            self.wake_event.clear()
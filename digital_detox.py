@@ -1,20 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
-import subprocess
-import json
 import os
-import time
-import threading
-import psutil
 from datetime import datetime, timedelta
-import winreg
-import ctypes
 import re
 import socket
+from detox import bulk_io, platforms
+from detox.enforcement import CGROUP, KILL, SUSPEND
+from detox.engine import DetoxEngine
+from detox.policy_sync import PolicySyncClient, PolicySyncThread
+from detox.usage import UsageSampler
+
+DATA_FILE = os.path.join(os.path.expanduser("~"), "digital_detox_data.json")
+POLICY_CACHE_FILE = os.path.join(os.path.expanduser("~"), "digital_detox_policy_cache.json")
+NO_PROFILE = "No profile"
+ALWAYS = "Always"
 
 class DigitalDetoxApp:
-    def __init__(self, root):
+    def __init__(self, root, engine):
         self.root = root
+        self.engine = engine
         self.root.title("Digital Detox")
         self.root.geometry("800x600")
         self.root.resizable(True, True)
@@ -37,17 +41,19 @@ class DigitalDetoxApp:
         self.style.configure("TButton", background=self.primary_color, foreground="white", font=("Arial", 10, "bold"))
         self.style.configure("Accent.TButton", background=self.accent_color, foreground="white", font=("Arial", 10, "bold"))
         
-        # Initialize data structures
-        self.blocked_apps = []
-        self.routine_blocks = []
-        self.internet_blocks = []
-        self.cooling_period_minutes = 15
-        self.block_threads = {}
-        self.internet_block_active = False
+        # Initialize data structures (block state lives in the engine, which is
+        # already enforcing it by the time the UI is built)
+        self.policy_sync_thread = None
+        self.policy_cache_file = POLICY_CACHE_FILE
+        
+        # UI refresh state (refresh loops only run while their view is visible)
+        self.window_visible = True
+        self.dashboard_job = None
+        self.internet_status_job = None
         
-        # Load saved data
-        self.data_file = os.path.join(os.path.expanduser("~"), "digital_detox_data.json")
-        self.load_data()
+        # CPU and memory use of running apps, sampled only while the apps tab is shown
+        self.usage_sampler = UsageSampler(on_sample=lambda usage: self.root.after(0, self.on_usage_sample, usage))
+        self.usage_sampler.start()
         
         # Create main container
         self.main_container = ttk.Frame(self.root, padding="20")
@@ -79,38 +85,29 @@ class DigitalDetoxApp:
         self.setup_internet_tab()
         self.setup_settings_tab()
         
-        # Start a watchdog thread to enforce blocks
-        self.watchdog_thread = threading.Thread(target=self.block_watchdog, daemon=True)
-        self.watchdog_thread.start()
-        
         # Schedule data saving
         self.schedule_data_saving()
         
+        # Pull centrally managed blocks if a policy source is configured
+        self.start_policy_sync()
+        
         # Bind closing event
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-    
-    def load_data(self):
-        try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, "r") as f:
-                    data = json.load(f)
-                self.blocked_apps = data.get("blocked_apps", [])
-                self.routine_blocks = data.get("routine_blocks", [])
-                self.internet_blocks = data.get("internet_blocks", [])
-                self.cooling_period_minutes = data.get("cooling_period_minutes", 15)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load saved data: {e}")
+        
+        # Suspend UI refresh for hidden views and resync when they are shown again
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_view_changed)
+        self.root.bind("<Map>", self.on_window_mapped)
+        self.root.bind("<Unmap>", self.on_window_unmapped)
+        
+        # Engine events arrive on its threads, hand them over to Tk
+        self.engine.add_listener(lambda event, details: self.root.after(0, self.on_engine_event, event, details))
+        
+        if self.engine.load_error:
+            messagebox.showerror("Error", f"Failed to load saved data: {self.engine.load_error}")
     
     def save_data(self):
         try:
-            data = {
-                "blocked_apps": self.blocked_apps,
-                "routine_blocks": self.routine_blocks,
-                "internet_blocks": self.internet_blocks,
-                "cooling_period_minutes": self.cooling_period_minutes
-            }
-            with open(self.data_file, "w") as f:
-                json.dump(data, f)
+            self.engine.save()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save data: {e}")
     
@@ -118,6 +115,40 @@ class DigitalDetoxApp:
         self.save_data()
         self.root.after(60000, self.schedule_data_saving)  # Save every minute
     
+    def is_tab_visible(self, tab):
+        """Check whether a notebook tab is currently on screen"""
+        return self.window_visible and self.notebook.select() == str(tab)
+    
+    def on_view_changed(self, event=None):
+        """Resync the views that just became visible and let hidden ones idle"""
+        if self.is_tab_visible(self.dashboard_tab) and self.dashboard_job is None:
+            self.update_dashboard()
+        if self.is_tab_visible(self.internet_tab) and self.internet_status_job is None:
+            self.update_internet_status()
+        self.usage_sampler.set_active(self.is_tab_visible(self.apps_tab))
+    
+    def on_window_mapped(self, event):
+        # <Map> is also delivered for every child widget bound through the root
+        if event.widget is not self.root or self.window_visible:
+            return
+        self.window_visible = True
+        self.on_view_changed()
+    
+    def on_window_unmapped(self, event):
+        if event.widget is not self.root:
+            return
+        self.suspend_ui_refresh()
+    
+    def suspend_ui_refresh(self):
+        """Stop all periodic UI refresh; enforcement keeps running in its own thread"""
+        self.window_visible = False
+        self.usage_sampler.set_active(False)
+        for job in (self.dashboard_job, self.internet_status_job):
+            if job is not None:
+                self.root.after_cancel(job)
+        self.dashboard_job = None
+        self.internet_status_job = None
+    
     def setup_dashboard(self):
         # Create header
         header_frame = ttk.Frame(self.dashboard_tab)
@@ -196,34 +227,85 @@ class DigitalDetoxApp:
         quick_internet_btn = ttk.Button(actions_frame, text="Quick Block Internet", command=self.quick_block_internet)
         quick_internet_btn.pack(side=tk.LEFT, padx=5)
         
+        allowlist_btn = ttk.Button(actions_frame, text="Allowlist Session", command=self.start_allowlist_session)
+        allowlist_btn.pack(side=tk.LEFT, padx=5)
+        
+        # Profiles: named rule sets, one of them active at a time
+        ttk.Label(actions_frame, text="Profile:").pack(side=tk.LEFT, padx=(30, 5))
+        self.profile_var = tk.StringVar(value=self.engine.active_profile or NO_PROFILE)
+        self.profile_combo = ttk.Combobox(actions_frame, textvariable=self.profile_var, state="readonly", width=15)
+        self.profile_combo.pack(side=tk.LEFT, padx=5)
+        self.refresh_profile_choices()
+        
+        ttk.Button(actions_frame, text="Switch", command=self.switch_profile).pack(side=tk.LEFT, padx=5)
+        ttk.Button(actions_frame, text="New Profile", command=self.new_profile).pack(side=tk.LEFT, padx=5)
+        ttk.Button(actions_frame, text="Delete Profile", command=self.delete_profile).pack(side=tk.LEFT, padx=5)
+        
         # Schedule dashboard updates
         self.update_dashboard()
     
     def update_dashboard(self):
+        # The job that called us has run
+        self.dashboard_job = None
+        # Nothing to draw while the dashboard is hidden, on_view_changed restarts us
+        if not self.is_tab_visible(self.dashboard_tab):
+            return
+        try:
+            self.draw_dashboard()
+        finally:
+            # Refresh every second, a failed draw must not stop the refresh for good
+            self.dashboard_job = self.root.after(1000, self.update_dashboard)
+    
+    def draw_dashboard(self):
         # Clear existing items
         for item in self.active_blocks_tree.get_children():
             self.active_blocks_tree.delete(item)
         for item in self.upcoming_blocks_tree.get_children():
             self.upcoming_blocks_tree.delete(item)
         
-        current_time = datetime.now()
+        current_time = self.engine.clock.now()
         active_blocks = 0
         current_day = current_time.strftime("%A")
         
         # Add quick app blocks to active treeview
-        for app in self.blocked_apps:
+        for app in self.engine.blocked_apps:
             if "end_time" in app and datetime.fromisoformat(app["end_time"]) > current_time:
                 active_blocks += 1
                 end_time_str = datetime.fromisoformat(app["end_time"]).strftime("%H:%M:%S %d/%m/%Y")
-                self.active_blocks_tree.insert("", "end", values=("Quick App", app["name"], end_time_str, "Remove"), 
+                block_kind = "Quick Network" if app.get("network") else "Quick App"
+                self.active_blocks_tree.insert("", "end", values=(block_kind, app["name"], end_time_str, "Remove"), 
                                              tags=(f"app_{app['name']}",))
         
+        # An allowlist session closes everything but its apps
+        allowlist = self.engine.allowlist
+        if allowlist is not None and allowlist.is_active(current_time):
+            active_blocks += 1
+            self.active_blocks_tree.insert("", "end",
+                                         values=("Allowlist", "Only " + ", ".join(allowlist.apps),
+                                                 allowlist.end_time.strftime("%H:%M:%S %d/%m/%Y"), "Remove"),
+                                         tags=("allowlist",))
+        
+        # Blocks of the active profile last as long as it stays active
+        profile = next((profile for profile in self.engine.profiles
+                        if profile["name"] == self.engine.active_profile), None)
+        if profile is not None:
+            until = f"While {profile['name']} is active"
+            for app in profile.get("apps", ()):
+                active_blocks += 1
+                self.active_blocks_tree.insert("", "end", values=("Profile App", app, until, "Switch profile"),
+                                             tags=("profile",))
+            for app in profile.get("network_apps", ()):
+                active_blocks += 1
+                self.active_blocks_tree.insert("", "end", values=("Profile Network", app, until, "Switch profile"),
+                                             tags=("profile",))
+        
         # Add routine blocks to active and upcoming treeviews
-        for routine in self.routine_blocks:
+        for routine in self.engine.routine_blocks + (profile.get("routine_blocks", []) if profile else []):
             start_time = routine["start_time"]  # e.g., "09:00"
             end_time = routine["end_time"]      # e.g., "17:00"
             days = routine["days"]              # e.g., ["Monday", "Tuesday"]
             apps = routine["apps"]              # e.g., ["notepad.exe", "chrome.exe"]
+            block_kind = "Routine Network" if routine.get("network") else "Routine App"
             
             # Check if routine is active now
             current_time_str = current_time.strftime("%H:%M")
@@ -238,7 +320,7 @@ class DigitalDetoxApp:
                     if end_datetime < current_time:
                         end_datetime += timedelta(days=1)
                     end_time_str = end_datetime.strftime("%H:%M:%S %d/%m/%Y")
-                    self.active_blocks_tree.insert("", "end", values=("Routine App", app, end_time_str, "Remove"),
+                    self.active_blocks_tree.insert("", "end", values=(block_kind, app, end_time_str, "Remove"),
                                                  tags=(f"app_{app}",))
             
             # Add to upcoming blocks if within the next 7 days
@@ -254,27 +336,62 @@ class DigitalDetoxApp:
                         days_str = ", ".join(days)
                         apps_str = ", ".join(apps)
                         self.upcoming_blocks_tree.insert("", "end", 
-                                                       values=("Routine App", apps_str, 
+                                                       values=(block_kind, apps_str, 
                                                                start_datetime.strftime("%H:%M %d/%m/%Y"),
                                                                end_datetime.strftime("%H:%M %d/%m/%Y"),
                                                                days_str))
         
         # Add internet blocks to active treeview
-        for block in self.internet_blocks:
-            if "end_time" in block and datetime.fromisoformat(block["end_time"]) > current_time:
+        for start_time, end_time in self.engine.internet_intervals:
+            if end_time > current_time:
                 active_blocks += 1
-                end_time_str = datetime.fromisoformat(block["end_time"]).strftime("%H:%M:%S %d/%m/%Y")
+                end_time_str = end_time.strftime("%H:%M:%S %d/%m/%Y")
                 self.active_blocks_tree.insert("", "end", values=("Internet", "All websites", end_time_str, "Remove"),
                                              tags=("internet",))
         
         # Update stats
         if active_blocks > 0:
-            self.stats_label.config(text=f"{active_blocks} active block(s)")
+            stats_text = f"{active_blocks} active block(s)"
         else:
-            self.stats_label.config(text="No blocks active")
-        
-        # Refresh every second
-        self.root.after(1000, self.update_dashboard)
+            stats_text = "No blocks active"
+        
+        pending_unblocks = len(self.engine.scheduler.pending("unblock"))
+        if pending_unblocks:
+            stats_text += f", {pending_unblocks} unblock request(s) in cooling period"
+        
+        # History is read lazily, and after the first time only the newly archived lines
+        history = self.engine.state_store.history_summary()
+        completed = sum(history.blocks.values())
+        if completed:
+            hours = sum(history.blocked_seconds.values()) / 3600
+            stats_text += f"\n{completed} completed block(s), {hours:.1f}h blocked in total"
+        
+        quotas = self.engine.quota_tracker
+        if self.engine.app_quotas:
+            usage = [f"{name} {quotas.used_seconds(name, current_time) / 60:.0f}/{limit / 60:.0f}m"
+                     for name, limit in quotas.limits.items()]
+            stats_text += f"\nDaily quotas: {', '.join(usage)}"
+        
+        metrics = self.engine.enforcer.metrics()
+        stats_text += (f"\nEnforcement: {metrics['kills']} closed, {metrics['frozen']} frozen, "
+                       f"{metrics['storms']} respawn storm(s)")
+        if metrics["storms"]:
+            stats_text += f"\nKill-loop CPU: {metrics['kill_loop_cpu_seconds']:.2f}s"
+            if metrics["escalated_parents"]:
+                stats_text += f", blocked launchers: {', '.join(metrics['escalated_parents'])}"
+        guard = self.engine.exec_guard
+        if guard is not None and guard.checks:
+            stats_text += (f"\nStopped before start: {guard.denied} of {guard.checks} launches checked, "
+                           f"{guard.check_seconds / guard.checks * 1e6:.0f}\u00b5s per check")
+        audit = self.engine.audit
+        if audit.dropped:
+            stats_text += f"\nAudit log: {audit.written} event(s) written, {audit.dropped} dropped"
+        blocker = self.engine.network_blocker
+        if blocker is not None and blocker.applied:
+            stats_text += f"\nOffline: {', '.join(blocker.blocked)}"
+        if self.engine.network_block_error is not None and self.engine.network_matcher.names:
+            stats_text += f"\nPer-app network block failing: {self.engine.network_block_error}"
+        self.stats_label.config(text=stats_text)
     
     def quick_block_app(self):
         running_apps = self.get_running_applications()
@@ -313,6 +430,87 @@ class DigitalDetoxApp:
         if duration:
             self.block_app(app_name, duration)
     
+    def refresh_profile_choices(self):
+        self.profile_combo["values"] = [NO_PROFILE] + [profile["name"] for profile in self.engine.profiles]
+        self.profile_var.set(self.engine.active_profile or NO_PROFILE)
+    
+    def switch_profile(self):
+        name = self.profile_var.get()
+        target = None if name == NO_PROFILE else name
+        if target == self.engine.active_profile:
+            return
+        if self.engine.active_profile is None:
+            # Nothing gets weaker, no cooling period needed
+            self.engine.activate_profile(target)
+            self.save_data()
+            messagebox.showinfo("Success", f"Profile {name} is now active")
+            return
+        # Leaving a profile lifts its blocks, which goes through the cooling period
+        self.profile_var.set(self.engine.active_profile)
+        self.attempt_unblock("profile", target)
+    
+    def new_profile(self):
+        name = simpledialog.askstring("New Profile", "Profile name (e.g. Deep work):")
+        if not name or not name.strip() or name.strip() == NO_PROFILE:
+            return
+        name = name.strip()
+        if name == self.engine.active_profile:
+            messagebox.showerror("Error", "The active profile cannot be changed, switch to another one first")
+            return
+        apps = simpledialog.askstring("New Profile", "Apps to block while it is active (comma separated):") or ""
+        network_apps = ""
+        if platforms.current().name == "Linux":
+            network_apps = simpledialog.askstring(
+                "New Profile", "Apps to keep offline while it is active (comma separated):") or ""
+        profile = {
+            "name": name,
+            "apps": [app.strip() for app in apps.split(",") if app.strip()],
+            "network_apps": [app.strip() for app in network_apps.split(",") if app.strip()],
+            "routine_blocks": []
+        }
+        # Routines added to the profile before are kept
+        for existing in self.engine.profiles:
+            if existing["name"] == name:
+                profile["routine_blocks"] = existing.get("routine_blocks", [])
+        self.engine.set_profile(profile)
+        self.save_data()
+        self.refresh_profile_choices()
+        messagebox.showinfo("Success", f"Saved profile {name}, add scheduled blocks to it from the routine setup")
+    
+    def delete_profile(self):
+        name = self.profile_var.get()
+        if name == NO_PROFILE:
+            return
+        if name == self.engine.active_profile:
+            messagebox.showerror("Error", "The active profile cannot be deleted, switch to another one first")
+            return
+        if not messagebox.askyesno("Delete Profile", f"Delete profile {name}?"):
+            return
+        self.engine.delete_profile(name)
+        self.save_data()
+        self.refresh_profile_choices()
+    
+    def start_allowlist_session(self):
+        apps = simpledialog.askstring("Allowlist Session",
+                                      "Apps that may keep running (comma separated), everything else is closed:")
+        if not apps:
+            return
+        apps = [app.strip() for app in apps.split(",") if app.strip()]
+        duration = simpledialog.askinteger("Allowlist Session", "Enter duration in minutes:", minvalue=1, maxvalue=1440)
+        if not duration:
+            return
+        if not messagebox.askyesno("Allowlist Session",
+                                   f"Every other app you are running will be closed for {duration} minutes, "
+                                   f"unsaved work in them is lost. Start the session?"):
+            return
+        try:
+            end_time = self.engine.start_allowlist(apps, duration)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.save_data()
+        messagebox.showinfo("Success", f"Only {', '.join(apps)} may run until {end_time.strftime('%H:%M:%S %d/%m/%Y')}")
+    
     def quick_block_internet(self):
         duration = simpledialog.askinteger("Block Internet", "Enter duration in minutes:", minvalue=1, maxvalue=1440)
         if duration:
@@ -344,12 +542,21 @@ class DigitalDetoxApp:
         list_frame = ttk.Frame(quick_frame)
         list_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         
-        # App listbox with scrollbar
-        self.app_listbox = tk.Listbox(list_frame, height=10, selectmode=tk.SINGLE)
-        self.app_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.app_listbox.yview)
-        self.app_listbox.configure(yscrollcommand=scrollbar.set)
+        # App list with resource use, heaviest first, and scrollbar
+        self.app_tree = ttk.Treeview(list_frame, columns=("App", "CPU", "Memory", "Instances"),
+                                     show="headings", height=10, selectmode="extended")
+        self.app_tree.heading("App", text="Application")
+        self.app_tree.heading("CPU", text="CPU %")
+        self.app_tree.heading("Memory", text="Memory")
+        self.app_tree.heading("Instances", text="Instances")
+        self.app_tree.column("App", width=250)
+        self.app_tree.column("CPU", width=70, anchor=tk.E)
+        self.app_tree.column("Memory", width=90, anchor=tk.E)
+        self.app_tree.column("Instances", width=70, anchor=tk.E)
+        self.app_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.app_tree.yview)
+        self.app_tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Buttons frame
@@ -364,6 +571,10 @@ class DigitalDetoxApp:
         choose_path_btn = ttk.Button(buttons_frame, text="Choose App by Path", command=self.choose_app_by_path)
         choose_path_btn.pack(side=tk.LEFT, padx=5)
         
+        # Block a pasted list of apps in one go
+        paste_btn = ttk.Button(buttons_frame, text="Paste App List", command=self.paste_app_list)
+        paste_btn.pack(side=tk.LEFT, padx=5)
+        
         # Block controls frame
         block_frame = ttk.Frame(quick_frame)
         block_frame.pack(fill=tk.X, pady=10)
@@ -377,12 +588,32 @@ class DigitalDetoxApp:
         # Block button
         block_btn = ttk.Button(
             block_frame, 
-            text="Block Selected App", 
+            text="Block Selected Apps", 
             command=self.block_selected_app,
             style="Accent.TButton"
         )
         block_btn.pack(side=tk.LEFT, padx=20)
         
+        # Per-app network blocks need nftables, only offered on Linux
+        self.network_only_var = tk.BooleanVar(value=False)
+        if platforms.current().name == "Linux":
+            ttk.Checkbutton(block_frame, text="Only block its network access",
+                            variable=self.network_only_var).pack(side=tk.LEFT, padx=5)
+        
+        # Daily quota controls
+        quota_frame = ttk.Frame(quick_frame)
+        quota_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(quota_frame, text="Daily Quota (minutes):").pack(side=tk.LEFT, padx=5)
+        self.quota_var = tk.StringVar(value="90")
+        quota_entry = ttk.Entry(quota_frame, textvariable=self.quota_var, width=5)
+        quota_entry.pack(side=tk.LEFT, padx=5)
+        
+        quota_btn = ttk.Button(quota_frame, text="Set Quota for Selected App", command=self.set_quota_for_selected_app)
+        quota_btn.pack(side=tk.LEFT, padx=20)
+        
+        ttk.Label(quota_frame, text="0 removes the quota").pack(side=tk.LEFT, padx=5)
+        
         # Routine Block Section
         routine_frame = ttk.LabelFrame(app_frame, text="Routine Block", padding=10)
         routine_frame.pack(fill=tk.X, pady=5)
@@ -396,6 +627,18 @@ class DigitalDetoxApp:
         )
         routine_btn.pack(pady=10)
         
+        # Bulk import/export section
+        bulk_frame = ttk.LabelFrame(app_frame, text="Bulk Rules", padding=10)
+        bulk_frame.pack(fill=tk.X, pady=5)
+        
+        import_btn = ttk.Button(bulk_frame, text="Import Rules...", command=self.import_rules)
+        import_btn.pack(side=tk.LEFT, padx=5)
+        
+        export_btn = ttk.Button(bulk_frame, text="Export Rules...", command=self.export_rules)
+        export_btn.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(bulk_frame, text="CSV or JSON Lines (.jsonl)").pack(side=tk.LEFT, padx=10)
+        
         # Store full app list for filtering
         self.full_app_list = []
         
@@ -453,7 +696,7 @@ class DigitalDetoxApp:
         # Step 2: Select Time and Days
         wizard = tk.Toplevel(self.root)
         wizard.title("Routine Block Setup")
-        wizard.geometry("400x500")
+        wizard.geometry("400x580")
         wizard.resizable(False, False)
         wizard.transient(self.root)
         wizard.grab_set()
@@ -494,6 +737,21 @@ class DigitalDetoxApp:
         for day in days:
             ttk.Checkbutton(days_frame, text=day, variable=day_vars[day]).pack(anchor=tk.W)
         
+        network_only_var = tk.BooleanVar(value=False)
+        if platforms.current().name == "Linux":
+            ttk.Checkbutton(frame, text="Only block their network access",
+                            variable=network_only_var).pack(anchor=tk.W, pady=(10, 0))
+        
+        # Routines either always apply or only while their profile is active
+        profile_var = tk.StringVar(value=ALWAYS)
+        if self.engine.profiles:
+            profile_frame = ttk.Frame(frame)
+            profile_frame.pack(fill=tk.X, pady=(10, 0))
+            ttk.Label(profile_frame, text="Applies:").pack(side=tk.LEFT)
+            ttk.Combobox(profile_frame, textvariable=profile_var, state="readonly", width=20,
+                         values=[ALWAYS] + [f"With {profile['name']}" for profile in self.engine.profiles]
+                         ).pack(side=tk.LEFT, padx=5)
+        
         # Buttons
         button_frame = ttk.Frame(frame)
         button_frame.pack(fill=tk.X, pady=20)
@@ -528,7 +786,15 @@ class DigitalDetoxApp:
                 "end_time": end_time,
                 "days": selected_days
             }
-            self.routine_blocks.append(routine)
+            if network_only_var.get():
+                routine["network"] = True
+            applies = profile_var.get()
+            profile = next((profile for profile in self.engine.profiles
+                            if applies == f"With {profile['name']}"), None)
+            if profile is not None:
+                self.engine.set_profile(dict(profile, routine_blocks=profile.get("routine_blocks", []) + [routine]))
+            else:
+                self.engine.update_rules(lambda blocked_apps, routine_blocks: (blocked_apps, routine_blocks + [routine]))
             self.save_data()
             
             # Show confirmation
@@ -542,23 +808,84 @@ class DigitalDetoxApp:
         ttk.Button(button_frame, text="Save", command=save_routine, style="Accent.TButton").pack(side=tk.RIGHT, padx=5)
         ttk.Button(button_frame, text="Cancel", command=wizard.destroy).pack(side=tk.RIGHT, padx=5)
     
+    def import_rules(self):
+        file_path = filedialog.askopenfilename(
+            title="Import Block Rules",
+            filetypes=[("Rule files", "*.csv *.jsonl *.ndjson"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        
+        try:
+            batch = bulk_io.read_rules(file_path)
+        except (OSError, bulk_io.RuleValidationError) as e:
+            messagebox.showerror("Error", f"Failed to read rules: {e}")
+            return
+        
+        # Validate everything first so a bad file never leaves a half-applied import
+        if batch.error_count:
+            shown = "\n".join(batch.errors[:10])
+            more = f"\n...and {batch.error_count - 10} more" if batch.error_count > 10 else ""
+            if not messagebox.askyesno(
+                "Invalid Rules",
+                f"{batch.error_count} invalid record(s) found:\n{shown}{more}\n\nImport the valid rules anyway?"
+            ):
+                return
+        
+        # Apply as one batch: one list swap, one matcher rebuild, one save
+        self.engine.update_rules(lambda blocked_apps, routine_blocks: bulk_io.merge_rules(blocked_apps, routine_blocks, batch))
+        self.save_data()
+        
+        messagebox.showinfo(
+            "Success",
+            f"Imported {len(batch.blocked_apps)} app block(s) and {len(batch.routine_blocks)} routine(s)"
+        )
+    
+    def export_rules(self):
+        file_path = filedialog.asksaveasfilename(
+            title="Export Block Rules",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl")]
+        )
+        if not file_path:
+            return
+        
+        try:
+            count = bulk_io.write_rules(file_path, self.engine.blocked_apps, self.engine.routine_blocks)
+        except (OSError, bulk_io.RuleValidationError) as e:
+            messagebox.showerror("Error", f"Failed to export rules: {e}")
+            return
+        
+        messagebox.showinfo("Success", f"Exported {count} rule(s) to {os.path.basename(file_path)}")
+    
     def refresh_app_list(self):
-        self.app_listbox.delete(0, tk.END)
-        self.full_app_list = self.get_running_applications()
-        for app in self.full_app_list:
-            self.app_listbox.insert(tk.END, app)
+        self.full_app_list = self.usage_sampler.latest()
+        self.filter_app_list()
+        # The sampler answers with a fresh sample through on_usage_sample
+        self.usage_sampler.refresh()
+    
+    def on_usage_sample(self, usage):
+        self.full_app_list = usage
+        if self.is_tab_visible(self.apps_tab):
+            self.filter_app_list()
     
     def filter_app_list(self, *args):
         search_term = self.search_var.get().lower()
-        self.app_listbox.delete(0, tk.END)
+        selection = self.app_tree.selection()
+        self.app_tree.delete(*self.app_tree.get_children())
         for app in self.full_app_list:
-            if search_term in app.lower():
-                self.app_listbox.insert(tk.END, app)
+            if search_term in app.name.lower():
+                self.app_tree.insert("", "end", iid=app.name, values=(
+                    app.name, f"{app.cpu_percent:.1f}", f"{app.rss / (1024 * 1024):.0f} MB", app.instances))
+        # Keep the selection across refreshes
+        selection = [iid for iid in selection if self.app_tree.exists(iid)]
+        if selection:
+            self.app_tree.selection_set(selection)
     
     def choose_app_by_path(self):
         file_path = filedialog.askopenfilename(
             title="Select Application",
-            filetypes=[("Executable files", "*.exe"), ("All files", "*.*")]
+            filetypes=platforms.current().executable_filetypes
         )
         if file_path:
             app_name = os.path.basename(file_path)
@@ -567,82 +894,135 @@ class DigitalDetoxApp:
                 self.block_app(app_name, duration)
     
     def get_running_applications(self):
-        running_apps = set()
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                proc_info = proc.info
-                if proc_info['name'] and proc_info['name'].endswith('.exe'):
-                    running_apps.add(proc_info['name'])
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        return sorted(list(running_apps))
+        # Served from the usage sampler, which already scans the process table; the
+        # sample is retaken when the Apps tab has not kept it fresh
+        return sorted(app.name for app in self.usage_sampler.latest(max_age=self.usage_sampler.interval))
     
     def block_selected_app(self):
-        if not self.app_listbox.curselection():
+        if not self.app_tree.selection():
             messagebox.showinfo("Info", "Please select an application to block")
             return
         
-        app_name = self.app_listbox.get(self.app_listbox.curselection())
-        
+        app_names = list(self.app_tree.selection())
+        duration = self.get_block_duration()
+        if duration:
+            self.block_apps(app_names, duration, self.network_only_var.get())
+    
+    def get_block_duration(self):
         try:
             duration = int(self.duration_var.get())
             if duration <= 0:
                 messagebox.showerror("Error", "Duration must be positive")
-                return
+                return None
         except ValueError:
             messagebox.showerror("Error", "Duration must be a number")
+            return None
+        return duration
+    
+    def paste_app_list(self):
+        """Block apps typed or pasted as a list, one per line or separated by commas"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Paste App List")
+        dialog.geometry("350x300")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        frame = ttk.Frame(dialog, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(frame, text="Apps to block, one per line or comma separated:").pack(anchor=tk.W)
+        text = tk.Text(frame, height=10)
+        text.pack(fill=tk.BOTH, expand=True, pady=5)
+        text.focus_set()
+        
+        def block():
+            app_names = [name.strip() for name in re.split(r"[,\n]", text.get("1.0", tk.END)) if name.strip()]
+            if not app_names:
+                return
+            duration = self.get_block_duration()
+            if not duration:
+                return
+            dialog.destroy()
+            self.block_apps(app_names, duration, self.network_only_var.get())
+        
+        ttk.Button(frame, text="Block", command=block, style="Accent.TButton").pack(side=tk.RIGHT)
+        ttk.Button(frame, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
+    
+    def set_quota_for_selected_app(self):
+        if not self.app_tree.selection():
+            messagebox.showinfo("Info", "Please select an application")
+            return
+        
+        app_names = list(self.app_tree.selection())
+        
+        try:
+            minutes = int(self.quota_var.get())
+            if minutes < 0:
+                messagebox.showerror("Error", "Quota cannot be negative")
+                return
+        except ValueError:
+            messagebox.showerror("Error", "Quota must be a number")
             return
         
-        self.block_app(app_name, duration)
+        for app_name in app_names:
+            self.engine.set_quota(app_name, minutes)
+        self.save_data()
+        apps_str = ", ".join(app_names)
+        if minutes:
+            messagebox.showinfo("Success", f"{apps_str}: limited to {minutes} minutes per day each, then blocked until midnight")
+        else:
+            messagebox.showinfo("Success", f"Removed the daily quota of {apps_str}")
     
-    def block_app(self, app_name, duration):
-        # Check if app is already blocked
-        for app in self.blocked_apps:
-            if app["name"] == app_name and "end_time" in app:
-                end_time = datetime.fromisoformat(app["end_time"])
-                if end_time > datetime.now():
-                    response = messagebox.askyesno(
-                        "App Already Blocked", 
-                        f"{app_name} is already blocked until {end_time.strftime('%H:%M:%S %d/%m/%Y')}. Do you want to extend the block?"
-                    )
-                    if not response:
-                        return
-                    # Remove existing block
-                    self.blocked_apps = [a for a in self.blocked_apps if a["name"] != app_name]
-                    break
-        
-        end_time = datetime.now() + timedelta(minutes=duration)
-        
-        # Add to blocked apps list
-        self.blocked_apps.append({
-            "name": app_name,
-            "start_time": datetime.now().isoformat(),
-            "end_time": end_time.isoformat()
-        })
+    def block_app(self, app_name, duration, network=False):
+        self.block_apps([app_name], duration, network)
+    
+    def block_apps(self, app_names, duration, network=False):
+        """Block many apps with one rule update, one save, one kill pass and one thread"""
+        app_names = list(dict.fromkeys(app_names))
+        apps_str = ", ".join(app_names)
+        
+        # Check if any app is already blocked, asking once for all of them
+        now = self.engine.clock.now()
+        already_blocked = sorted({app["name"] for app in self.engine.blocked_apps
+                                  if app["name"] in app_names and "end_time" in app
+                                  and bool(app.get("network")) == network
+                                  and datetime.fromisoformat(app["end_time"]) > now})
+        if already_blocked:
+            response = messagebox.askyesno(
+                "App Already Blocked", 
+                f"{', '.join(already_blocked)} already blocked. Do you want to replace the block with the new duration?"
+            )
+            if not response:
+                return
+        
+        # Add to blocked apps list, replacing the existing blocks
+        end_time = self.engine.block_apps(app_names, duration, network)
         
         # Save data
         self.save_data()
         
-        # Kill current instances of the app
-        self.kill_app(app_name)
+        if network and self.engine.network_blocker is not None:
+            # The watchdog moves them offline, the apps themselves keep running
+            messagebox.showinfo("Success", f"{apps_str}: no network access until {end_time.strftime('%H:%M:%S %d/%m/%Y')}")
+            return
+        if network:
+            messagebox.showwarning("Network Block Unavailable",
+                                   f"Per-app network blocking is unavailable ({self.engine.network_block_error}), "
+                                   f"{apps_str} will be closed instead")
         
-        # Start a blocking thread
-        if app_name in self.block_threads:
-            self.block_threads[app_name].stop()
+        # Kill current instances of all the apps in one pass
+        self.kill_apps(app_names)
         
-        thread = AppBlockThread(app_name, end_time)
-        thread.start()
-        self.block_threads[app_name] = thread
+        # Start a single blocking thread for the batch
+        self.engine.start_block_threads(app_names, end_time)
         
-        messagebox.showinfo("Success", f"{app_name} has been blocked until {end_time.strftime('%H:%M:%S %d/%m/%Y')}")
+        messagebox.showinfo("Success", f"{apps_str}: blocked until {end_time.strftime('%H:%M:%S %d/%m/%Y')}")
     
     def kill_app(self, app_name):
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                if proc.info['name'] == app_name:
-                    proc.kill()
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
+        self.kill_apps([app_name])
+    
+    def kill_apps(self, app_names):
+        # Kills or freezes depending on the enforcement mode
+        self.engine.enforcer.enforce_names(app_names)
     
     def setup_internet_tab(self):
         # Create container for internet blocking
@@ -700,18 +1080,22 @@ class DigitalDetoxApp:
         self.update_internet_status()
     
     def update_internet_status(self):
-        current_time = datetime.now()
-        active_block = None
-        
-        for block in self.internet_blocks:
-            if "end_time" in block:
-                end_time = datetime.fromisoformat(block["end_time"])
-                if end_time > current_time:
-                    active_block = block
-                    break
-        
-        if active_block:
-            end_time = datetime.fromisoformat(active_block["end_time"])
+        # The job that called us has run
+        self.internet_status_job = None
+        # Nothing to draw while the internet tab is hidden, on_view_changed restarts us
+        if not self.is_tab_visible(self.internet_tab):
+            return
+        try:
+            self.draw_internet_status()
+        finally:
+            # Refresh every second, a failed draw must not stop the refresh for good
+            self.internet_status_job = self.root.after(1000, self.update_internet_status)
+    
+    def draw_internet_status(self):
+        current_time = self.engine.clock.now()
+        end_time = self.engine.internet_intervals.blocked_until(current_time)
+        
+        if end_time:
             remaining = end_time - current_time
             hours, remainder = divmod(int(remaining.total_seconds()), 3600)
             minutes, seconds = divmod(remainder, 60)
@@ -726,9 +1110,6 @@ class DigitalDetoxApp:
         else:
             self.internet_status_var.set("Not Blocked")
             self.block_internet_btn.config(text="Block Internet", command=self.block_internet_action)
-        
-        # Update every second
-        self.root.after(1000, self.update_internet_status)
     
     def block_internet_action(self):
         try:
@@ -751,21 +1132,16 @@ class DigitalDetoxApp:
         self.block_internet(duration)
     
     def block_internet(self, duration):
-        end_time = datetime.now() + timedelta(minutes=duration)
-        
-        # Add to internet blocks list
-        self.internet_blocks.append({
-            "start_time": datetime.now().isoformat(),
-            "end_time": end_time.isoformat()
-        })
+        # Merged with any block that is already running
+        end_time = self.engine.block_internet(duration)
         
         # Save data
         self.save_data()
         
         # Disable network adapters
         try:
-            self.disable_network_adapters()
-            self.internet_block_active = True
+            self.engine.disable_network_adapters()
+            self.engine.internet_block_active = True
             messagebox.showinfo("Success", f"Internet has been blocked until {end_time.strftime('%H:%M:%S %d/%m/%Y')}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to block internet: {e}")
@@ -780,27 +1156,10 @@ class DigitalDetoxApp:
             messagebox.showerror("Error", "Duration must be a number")
             return
         
-        # Find current active block
-        current_time = datetime.now()
-        active_block = None
-        active_index = -1
-        
-        for i, block in enumerate(self.internet_blocks):
-            if "end_time" in block:
-                end_time = datetime.fromisoformat(block["end_time"])
-                if end_time > current_time:
-                    active_block = block
-                    active_index = i
-                    break
-        
-        if active_block:
-            # Extend the end time
-            current_end_time = datetime.fromisoformat(active_block["end_time"])
-            new_end_time = current_end_time + timedelta(minutes=additional_duration)
-            
-            # Update the block
-            self.internet_blocks[active_index]["end_time"] = new_end_time.isoformat()
-            
+        # Extend the active block, if there is one
+        new_end_time = self.engine.extend_internet_block(additional_duration)
+        
+        if new_end_time:
             # Save data
             self.save_data()
             
@@ -809,12 +1168,6 @@ class DigitalDetoxApp:
             # No active block, create a new one
             self.block_internet(additional_duration)
     
-    def disable_network_adapters(self):
-        subprocess.run(["netsh", "interface", "set", "interface", "name=*", "admin=disabled"], check=True)
-    
-    def enable_network_adapters(self):
-        subprocess.run(["netsh", "interface", "set", "interface", "name=*", "admin=enabled"], check=True)
-    
     def setup_settings_tab(self):
         # Create container for settings
         settings_frame = ttk.Frame(self.settings_tab, padding=10)
@@ -829,7 +1182,7 @@ class DigitalDetoxApp:
         
         ttk.Label(cooling_frame, text="Wait time before removing blocks (minutes):").pack(side=tk.LEFT, padx=5)
         
-        self.cooling_period_var = tk.StringVar(value=str(self.cooling_period_minutes))
+        self.cooling_period_var = tk.StringVar(value=str(self.engine.cooling_period_minutes))
         cooling_entry = ttk.Entry(cooling_frame, textvariable=self.cooling_period_var, width=5)
         cooling_entry.pack(side=tk.LEFT, padx=5)
         
@@ -837,18 +1190,67 @@ class DigitalDetoxApp:
         save_cooling_btn.pack(side=tk.LEFT, padx=20)
         
         # Auto-start settings
-        autostart_frame = ttk.LabelFrame(settings_frame, text="Start with Windows", padding=10)
+        platform_name = platforms.current().name
+        autostart_frame = ttk.LabelFrame(settings_frame, text=f"Start with {platform_name}", padding=10)
         autostart_frame.pack(fill=tk.X, pady=10)
         
         self.autostart_var = tk.BooleanVar(value=self.check_autostart())
         autostart_check = ttk.Checkbutton(
             autostart_frame, 
-            text="Start Digital Detox when Windows boots", 
+            text=f"Start Digital Detox when {platform_name} boots", 
             variable=self.autostart_var,
             command=self.toggle_autostart
         )
         autostart_check.pack(anchor=tk.W, padx=5)
         
+        # Enforcement mode settings
+        enforcement_frame = ttk.LabelFrame(settings_frame, text="Enforcement", padding=10)
+        enforcement_frame.pack(fill=tk.X, pady=10)
+        
+        self.enforcement_mode_var = tk.StringVar(value=self.engine.enforcer.mode)
+        ttk.Radiobutton(
+            enforcement_frame,
+            text="Close blocked apps",
+            variable=self.enforcement_mode_var,
+            value=KILL,
+            command=self.save_enforcement_mode
+        ).pack(anchor=tk.W, padx=5)
+        ttk.Radiobutton(
+            enforcement_frame,
+            text="Freeze blocked apps and resume them when the block ends (keeps unsaved work)",
+            variable=self.enforcement_mode_var,
+            value=SUSPEND,
+            command=self.save_enforcement_mode
+        ).pack(anchor=tk.W, padx=5)
+        if platforms.current().name == "Linux":
+            ttk.Radiobutton(
+                enforcement_frame,
+                text="Freeze blocked apps in a cgroup, including everything they start (needs root)",
+                variable=self.enforcement_mode_var,
+                value=CGROUP,
+                command=self.save_enforcement_mode
+            ).pack(anchor=tk.W, padx=5)
+            self.deny_exec_var = tk.BooleanVar(value=self.engine.exec_guard is not None)
+            ttk.Checkbutton(
+                enforcement_frame,
+                text="Stop blocked apps from starting at all (fanotify, needs root)",
+                variable=self.deny_exec_var,
+                command=self.save_deny_exec
+            ).pack(anchor=tk.W, padx=5, pady=(5, 0))
+        
+        # Central policy settings
+        policy_frame = ttk.LabelFrame(settings_frame, text="Central Policy", padding=10)
+        policy_frame.pack(fill=tk.X, pady=10)
+        
+        ttk.Label(policy_frame, text="Policy URL or shared file:").pack(side=tk.LEFT, padx=5)
+        
+        self.policy_source_var = tk.StringVar(value=self.engine.policy_source)
+        policy_entry = ttk.Entry(policy_frame, textvariable=self.policy_source_var)
+        policy_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
+        save_policy_btn = ttk.Button(policy_frame, text="Save", command=self.save_policy_source)
+        save_policy_btn.pack(side=tk.LEFT, padx=20)
+        
         # About section
         about_frame = ttk.LabelFrame(settings_frame, text="About", padding=10)
         about_frame.pack(fill=tk.BOTH, expand=True, pady=10)
@@ -861,6 +1263,8 @@ class DigitalDetoxApp:
             "• Enforcing a cooling period to prevent impulsive unblocking\n\n"
             "Thank you for using Digital Detox!"
         )
+        if self.engine.time_to_enforce is not None:
+            about_text += f"\n\nBlocks were enforced {self.engine.time_to_enforce:.2f}s after launch."
         
         about_label = ttk.Label(about_frame, text=about_text, wraplength=500, justify=tk.LEFT)
         about_label.pack(fill=tk.BOTH, expand=True)
@@ -872,133 +1276,91 @@ class DigitalDetoxApp:
                 messagebox.showerror("Error", "Cooling period must be non-negative")
                 return
             
-            self.cooling_period_minutes = period
+            self.engine.cooling_period_minutes = period
             self.save_data()
             messagebox.showinfo("Success", "Cooling period updated")
         except ValueError:
             messagebox.showerror("Error", "Cooling period must be a number")
     
+    def save_enforcement_mode(self):
+        self.engine.enforcement_mode = self.enforcement_mode_var.get()
+        self.engine.enforcer.set_mode(self.engine.enforcement_mode)
+        self.save_data()
+        if self.engine.enforcement_mode == CGROUP and self.engine.enforcer.freezer is None:
+            messagebox.showinfo("Info", "No writable cgroup v2 hierarchy was found, blocked apps will be frozen one process at a time")
+    
+    def save_deny_exec(self):
+        active = self.engine.set_deny_exec(self.deny_exec_var.get())
+        self.save_data()
+        if self.deny_exec_var.get() and not active:
+            self.deny_exec_var.set(False)
+            messagebox.showinfo("Info", f"Blocked apps cannot be stopped before they start on this system "
+                                        f"({self.engine.exec_guard_error}), they will be closed right after starting instead")
+    
+    def save_policy_source(self):
+        self.engine.policy_source = self.policy_source_var.get().strip()
+        self.save_data()
+        self.start_policy_sync()
+        if self.engine.policy_source:
+            messagebox.showinfo("Success", "Central policy source updated")
+        else:
+            messagebox.showinfo("Success", "Central policy sync disabled")
+    
+    def start_policy_sync(self):
+        """(Re)start the background thread pulling the central policy"""
+        if self.policy_sync_thread:
+            self.policy_sync_thread.stop()
+            self.policy_sync_thread = None
+        
+        if not self.engine.policy_source:
+            # Drop entries that were managed by a previously configured source
+            self.apply_policy({"blocked_apps": [], "routine_blocks": []})
+            return
+        
+        client = PolicySyncClient(self.engine.policy_source, self.policy_cache_file)
+        self.policy_sync_thread = PolicySyncThread(
+            client,
+            lambda policy: self.root.after(0, self.apply_policy, policy),
+            interval=self.engine.policy_sync_minutes * 60
+        )
+        self.policy_sync_thread.start()
+    
+    def apply_policy(self, policy):
+        """Replace centrally managed entries, keeping the ones the user added locally"""
+        def replace(blocked_apps, routine_blocks):
+            local_apps = [app for app in blocked_apps if "policy_id" not in app]
+            local_routines = [routine for routine in routine_blocks if "policy_id" not in routine]
+            if (len(local_apps) == len(blocked_apps) and len(local_routines) == len(routine_blocks)
+                    and not policy["blocked_apps"] and not policy["routine_blocks"]):
+                return None
+            return local_apps + policy["blocked_apps"], local_routines + policy["routine_blocks"]
+        
+        # Swap whole lists so the watchdog never sees a half-applied policy
+        if self.engine.update_rules(replace):
+            self.save_data()
+    
     def check_autostart(self):
-        try:
-            key = winreg.OpenKey(
-                winreg.HKEY_CURRENT_USER,
-                r"Software\Microsoft\Windows\CurrentVersion\Run",
-                0, winreg.KEY_READ
-            )
-            
-            try:
-                value, _ = winreg.QueryValueEx(key, "DigitalDetox")
-                winreg.CloseKey(key)
-                return True
-            except WindowsError:
-                winreg.CloseKey(key)
-                return False
-        except WindowsError:
-            return False
+        return platforms.current().autostart_enabled()
     
     def toggle_autostart(self):
         enabled = self.autostart_var.get()
+        platform = platforms.current()
         
         try:
-            key = winreg.OpenKey(
-                winreg.HKEY_CURRENT_USER,
-                r"Software\Microsoft\Windows\CurrentVersion\Run",
-                0, winreg.KEY_WRITE
-            )
-            
+            platform.set_autostart(enabled)
             if enabled:
-                # Add to startup
-                winreg.SetValueEx(
-                    key, 
-                    "DigitalDetox", 
-                    0, 
-                    winreg.REG_SZ, 
-                    os.path.abspath(sys.argv[0])
-                )
-                messagebox.showinfo("Success", "Digital Detox will start with Windows")
+                messagebox.showinfo("Success", f"Digital Detox will start with {platform.name}")
             else:
-                # Remove from startup
-                try:
-                    winreg.DeleteValue(key, "DigitalDetox")
-                    messagebox.showinfo("Success", "Digital Detox will not start with Windows")
-                except WindowsError:
-                    pass
-                
-            winreg.CloseKey(key)
+                messagebox.showinfo("Success", f"Digital Detox will not start with {platform.name}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update startup settings: {e}")
     
-    def block_watchdog(self):
-        """Thread to continuously enforce blocks"""
-        while True:
-            current_time = datetime.now()
-            current_time_str = current_time.strftime("%H:%M")
-            current_day = current_time.strftime("%A")
-            
-            # Check quick app blocks
-            for app in self.blocked_apps:
-                if "end_time" in app:
-                    end_time = datetime.fromisoformat(app["end_time"])
-                    if end_time > current_time:
-                        self.kill_app(app["name"])
-            
-            # Check routine blocks
-            for routine in self.routine_blocks:
-                start_time = routine["start_time"]
-                end_time = routine["end_time"]
-                days = routine["days"]
-                apps = routine["apps"]
-                
-                if current_day in days and start_time <= current_time_str < end_time:
-                    for app in apps:
-                        self.kill_app(app)
-                        # Ensure a blocking thread is running
-                        if app not in self.block_threads or not self.block_threads[app].is_alive():
-                            # Use end of day as end time for thread
-                            end_datetime = datetime.strptime(f"{current_time.date()} {end_time}", "%Y-%m-%d %H:%M")
-                            if end_datetime < current_time:
-                                end_datetime += timedelta(days=1)
-                            thread = AppBlockThread(app, end_datetime)
-                            thread.start()
-                            self.block_threads[app] = thread
-            
-            # Check internet blocks
-            internet_should_be_blocked = False
-            for block in self.internet_blocks:
-                if "end_time" in block:
-                    end_time = datetime.fromisoformat(block["end_time"])
-                    if end_time > current_time:
-                        internet_should_be_blocked = True
-                        break
-            
-            # Enforce internet block if needed
-            if internet_should_be_blocked and not self.internet_block_active:
-                try:
-                    self.disable_network_adapters()
-                    self.internet_block_active = True
-                except Exception:
-                    pass
-            elif not internet_should_be_blocked and self.internet_block_active:
-                try:
-                    self.enable_network_adapters()
-                    self.internet_block_active = False
-                except Exception:
-                    pass
-            
-            # Sleep for a short time
-            time.sleep(2)
-    
     def is_admin(self):
-        try:
-            return ctypes.windll.shell32.IsUserAnAdmin() != 0
-        except Exception:
-            return False
+        return platforms.current().is_admin()
     
     def restart_as_admin(self):
         try:
-            ctypes.windll.shell32.ShellExecuteW(
-                    None, "runas", sys.executable, " ".join(sys.argv), None, 1
-                )
+            platforms.current().restart_as_admin()
             self.root.destroy()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to restart with admin privileges: {e}")
@@ -1006,35 +1368,45 @@ class DigitalDetoxApp:
     def attempt_unblock(self, block_type, target=None):
         """Handle unblock attempts with cooling period"""
         # Check if there are any active blocks
-        current_time = datetime.now()
+        current_time = self.engine.clock.now()
         active_blocks = []
         
         if block_type == "app" and target:
-            for app in self.blocked_apps:
+            for app in self.engine.blocked_apps:
                 if app["name"] == target and "end_time" in app:
                     end_time = datetime.fromisoformat(app["end_time"])
                     if end_time > current_time:
                         active_blocks.append(app)
         elif block_type == "internet":
-            for block in self.internet_blocks:
-                if "end_time" in block:
-                    end_time = datetime.fromisoformat(block["end_time"])
-                    if end_time > current_time:
-                        active_blocks.append(block)
+            if self.engine.internet_intervals.contains(current_time):
+                active_blocks = self.engine.internet_blocks
+        elif block_type == "allowlist":
+            if self.engine.allowlist is not None and self.engine.allowlist.is_active(current_time):
+                active_blocks = [self.engine.allowlist_session]
+        elif block_type == "profile" and self.engine.active_profile is not None:
+            active_blocks = [self.engine.active_profile]
         
         if not active_blocks:
             messagebox.showinfo("Info", "No active blocks to remove")
             return
         
-        # Ask user to confirm with cooling period warning
-        response = messagebox.askyesno(
-            "Cooling Period", 
-            f"Removing this block requires a {self.cooling_period_minutes} minute cooling period. Proceed?"
-        )
-        
-        if not response:
-            return
+        # An earlier request keeps counting down even if its window was closed
+        deadline_id = f"unblock:{block_type}:{target or ''}"
+        if self.engine.scheduler.get(deadline_id) is None:
+            # Ask user to confirm with cooling period warning
+            response = messagebox.askyesno(
+                "Cooling Period", 
+                f"Removing this block requires a {self.engine.cooling_period_minutes} minute cooling period. Proceed?"
+            )
+            
+            if not response:
+                return
         
+        # The unblock itself is a persisted deadline, this window only shows the countdown
+        deadline = self.engine.request_unblock(block_type, target)
+        self.show_cooling_window(deadline)
+    
+    def show_cooling_window(self, deadline):
         # Create cooling period window
         cooling_window = tk.Toplevel(self.root)
         cooling_window.title("Cooling Period")
@@ -1057,30 +1429,34 @@ class DigitalDetoxApp:
         
         message_label = ttk.Label(
             frame, 
-            text=f"Please wait {self.cooling_period_minutes} minutes before removing the block",
+            text="Please wait for the cooling period to end before the block is removed",
             wraplength=250,
             justify=tk.CENTER
         )
         message_label.pack(pady=10)
         
         # Timer variables
-        end_time = datetime.now() + timedelta(minutes=self.cooling_period_minutes)
+        end_time = datetime.fromtimestamp(deadline["due"])
         timer_var = tk.StringVar(value="")
         
         timer_label = ttk.Label(frame, textvariable=timer_var, font=("Arial", 14, "bold"))
         timer_label.pack(pady=10)
         
-        # Cancel button
-        cancel_btn = ttk.Button(frame, text="Cancel", command=cooling_window.destroy)
+        # Cancel button withdraws the unblock request, closing the window keeps it pending
+        def cancel():
+            self.engine.cancel_unblock(deadline)
+            cooling_window.destroy()
+        
+        cancel_btn = ttk.Button(frame, text="Cancel Unblock", command=cancel)
         cancel_btn.pack(pady=10)
         
-        # Timer update function
+        # Timer update function, display only: the scheduler performs the unblock
         def update_timer():
-            remaining = end_time - datetime.now()
-            if remaining.total_seconds() <= 0:
-                # Time's up, allow unblocking
+            if not cooling_window.winfo_exists():
+                return
+            remaining = end_time - self.engine.clock.now()
+            if remaining.total_seconds() <= 0 or self.engine.scheduler.get(deadline["id"]) is None:
                 cooling_window.destroy()
-                self.perform_unblock(block_type, target)
                 return
             
             # Update timer text
@@ -1091,51 +1467,41 @@ class DigitalDetoxApp:
         # Start timer update
         update_timer()
     
-    def perform_unblock(self, block_type, target=None):
-        """Actually perform the unblock after cooling period"""
-        if block_type == "app" and target:
-            # Remove app from quick blocked list
-            self.blocked_apps = [app for app in self.blocked_apps if app["name"] != target]
-            
-            # Stop blocking thread if exists
-            if target in self.block_threads:
-                self.block_threads[target].stop()
-                del self.block_threads[target]
-            
-            messagebox.showinfo("Success", f"{target} has been unblocked")
-        
-        elif block_type == "internet":
-            # Remove all internet blocks
-            self.internet_blocks = [block for block in self.internet_blocks 
-                                  if "end_time" not in block or 
-                                  datetime.fromisoformat(block["end_time"]) <= datetime.now()]
-            
-            # Enable network adapters
-            try:
-                self.enable_network_adapters()
-                self.internet_block_active = False
-                messagebox.showinfo("Success", "Internet has been unblocked")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to unblock internet: {e}")
-        
-        # Save data
-        self.save_data()
+    def on_engine_event(self, event, details):
+        """Report unblocks performed by the engine once their cooling period ended"""
+        if event == "quota_exhausted":
+            messagebox.showinfo("Quota Used Up", f"{details['target']} used up its daily quota and is blocked until midnight")
+            return
+        if event != "unblocked":
+            return
+        if details["error"]:
+            messagebox.showerror("Error", f"Failed to unblock {details['block_type']}: {details['error']}")
+        elif details["block_type"] == "app":
+            messagebox.showinfo("Success", f"{details['target']} has been unblocked")
+        elif details["block_type"] == "allowlist":
+            messagebox.showinfo("Success", "The allowlist session has ended")
+        elif details["block_type"] == "profile":
+            self.refresh_profile_choices()
+            messagebox.showinfo("Success", f"Profile {details['target'] or NO_PROFILE} is now active")
+        else:
+            messagebox.showinfo("Success", "Internet has been unblocked")
     
     def on_closing(self):
         """Handle window closing"""
         # Check if there are active blocks
-        current_time = datetime.now()
+        current_time = self.engine.clock.now()
         has_active_blocks = False
         
-        for app in self.blocked_apps:
+        for app in self.engine.blocked_apps:
             if "end_time" in app and datetime.fromisoformat(app["end_time"]) > current_time:
                 has_active_blocks = True
                 break
         
-        for block in self.internet_blocks:
-            if "end_time" in block and datetime.fromisoformat(block["end_time"]) > current_time:
-                has_active_blocks = True
-                break
+        if self.engine.internet_intervals.contains(current_time):
+            has_active_blocks = True
+        
+        if self.engine.allowlist is not None and self.engine.allowlist.is_active(current_time):
+            has_active_blocks = True
         
         if has_active_blocks:
             # Warn the user about active blocks
@@ -1148,47 +1514,28 @@ class DigitalDetoxApp:
             if response:
                 # Minimize to system tray
                 self.root.withdraw()
+                self.suspend_ui_refresh()
                 return
         
-        # Exit application
+        # Exit application, never leave suspended or offline processes behind
+        self.engine.shutdown()
         self.save_data()
         self.root.destroy()
 
 
-class AppBlockThread(threading.Thread):
-    """Thread for blocking a specific application"""
-    
-    def __init__(self, app_name, end_time):
-        super().__init__(daemon=True)
-        self.app_name = app_name
-        self.end_time = end_time
-        self._stop_event = threading.Event()
-    
-    def run(self):
-        while not self._stop_event.is_set() and datetime.now() < self.end_time:
-            # Check if the application is running and kill it
-            for proc in psutil.process_iter(['pid', 'name']):
-                try:
-                    if proc.info['name'] == self.app_name:
-                        proc.kill()
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    pass
-            # Sleep for a short time
-            time.sleep(1)
-    
-    def stop(self):
-        self._stop_event.set()
-
-
 def main():
     # Check if we need to run as admin
     if 'runas' in sys.argv:
         # We're running with admin privileges
         pass
     
+    # Resume enforcement from the saved state before any UI work
+    engine = DetoxEngine(DATA_FILE)
+    engine.start()
+    
     # Create main window
     root = tk.Tk()
-    app = DigitalDetoxApp(root)
+    app = DigitalDetoxApp(root, engine)
     root.mainloop()
 
 
@@ -4,5 +4,6 @@ setup(
     name="DigitalDetox",
     version="1.0",
     description="Digital Detox App",
+    options={"build_exe": {"packages": ["detox"]}},
     executables=[Executable("digital_detox.py", base="Win32GUI", icon="icon.ico")]
 )
@@ -0,0 +1,66 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from detox.allowlist import AllowList
+from detox.clock import VirtualClock
+from detox.enforcement import ProcessEnforcer
+from detox.processes import SyntheticProcess, SyntheticSource
+from detox.rules import BlockMatcher
+
+NOW = datetime(2026, 10, 19, 12, 0)
+# A uid without an account resolves to its number, the same on every machine
+STUDENT_UID = 54321
+STUDENT = str(STUDENT_UID)
+
+
+def session_source(processes):
+    """A process table of (pid, ppid, name, uid)"""
+    source = SyntheticSource(0, respawn=False)
+    for pid, ppid, name, uid in processes:
+        proc = SyntheticProcess(source, pid, name, uid, str(uid), 1.7e9 + pid, 1.0, 1 << 20)
+        proc.ppid = lambda ppid=ppid: ppid
+        source.table[pid] = proc
+    return source
+
+
+def run_session(processes, apps):
+    source = session_source(processes)
+    enforcer = ProcessEnforcer(clock=VirtualClock(NOW), source=source)
+    allowlist = AllowList(apps, STUDENT, NOW + timedelta(hours=2))
+    enforcer.scan(BlockMatcher(), NOW, allowlist=allowlist)
+    return sorted(source.table[pid].name() for pid in source.table)
+
+
+def test_session_closes_everything_but_allowed_and_critical_processes():
+    running = run_session([
+        (5000, 1, "systemd", STUDENT_UID),
+        (5001, 5000, "gnome-shell", STUDENT_UID),
+        (5002, 5000, "gsd-power", STUDENT_UID),
+        (5003, 5001, "Firefox", STUDENT_UID),
+        # A helper under another name, started by the allowed app
+        (5004, 5003, "Web Content", STUDENT_UID),
+        (5005, 5001, "game", STUDENT_UID),
+        (5006, 5001, "bash", STUDENT_UID),
+        (5007, 5006, "python3", STUDENT_UID),
+    ], ["firefox.exe"])
+    assert running == ["Firefox", "Web Content", "gnome-shell", "gsd-power", "systemd"]
+
+
+def test_session_spares_other_users_and_digital_detox_itself():
+    own = os.getpid()
+    running = run_session([
+        (5000, 1, "game", STUDENT_UID + 1),
+        # Started by Digital Detox, and the process Digital Detox was started from
+        (5001, own, "helper", STUDENT_UID),
+        (os.getppid(), 1, "launcher", STUDENT_UID),
+        (5002, 1, "game", STUDENT_UID),
+    ], [])
+    assert running == ["game", "helper", "launcher"]
+
+
+@pytest.mark.parametrize("user", ["root", "", "SYSTEM"])
+def test_system_accounts_cannot_run_a_session(user):
+    with pytest.raises(ValueError):
+        AllowList(["firefox"], user, NOW)
@@ -0,0 +1,64 @@
+import pytest
+
+from detox.bulk_io import RuleValidationError, read_rules
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content if isinstance(content, bytes) else content.encode("utf-8"))
+    return str(path)
+
+
+def test_non_text_fields_are_validation_errors(tmp_path):
+    path = write(tmp_path, "rules.jsonl", "\n".join([
+        '{"type": "app", "name": 5, "duration_minutes": 3}',
+        '{"type": null, "name": "a.exe"}',
+        '{"type": "routine", "apps": ["x"], "start_time": 900, "end_time": "10:00", "days": ["Monday"]}',
+        '{"type": "app", "name": "ok.exe", "duration_minutes": 3}',
+    ]))
+    batch = read_rules(path)
+    assert batch.error_count == 3
+    assert [error.split(":")[0] for error in batch.errors] == ["line 1", "line 2", "line 3"]
+    assert [key[0] for key in batch.blocked_apps] == ["ok.exe"]
+
+
+def test_invalid_json_and_non_objects(tmp_path):
+    path = write(tmp_path, "rules.jsonl", '{"type": "app",\n[1, 2]\n')
+    batch = read_rules(path)
+    assert batch.error_count == 2
+
+
+def test_every_error_is_counted(tmp_path):
+    path = write(tmp_path, "rules.jsonl", '{"type": "bad"}\n' * 250)
+    batch = read_rules(path, max_errors=100)
+    assert batch.records == 250
+    assert batch.error_count == 250
+    assert len(batch.errors) == 100
+
+
+def test_file_that_is_not_utf8_names_the_line(tmp_path):
+    path = write(tmp_path, "rules.jsonl", b'{"type": "app", "name": "a.exe", "duration_minutes": 3}\n\xff\xfe\n')
+    with pytest.raises(RuleValidationError, match="line 2"):
+        read_rules(path)
+
+
+def test_csv_reader_errors_name_the_line(tmp_path):
+    path = write(tmp_path, "rules.csv", "type,name,duration_minutes\napp,a.exe,3\napp,\"" + "x" * 200000 + "\",3\n")
+    with pytest.raises(RuleValidationError, match="line 3"):
+        read_rules(path)
+
+
+def test_csv_rules(tmp_path):
+    path = write(tmp_path, "rules.csv", "type,name,duration_minutes,apps,start_time,end_time,days\r\n"
+                                        "app,chrome.exe,30,,,,\r\n"
+                                        "routine,,,steam.exe;game.exe,09:00,17:00,Monday;Friday\r\n"
+                                        "routine,,,steam.exe,25:00,17:00,Monday\r\n")
+    batch = read_rules(path)
+    assert list(batch.blocked_apps) == [("chrome.exe", "", False)]
+    assert len(batch.routine_blocks) == 1
+    assert batch.errors == ["line 4: routine times must be in HH:MM format"]
+
+
+def test_unsupported_extension(tmp_path):
+    with pytest.raises(RuleValidationError):
+        read_rules(write(tmp_path, "rules.txt", ""))
@@ -0,0 +1,83 @@
+import os
+from datetime import datetime, timedelta
+
+from detox.clock import VirtualClock
+from detox.enforcement import ProcessEnforcer
+from detox.processes import SyntheticSource, Uids
+from detox.rules import BlockMatcher, current_user
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def owned_source(count, respawn):
+    source = SyntheticSource(count, names=["chrome.exe"], seed=1, respawn=respawn)
+    # Every process belongs to the owner, so all of them are enforced
+    uid = os.getuid() if hasattr(os, "getuid") else 1000
+    for proc in source.table.values():
+        proc._uids, proc._username = Uids(uid, uid, uid), current_user()
+    return source
+
+
+def enforcer_for(source, clock):
+    return ProcessEnforcer(clock=clock, source=source)
+
+
+def blocked(name="chrome.exe"):
+    return BlockMatcher([{"name": name, "end_time": (NOW + timedelta(hours=1)).isoformat()}], [], owner=current_user())
+
+
+def test_one_pass_over_many_instances_is_no_storm():
+    clock = VirtualClock(NOW)
+    enforcer = enforcer_for(owned_source(12, respawn=False), clock)
+    enforcer.scan(blocked(), NOW)
+    assert enforcer.kills == 12
+    assert enforcer.storms == 0
+
+
+def test_unreaped_processes_are_killed_once():
+    clock = VirtualClock(NOW)
+    source = owned_source(3, respawn=True)
+    for proc in source.table.values():
+        # A zombie: the kill goes through but the process stays in the table unchanged
+        proc.kill = lambda: None
+    enforcer = enforcer_for(source, clock)
+    for _ in range(12):
+        clock.advance(1)
+        enforcer.scan(blocked(), NOW)
+        enforcer.enforce_names(["chrome.exe"])
+    assert enforcer.kills == 3
+    assert enforcer.storms == 0
+
+
+def test_respawning_every_tick_is_a_storm():
+    clock = VirtualClock(NOW)
+    enforcer = enforcer_for(owned_source(3, respawn=True), clock)
+    for _ in range(12):
+        clock.advance(1)
+        enforcer.scan(blocked(), NOW)
+    assert enforcer.storms == 1
+    assert enforcer.escalations == {"chrome.exe": 1}
+
+
+def test_escalated_launcher_stays_blocked_until_the_block_ends():
+    clock = VirtualClock(NOW)
+    source = owned_source(2, respawn=False)
+    launcher, child = source.table.values()
+    launcher._name = "launcher"
+    child.parent = lambda: launcher
+    enforcer = enforcer_for(source, clock)
+    enforcer.escalations["chrome.exe"] = 2
+    enforcer.scan(blocked(), NOW)
+    assert launcher.suspended and child.suspended
+
+    # The target went quiet only because its launcher is frozen
+    clock.advance(120)
+    enforcer.scan(blocked(), NOW)
+    assert enforcer.escalations == {}
+    assert launcher.suspended
+    assert enforcer.escalated_parents == {"launcher": "chrome.exe"}
+
+    enforcer.scan(blocked(), NOW + timedelta(hours=2))
+    assert not launcher.suspended and not child.suspended
+    enforcer.scan(blocked(), NOW + timedelta(hours=2))
+    assert enforcer.escalated_parents == {}
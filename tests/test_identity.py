@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from detox.identity import IdentityIndex, comm_name, identity, name_forms
+from detox.rules import BlockMatcher, moment
+
+
+def test_identity_normalizes_case_path_and_exe():
+    assert identity("Firefox") == "firefox"
+    assert identity("FIREFOX.EXE") == "firefox"
+    assert identity("/usr/bin/firefox") == "firefox"
+    assert identity("C:\\Program Files\\Mozilla Firefox\\firefox.exe") == "firefox"
+
+
+def test_comm_name_is_cut_to_15_bytes():
+    assert comm_name("/opt/VeryLongApplicationName") == "VeryLongApplica"
+    assert comm_name("short") == "short"
+
+
+def test_name_forms_include_the_truncated_form():
+    assert name_forms("VeryLongApplicationName") == {"verylongapplicationname", "verylongapplica"}
+    # The comm form keeps the part of ".exe" that fits
+    assert name_forms("shortnameabc.exe") == {"shortnameabc", "shortnameabc.ex"}
+    assert name_forms("chrome.exe") == {"chrome"}
+
+
+def test_index_lookup():
+    index = IdentityIndex(["Steam", "VeryLongApplicationName"])
+    assert index.lookup("steam.exe") == "Steam"
+    assert index.lookup("verylongapplica") == "VeryLongApplicationName"
+    assert index.lookup("chrome") == ""
+    assert index.lookup("") == ""
+    assert "STEAM" in index
+
+
+def test_full_name_wins_over_truncated_form():
+    index = IdentityIndex(["verylongapplicationname", "verylongapplica"])
+    assert index.lookup("verylongapplica") == "verylongapplica"
+
+
+def test_matcher_matches_every_form():
+    now = datetime(2026, 10, 19, 12, 0)
+    end = (now + timedelta(hours=1)).isoformat()
+    matcher = BlockMatcher([{"name": "Firefox.exe", "end_time": end}], [], owner="alice")
+    when = moment(now)
+    for name in ("firefox", "FIREFOX.EXE", "firefox.exe"):
+        assert matcher.is_blocked(name, when)
+    assert not matcher.is_blocked("fire", when)
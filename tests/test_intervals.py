@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from detox.intervals import IntervalSet
+
+T0 = datetime(2026, 10, 19, 9, 0)
+
+
+def at(minutes):
+    return T0 + timedelta(minutes=minutes)
+
+
+def spans(intervals):
+    return [((start - T0).total_seconds() / 60, (end - T0).total_seconds() / 60) for start, end in intervals]
+
+
+def test_add_merges_overlapping_and_touching():
+    intervals = IntervalSet([(at(0), at(10)), (at(20), at(30))])
+    intervals.add(at(5), at(20))
+    assert spans(intervals) == [(0, 30)]
+    intervals.add(at(30), at(40))
+    assert spans(intervals) == [(0, 40)]
+
+
+def test_add_keeps_disjoint_intervals_sorted():
+    intervals = IntervalSet([(at(50), at(60)), (at(0), at(10)), (at(20), at(30))])
+    assert spans(intervals) == [(0, 10), (20, 30), (50, 60)]
+
+
+def test_add_ignores_empty_interval():
+    intervals = IntervalSet()
+    intervals.add(at(10), at(10))
+    intervals.add(at(10), at(5))
+    assert len(intervals) == 0
+
+
+def test_remove_splits_and_trims():
+    intervals = IntervalSet([(at(0), at(60))])
+    intervals.remove(at(10), at(20))
+    assert spans(intervals) == [(0, 10), (20, 60)]
+    intervals.remove(at(50), at(90))
+    assert spans(intervals) == [(0, 10), (20, 50)]
+    intervals.remove(at(-5), at(25))
+    assert spans(intervals) == [(25, 50)]
+
+
+def test_remove_outside_is_a_no_op():
+    intervals = IntervalSet([(at(0), at(10))])
+    intervals.remove(at(10), at(20))
+    assert spans(intervals) == [(0, 10)]
+
+
+def test_contains_and_blocked_until_are_half_open():
+    intervals = IntervalSet([(at(0), at(10))])
+    assert intervals.contains(at(0))
+    assert intervals.blocked_until(at(5)) == at(10)
+    assert not intervals.contains(at(10))
+    assert intervals.blocked_until(at(10)) is None
+
+
+def test_extend_merges_into_the_next_interval():
+    intervals = IntervalSet([(at(0), at(10)), (at(15), at(30))])
+    assert intervals.extend(at(5), timedelta(minutes=10)) == at(30)
+    assert spans(intervals) == [(0, 30)]
+
+
+def test_pop_ended():
+    intervals = IntervalSet([(at(0), at(10)), (at(20), at(30))])
+    assert spans(intervals.pop_ended(at(10))) == [(0, 10)]
+    assert spans(intervals) == [(20, 30)]
@@ -0,0 +1,140 @@
+import threading
+
+import pytest
+
+from detox.policy_sync import PolicyStore, PolicySyncClient, PolicySyncError, make_policy_server
+
+
+class RecordingStore(PolicyStore):
+    """Remembers what it answered, to tell a 304 from a delta from a full policy"""
+
+    def __init__(self):
+        super().__init__()
+        self.responses = []
+
+    def respond(self, since=None, if_none_match=None):
+        status, body = super().respond(since, if_none_match)
+        self.responses.append((status, body))
+        return status, body
+
+    def last_kind(self):
+        status, body = self.responses[-1]
+        if status == 304:
+            return "not modified"
+        return "delta" if "changes" in body else "full"
+
+
+class WrongBaseStore(RecordingStore):
+    """Answers every conditional request with a delta against another version"""
+
+    def respond(self, since=None, if_none_match=None):
+        if since is None:
+            return super().respond(since, if_none_match)
+        self.responses.append((200, None))
+        return 200, {"version": self.version, "base_version": since + 100, "changes": {}}
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(store):
+        # Port 0, the OS picks a free one
+        server = make_policy_server(store, port=0)
+        threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/policy"
+
+    def stop():
+        while servers:
+            server = servers.pop()
+            server.shutdown()
+            server.server_close()
+
+    start.stop = stop
+    yield start
+    stop()
+
+
+def policy(*names):
+    return {"blocked_apps": [{"name": name, "end_time": "2030-01-01T00:00:00"} for name in names],
+            "routine_blocks": []}
+
+
+def names(client):
+    return sorted(entry["name"] for entry in client.snapshot()["blocked_apps"])
+
+
+def test_matching_etag_is_not_modified(serve):
+    store = RecordingStore()
+    store.publish(policy("game.exe"))
+    client = PolicySyncClient(serve(store))
+    assert client.sync()
+    assert store.last_kind() == "full"
+    assert not client.sync()
+    assert store.last_kind() == "not modified"
+    assert names(client) == ["game.exe"]
+
+
+def test_delta_upserts_and_deletes(serve):
+    store = RecordingStore()
+    store.publish(policy("game.exe", "chat.exe"))
+    client = PolicySyncClient(serve(store))
+    client.sync()
+    store.publish({"blocked_apps": [{"name": "game.exe", "end_time": "2031-01-01T00:00:00"},
+                                    {"name": "video.exe", "end_time": "2030-01-01T00:00:00"}],
+                   "routine_blocks": []})
+    assert client.sync()
+    assert store.last_kind() == "delta"
+    changes = store.responses[-1][1]["changes"]["blocked_apps"]
+    assert changes["delete"] == ["chat.exe"]
+    assert sorted(entry["name"] for entry in changes["upsert"]) == ["game.exe", "video.exe"]
+    assert names(client) == ["game.exe", "video.exe"]
+    assert client.index["blocked_apps"]["game.exe"]["end_time"] == "2031-01-01T00:00:00"
+    assert client.version == 2
+
+
+def test_restarted_server_sends_the_full_policy(serve):
+    store = RecordingStore()
+    store.publish(policy("game.exe"))
+    store.publish(policy("game.exe", "chat.exe"))
+    client = PolicySyncClient(serve(store))
+    client.sync()
+    assert client.version == 2
+    serve.stop()
+
+    # Numbered from scratch: version 2 exists again, but with other content
+    restarted = RecordingStore()
+    restarted.publish(policy("video.exe"))
+    restarted.publish(policy("video.exe", "news.exe"))
+    client.source = serve(restarted)
+    assert client.sync()
+    assert restarted.last_kind() == "full"
+    assert names(client) == ["news.exe", "video.exe"]
+
+
+def test_delta_against_another_version_falls_back_to_full(serve):
+    store = WrongBaseStore()
+    store.publish(policy("game.exe"))
+    client = PolicySyncClient(serve(store))
+    client.sync()
+    store.publish(policy("chat.exe"))
+    assert client.sync()
+    assert store.last_kind() == "full"
+    assert names(client) == ["chat.exe"]
+
+
+def test_cached_policy_is_kept_while_the_server_is_down(serve, tmp_path):
+    cache_file = str(tmp_path / "policy_cache.json")
+    store = RecordingStore()
+    store.publish(policy("game.exe"))
+    source = serve(store)
+    PolicySyncClient(source, cache_file).sync()
+    serve.stop()
+
+    # A restart of the app while the server is unreachable
+    client = PolicySyncClient(source, cache_file, timeout=2)
+    with pytest.raises(PolicySyncError):
+        client.sync()
+    assert names(client) == ["game.exe"]
+    assert client.snapshot()["blocked_apps"][0]["policy_id"] == "game.exe"
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from detox.clock import VirtualClock
+from detox.engine import DetoxEngine
+from detox.quotas import QuotaTracker, next_midnight
+from detox.rules import moment
+
+START = datetime(2026, 10, 19, 22, 0)
+
+
+def tracker_at(tmp_path, minutes=30):
+    tracker = QuotaTracker(str(tmp_path / "digital_detox_quota_usage.json"))
+    tracker.set_limits([{"name": "game.exe", "minutes": minutes}])
+    return tracker
+
+
+def test_quota_runs_out_once(tmp_path):
+    clock = VirtualClock(START)
+    tracker = tracker_at(tmp_path)
+    assert tracker.observe({"game.exe"}, clock.now()) == []
+    clock.advance(20 * 60)
+    # Closed for a while, the time it already used counts
+    assert tracker.observe(set(), clock.now()) == []
+    clock.advance(60 * 60)
+    assert tracker.observe({"game.exe"}, clock.now()) == []
+    clock.advance(10 * 60)
+    assert tracker.observe({"game.exe"}, clock.now()) == ["game.exe"]
+    assert tracker.remaining_seconds("game.exe", clock.now()) == 0
+    clock.advance(60)
+    assert tracker.observe({"game.exe"}, clock.now()) == []
+
+
+def test_usage_resets_at_midnight(tmp_path):
+    clock = VirtualClock(START)
+    tracker = tracker_at(tmp_path)
+    tracker.observe({"game.exe"}, clock.now())
+    clock.advance(30 * 60)
+    assert tracker.observe({"game.exe"}, clock.now()) == ["game.exe"]
+
+    # Still running across midnight, it counts from midnight on the new day
+    clock.set(next_midnight(clock.now()))
+    clock.advance(5 * 60)
+    assert tracker.observe({"game.exe"}, clock.now()) == []
+    assert tracker.used_seconds("game.exe", clock.now()) == 5 * 60
+    assert tracker.exhausted == set()
+
+
+def test_usage_of_the_day_survives_a_restart(tmp_path):
+    clock = VirtualClock(START)
+    tracker = tracker_at(tmp_path)
+    tracker.observe({"game.exe"}, clock.now())
+    clock.advance(25 * 60)
+    tracker.observe(set(), clock.now())
+
+    restarted = tracker_at(tmp_path)
+    clock.advance(60)
+    restarted.observe({"game.exe"}, clock.now())
+    clock.advance(5 * 60)
+    assert restarted.observe({"game.exe"}, clock.now()) == ["game.exe"]
+
+    # The next day starts from zero
+    tomorrow = tracker_at(tmp_path)
+    tomorrow.load(next_midnight(clock.now()))
+    assert tomorrow.used == {}
+
+
+def test_exhausted_app_is_blocked_until_midnight(tmp_path):
+    clock = VirtualClock(START)
+    engine = DetoxEngine(str(tmp_path / "digital_detox_data.json"), clock=clock)
+    engine.block_exhausted_quotas(["game.exe"], clock.now())
+    assert engine.matcher.is_blocked("game.exe", moment(clock.now()))
+    assert engine.scheduler.get("expiry:app:game.exe")["due"] == next_midnight(START).timestamp()
+    assert not engine.matcher.is_blocked("game.exe", moment(next_midnight(START)))
@@ -0,0 +1,92 @@
+import json
+from datetime import datetime
+
+from detox.clock import VirtualClock
+from detox.scheduler import DeadlineScheduler
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def scheduler_at(tmp_path, clock):
+    return DeadlineScheduler(str(tmp_path / "digital_detox_deadlines.json"), clock.time)
+
+
+def saved(scheduler):
+    with open(scheduler.path, "r") as f:
+        return sorted(deadline["id"] for deadline in json.load(f))
+
+
+def fire_due(scheduler):
+    with scheduler.cond:
+        deadlines, delay = scheduler.pop_due()
+    scheduler.fire_all(deadlines)
+    return [deadline["id"] for deadline in deadlines], delay
+
+
+def test_deadlines_survive_a_restart(tmp_path):
+    clock = VirtualClock(NOW)
+    scheduler = scheduler_at(tmp_path, clock)
+    scheduler.schedule("unblock", clock.time() + 900, {"block_type": "internet", "target": None}, "unblock:internet:")
+    scheduler.schedule("app_expiry", clock.time() + 60, {"name": "game.exe"}, "expiry:app:game.exe")
+
+    reloaded = scheduler_at(tmp_path, clock)
+    reloaded.load()
+    assert [deadline["id"] for deadline in reloaded.pending()] == ["expiry:app:game.exe", "unblock:internet:"]
+    assert reloaded.get("unblock:internet:")["payload"] == {"block_type": "internet", "target": None}
+
+    # Deadlines that came due while the app was closed fire right after start
+    clock.advance(1000)
+    fired = []
+    reloaded.register("unblock", fired.append)
+    reloaded.register("app_expiry", fired.append)
+    assert fire_due(reloaded) == (["expiry:app:game.exe", "unblock:internet:"], None)
+    assert [deadline["id"] for deadline in fired] == ["expiry:app:game.exe", "unblock:internet:"]
+
+
+def test_cancel_and_reschedule(tmp_path):
+    clock = VirtualClock(NOW)
+    scheduler = scheduler_at(tmp_path, clock)
+    scheduler.schedule("unblock", clock.time() + 60, None, "first")
+    scheduler.schedule("unblock", clock.time() + 120, None, "second")
+    assert scheduler.cancel("first")
+    assert not scheduler.cancel("first")
+    # Moved later, the stale heap entry of the old due time is skipped
+    scheduler.schedule("unblock", clock.time() + 300, None, "second")
+
+    clock.advance(200)
+    assert fire_due(scheduler) == ([], 100)
+    clock.advance(100)
+    assert fire_due(scheduler) == (["second"], None)
+    assert saved(scheduler) == []
+
+
+def test_batch_expiry_saves_once_after_the_handlers(tmp_path):
+    clock = VirtualClock(NOW)
+    scheduler = scheduler_at(tmp_path, clock)
+    scheduler.schedule_many([(f"expiry:{i}", "app_expiry", clock.time() + i, None) for i in range(1, 101)])
+    scheduler.schedule("app_expiry", clock.time() + 1000, None, "later")
+
+    seen_in_file = []
+    scheduler.register("app_expiry", lambda deadline: seen_in_file.append(deadline["id"] in saved(scheduler)))
+    saves = []
+    save = scheduler.save
+    scheduler.save = lambda: saves.append(save())
+
+    clock.advance(100)
+    fired, delay = fire_due(scheduler)
+    assert fired == [f"expiry:{i}" for i in range(1, 101)]
+    assert delay == 900
+    # Still saved while its handler runs, so a crash there fires it again after restart
+    assert all(seen_in_file)
+    assert len(saves) == 1
+    assert saved(scheduler) == ["later"]
+
+
+def test_rebuilding_a_kind_keeps_deadlines_already_due(tmp_path):
+    clock = VirtualClock(NOW)
+    scheduler = scheduler_at(tmp_path, clock)
+    scheduler.schedule_many([("expiry:app:a", "app_expiry", clock.time() + 60, None),
+                             ("expiry:app:b", "app_expiry", clock.time() + 600, None)])
+    clock.advance(60)
+    scheduler.schedule_many([], replace_kind="app_expiry")
+    assert [deadline["id"] for deadline in scheduler.pending()] == ["expiry:app:a"]
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from detox.clock import VirtualClock
+from detox.engine import DetoxEngine
+from detox.state import SCHEMA_VERSION, StateError, StateStore
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def block(name, start, minutes):
+    return {"name": name, "start_time": start.isoformat(), "end_time": (start + timedelta(minutes=minutes)).isoformat()}
+
+
+def history(store):
+    return [record for _, record in store.iter_history()]
+
+
+def test_history_round_trip(tmp_path):
+    store = StateStore(str(tmp_path / "digital_detox_data.json"))
+    assert store.history_file == str(tmp_path / "digital_detox_history.jsonl")
+    store.archive("blocked_apps", [block("game.exe", NOW, 30), block("chat.exe", NOW, 90)])
+    store.archive("internet_blocks", [{"start_time": NOW.isoformat(), "end_time": (NOW + timedelta(hours=1)).isoformat()}])
+
+    assert [record["section"] for record in history(store)] == ["blocked_apps", "blocked_apps", "internet_blocks"]
+    assert history(store)[1]["name"] == "chat.exe"
+    summary = store.history_summary()
+    assert summary.blocks == {"blocked_apps": 2, "internet_blocks": 1}
+    assert summary.blocked_seconds == {"blocked_apps": 120 * 60.0, "internet_blocks": 3600.0}
+
+    # Only lines added since the last call are read, a partly written one waits
+    with open(store.history_file, "a") as f:
+        f.write(json.dumps(dict(block("video.exe", NOW, 10), section="blocked_apps")) + "\n")
+        f.write('{"section": "blocked_apps", "na')
+    assert store.history_summary().blocks["blocked_apps"] == 3
+    with open(store.history_file, "a") as f:
+        f.write('me": "x", "start_time": "%s", "end_time": "%s"}\n' % (NOW.isoformat(), NOW.isoformat()))
+    assert store.history_summary().blocks["blocked_apps"] == 4
+
+
+def test_hot_state_round_trip(tmp_path):
+    store = StateStore(str(tmp_path / "digital_detox_data.json"))
+    assert store.load() == {}
+    store.save({"blocked_apps": [block("game.exe", NOW, 30)], "cooling_period_minutes": 5})
+    data = StateStore(store.data_file).load(NOW)
+    assert data["schema_version"] == SCHEMA_VERSION
+    assert data["blocked_apps"][0]["name"] == "game.exe"
+    assert data["cooling_period_minutes"] == 5
+
+    with open(store.data_file, "w") as f:
+        f.write("{not json")
+    with pytest.raises(StateError):
+        store.load()
+
+
+def test_version_1_file_moves_ended_blocks_to_the_history(tmp_path):
+    data_file = tmp_path / "digital_detox_data.json"
+    data_file.write_text(json.dumps({"blocked_apps": [block("old.exe", NOW - timedelta(days=2), 30),
+                                                      block("game.exe", NOW, 30)],
+                                     "internet_blocks": []}))
+    store = StateStore(str(data_file))
+    data = store.load(NOW)
+    assert [app["name"] for app in data["blocked_apps"]] == ["game.exe"]
+    assert [record["name"] for record in history(store)] == ["old.exe"]
+    # Migrated once, on disk too
+    assert json.loads(data_file.read_text())["schema_version"] == SCHEMA_VERSION
+
+
+def test_engine_save_archives_ended_blocks(tmp_path):
+    clock = VirtualClock(NOW)
+    engine = DetoxEngine(str(tmp_path / "digital_detox_data.json"), clock=clock)
+    engine.block_app("game.exe", 30)
+    engine.block_internet(60)
+    engine.save()
+    assert history(engine.state_store) == []
+
+    clock.advance(2 * 3600)
+    engine.save()
+    assert engine.blocked_apps == []
+    assert sorted(record["section"] for record in history(engine.state_store)) == ["blocked_apps", "internet_blocks"]
+
+    reloaded = DetoxEngine(engine.state_store.data_file, clock=clock)
+    reloaded.load()
+    assert reloaded.blocked_apps == [] and reloaded.internet_blocks == []